@@ -0,0 +1,294 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+
+Writes all the outputs of a build into a single archive, or to stdout as
+records, rather than into a file beside every source, so that a build of
+any number of files is a single sequential stream of writes.
+"""
+import abc
+import io
+import os
+import struct
+import sys
+import time
+import typing
+
+# The archive formats open_archive() knows, by the suffix of the path, with
+# the mode tarfile streams them in, or None for zip.
+ARCHIVE_SUFFIXES = {
+    ".tar": "w|", ".tar.gz": "w|gz", ".tgz": "w|gz", ".tar.bz2": "w|bz2",
+    ".tar.xz": "w|xz", ".txz": "w|xz", ".zip": None}
+STDOUT = "-"  # The path open_archive() takes for records on stdout.
+# Every record starts with the length of the UTF-8 name of the output and
+# the length of its data, both big-endian, followed by the name and the data.
+RECORD_HEADER = struct.Struct(">IQ")
+_BUFFER_SIZE = 1 << 20
+
+
+def member_name(path: str, root: str) -> str:
+    """
+    Args:
+        path (str): the path of an output, as if it were written beside its
+            source.
+        root (str): the directory names are relative to.
+
+    Returns:
+        str: the name of the output in an archive, with "/" separators. It is
+        relative to root if the output is below it, and otherwise the absolute
+        path without its leading separator, as tar stores it.
+    """
+    path = os.path.abspath(path)
+    try:
+        name = os.path.relpath(path, root)
+    except ValueError:  # On another drive.
+        name = os.pardir
+    if name == os.pardir or name.startswith(os.pardir + os.sep):
+        name = os.path.splitdrive(path)[1].lstrip(os.sep)
+    return name.replace(os.sep, "/")
+
+
+class BuildArchive(abc.ABC):
+    """Where the outputs of a build go, one after another, named by the path
+    each would have beside its source, relative to a root directory. Every
+    format implements _write().
+
+    It is a context manager, which closes it on exit.
+    """
+
+    def __init__(self, root: typing.Optional[str] = None) -> None:
+        """
+        Args:
+            root (typing.Optional[str]): the directory the names of outputs
+                are relative to. Defaults to the working directory.
+        """
+        self.root = os.path.abspath(os.curdir if root is None else root)
+
+    def add(self, path: str, data: bytes) -> None:
+        """Writes an output.
+
+        Args:
+            path (str): the path the output would have beside its source.
+            data (bytes): its content.
+        """
+        self._write(member_name(path, self.root), data)
+
+    def close(self) -> None:
+        """Finishes writing, after the last output."""
+
+    def discard(self) -> None:
+        """Finishes writing, but gives up the outputs written, for a build
+        that failed, where the format can: records already went out.
+        """
+        self.close()
+
+    @abc.abstractmethod
+    def _write(self, name: str, data: bytes) -> None:
+        """Writes an output under its name in the archive."""
+
+    def __enter__(self) -> "BuildArchive":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class OutputBuffer:
+    """Keeps outputs in memory, by path, for a worker process to hand them to
+    the archive of the parent process. It takes outputs with add(), as a
+    BuildArchive does, but is not one: outputs are only named once the
+    parent adds them to its archive, relative to its root.
+    """
+
+    def __init__(self) -> None:
+        self.outputs = []  # (path, data) pairs, in the order they were added.
+
+    def add(self, path: str, data: bytes) -> None:
+        """Keeps an output, as BuildArchive.add() writes one."""
+        self.outputs.append((path, data))
+
+
+class RecordStream(BuildArchive):
+    """Writes every output to a binary stream as a record, a RECORD_HEADER
+    followed by the name and data, which read_records() reads back.
+    """
+
+    def __init__(self, output_stream: typing.BinaryIO,
+                 root: typing.Optional[str] = None) -> None:
+        """
+        Args:
+            output_stream (typing.BinaryIO): the stream to write to, which is
+                flushed but not closed when done.
+            root (typing.Optional[str]): as in BuildArchive.
+        """
+        super().__init__(root)
+        self.output_stream = output_stream
+
+    def _write(self, name: str, data: bytes) -> None:
+        name = name.encode("utf-8")
+        self.output_stream.write(RECORD_HEADER.pack(len(name), len(data)))
+        self.output_stream.write(name)
+        self.output_stream.write(data)
+
+    def close(self) -> None:
+        self.output_stream.flush()
+
+
+class _ArchiveFile(BuildArchive):
+    """An archive file. It is written to a temporary file beside it, which
+    replaces it once closed, and is removed if discarded instead, so that a
+    failed build leaves no half-written archive behind, nor destroys the one
+    of the last build.
+    """
+
+    def __init__(self, path: str, root: typing.Optional[str]) -> None:
+        super().__init__(root)
+        self.path = path
+        self._temporary_path = "{}.{}.tmp".format(path, os.getpid())
+        self._file = open(self._temporary_path, 'wb', _BUFFER_SIZE)
+        self._mtime = time.time()
+
+    def _finish(self) -> None:
+        """Writes whatever the format needs after the last output."""
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        try:
+            self._finish()
+        finally:
+            self._file.close()
+        os.replace(self._temporary_path, self.path)
+
+    def discard(self) -> None:
+        if self._file.closed:
+            return
+        try:
+            # Finished all the same, so that the format lets go of the file,
+            # whose content no longer matters, nor whether it can be.
+            self._finish()
+        except Exception:
+            pass
+        finally:
+            self._file.close()
+            os.remove(self._temporary_path)
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+class _TarArchive(_ArchiveFile):
+    def __init__(self, path: str, mode: str,
+                 root: typing.Optional[str]) -> None:
+        super().__init__(path, root)
+        # Imported only once an archive is written, as are zipfile and the
+        # compression modules they load, which make up most of the startup
+        # time of a build that writes none.
+        import tarfile
+        self._tarfile = tarfile
+        # A stream mode, which never seeks, and compresses as it goes.
+        self._tar = tarfile.open(fileobj=self._file, mode=mode,
+                                 format=tarfile.PAX_FORMAT)
+
+    def _write(self, name: str, data: bytes) -> None:
+        member = self._tarfile.TarInfo(name)
+        member.size = len(data)
+        member.mtime = self._mtime
+        member.mode = 0o644
+        self._tar.addfile(member, io.BytesIO(data))
+
+    def _finish(self) -> None:
+        self._tar.close()
+
+
+class _AppendOnlyFile:
+    """A file zipfile cannot seek in, so that it writes every member in one
+    go, sizes after the data, rather than going back to fill in its header.
+    """
+
+    def __init__(self, file: typing.BinaryIO) -> None:
+        self.write = file.write
+        self.flush = file.flush
+        self.tell = file.tell
+
+    def seek(self, *args) -> int:
+        raise OSError("append only")
+
+
+class _ZipArchive(_ArchiveFile):
+    def __init__(self, path: str, root: typing.Optional[str]) -> None:
+        super().__init__(path, root)
+        import zipfile
+        self._zipfile = zipfile
+        self._zip = zipfile.ZipFile(_AppendOnlyFile(self._file), 'w',
+                                    zipfile.ZIP_DEFLATED)
+        self._date_time = time.localtime(self._mtime)[:6]
+
+    def _write(self, name: str, data: bytes) -> None:
+        member = self._zipfile.ZipInfo(name, self._date_time)
+        member.compress_type = self._zipfile.ZIP_DEFLATED
+        member.external_attr = 0o644 << 16
+        self._zip.writestr(member, data)
+
+    def _finish(self) -> None:
+        self._zip.close()
+
+
+def open_archive(path: str, root: typing.Optional[str] = None) -> \
+        BuildArchive:
+    """
+    Args:
+        path (str): the path of the archive, whose suffix, one of
+            ARCHIVE_SUFFIXES, says its format, or STDOUT for records on
+            stdout.
+        root (typing.Optional[str]): as in BuildArchive.
+
+    Returns:
+        BuildArchive: the archive, to write outputs to.
+
+    Raises:
+        ValueError: if the suffix of the path is not an archive format.
+    """
+    if path == STDOUT:
+        return RecordStream(sys.stdout.buffer, root)
+    lower_path = path.lower()
+    for suffix, mode in ARCHIVE_SUFFIXES.items():
+        if lower_path.endswith(suffix):
+            if mode is None:
+                return _ZipArchive(path, root)
+            return _TarArchive(path, mode, root)
+    raise ValueError("Unknown archive format of {}, expected one of {}."
+                     .format(path, ", ".join(ARCHIVE_SUFFIXES)))
+
+
+def read_records(input_stream: typing.BinaryIO) -> \
+        typing.Iterator[typing.Tuple[str, bytes]]:
+    """Reads back the records a RecordStream wrote.
+
+    Args:
+        input_stream (typing.BinaryIO): the stream to read from.
+
+    Yields:
+        typing.Tuple[str, bytes]: the name and data of every output.
+
+    Raises:
+        ValueError: if the stream ends in the middle of a record.
+    """
+    while True:
+        header = input_stream.read(RECORD_HEADER.size)
+        if not header:
+            return
+        if len(header) < RECORD_HEADER.size:
+            raise ValueError("Truncated record header.")
+        name_length, data_length = RECORD_HEADER.unpack(header)
+        name = input_stream.read(name_length)
+        data = input_stream.read(data_length)
+        if len(name) < name_length or len(data) < data_length:
+            raise ValueError("Truncated record.")
+        yield name.decode("utf-8"), data
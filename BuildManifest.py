@@ -0,0 +1,139 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import os
+import threading
+import typing
+
+MANIFEST_FILENAME = ".jackanalyzer-manifest.json"
+_MANIFEST_FORMAT = 2  # Bumped whenever the layout of the manifest changes.
+
+
+def file_hash(path: str) -> typing.Optional[str]:
+    """
+    Args:
+        path (str): path of a file.
+
+    Returns:
+        typing.Optional[str]: the hex SHA-256 digest of the file's content,
+        or None if the file cannot be read.
+    """
+    import hashlib  # Only incremental builds need it, as json below.
+    try:
+        with open(path, 'rb') as file:
+            return hashlib.sha256(file.read()).hexdigest()
+    except OSError:
+        return None
+
+
+class BuildManifest:
+    """Remembers what every output in a directory was built from, so that
+    outputs whose inputs did not change need not be built again.
+
+    For every source file the manifest records the hash of its content, the
+    analyzer version that compiled it, and the names and hashes of the outputs
+    it produced. It is stored as JSON, in MANIFEST_FILENAME beside the outputs.
+    """
+
+    def __init__(self, directory: str, analyzer_version: str) -> None:
+        """Loads the manifest of a directory, or starts an empty one.
+
+        Args:
+            directory (str): the directory holding the sources and outputs.
+            analyzer_version (str): the version of the running analyzer.
+                Entries recorded by any other version are out of date.
+        """
+        self.directory = directory
+        self.analyzer_version = analyzer_version
+        self.path = os.path.join(directory, MANIFEST_FILENAME)
+        self.entries = {}
+        self._source_hashes = {}
+        import json
+        try:
+            with open(self.path, 'r') as manifest_file:
+                manifest = json.load(manifest_file)
+            if manifest.get("format") == _MANIFEST_FORMAT:
+                self.entries = manifest["files"]
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass  # A missing or corrupt manifest just means a full build.
+        self._dirty = False
+
+    def is_up_to_date(self, input_path: str,
+                      output_paths: typing.List[str]) -> bool:
+        """
+        Args:
+            input_path (str): path of a source file in the directory.
+            output_paths (typing.List[str]): paths of the outputs built from
+                it.
+
+        Returns:
+            bool: True if exactly these outputs exist and were built by this
+            analyzer version from the source's current content, and have not
+            been modified since.
+        """
+        entry = self.entries.get(os.path.basename(input_path))
+        source_hash = file_hash(input_path)
+        self._source_hashes[input_path] = source_hash
+        return (entry is not None
+                and source_hash is not None
+                and entry["source"] == source_hash
+                and entry["analyzer"] == self.analyzer_version
+                and entry["outputs"].keys() == {
+                    os.path.basename(output_path)
+                    for output_path in output_paths}
+                and all(entry["outputs"][os.path.basename(output_path)]
+                        == file_hash(output_path)
+                        for output_path in output_paths))
+
+    def record(self, input_path: str,
+               output_paths: typing.List[str]) -> None:
+        """Records that outputs were just built from a source.
+
+        The source hash recorded is the one is_up_to_date() saw, if it was
+        called, so a source edited during the build is rebuilt next time.
+
+        Args:
+            input_path (str): path of the source file.
+            output_paths (typing.List[str]): paths of the outputs built from
+                it.
+        """
+        source_hash = self._source_hashes.pop(input_path, None)
+        if source_hash is None:
+            source_hash = file_hash(input_path)
+        self.entries[os.path.basename(input_path)] = {
+            "source": source_hash,
+            "analyzer": self.analyzer_version,
+            "outputs": {os.path.basename(output_path): file_hash(output_path)
+                        for output_path in output_paths},
+        }
+        self._dirty = True
+
+    def forget(self, input_path: str) -> None:
+        """Drops the entry of a source, so that it is built next time.
+
+        Args:
+            input_path (str): path of the source file.
+        """
+        if self.entries.pop(os.path.basename(input_path), None) is not None:
+            self._dirty = True
+
+    def save(self) -> None:
+        """Writes the manifest back to disk, if it changed.
+
+        The manifest is written to a temporary file that then replaces the old
+        one, so an interrupted build never leaves a truncated manifest.
+        """
+        if not self._dirty:
+            return
+        import json
+        temporary_path = "{}.{}.{}.tmp".format(
+            self.path, os.getpid(), threading.get_ident())
+        with open(temporary_path, 'w') as manifest_file:
+            json.dump({"format": _MANIFEST_FORMAT, "files": self.entries},
+                      manifest_file, indent=1, sort_keys=True)
+        os.replace(temporary_path, self.path)
+        self._dirty = False
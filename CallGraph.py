@@ -0,0 +1,117 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+
+The call graph of a whole program, to leave out the subroutines a run of
+the program can never call.
+"""
+import io
+import typing
+from JackAST import Class
+from VMWriter import VMWriter
+
+# The subroutines a program starts from: Sys.init, if the program has its
+# own Sys class, and Main.main, which the Sys.init of the Jack OS calls.
+ENTRY_POINTS = ("Sys.init", "Main.main")
+# The classes of the Jack OS. Their subroutines call each other, so all the
+# subroutines of a class of the program that replaces one of them are kept.
+OS_CLASSES = frozenset((
+    "Array", "Keyboard", "Math", "Memory", "Output", "Screen", "String",
+    "Sys"))
+
+
+class CallGraph:
+    """Which subroutines every subroutine of a program calls, by their full
+    names, as "Class.subroutine".
+
+    The calls are read off the VM code VMWriter compiles every class into,
+    so that every call resolves to the subroutine the compiled code calls,
+    whatever the receiver is, and the calls VMWriter adds itself, to
+    Math.multiply or String.new for instance, count too.
+    """
+
+    def __init__(self) -> None:
+        self.calls = {}  # The full names a subroutine calls, by its name.
+        self.classes = {}  # The full names of the subroutines of a class.
+
+    def add_class(self, tree: Class) -> None:
+        """Adds the subroutines of a class, and the calls they make.
+
+        Args:
+            tree (Class): the class.
+
+        Raises:
+            ValueError: if the class does not compile into VM code.
+        """
+        code = io.StringIO()
+        VMWriter(code).write_class(tree)
+        subroutines = self.classes.setdefault(tree.name, [])
+        calls = None
+        for line in code.getvalue().splitlines():
+            if line.startswith("function "):
+                name = line.split()[1]
+                subroutines.append(name)
+                calls = self.calls[name] = set()
+            elif line.startswith("call "):
+                calls.add(line.split()[1])
+
+    def roots(self) -> typing.List[str]:
+        """
+        Returns:
+            typing.List[str]: the subroutines a run of the program may start
+            from, or that the Jack OS may call.
+
+        Raises:
+            ValueError: if the program has no entry point.
+        """
+        roots = [name for name in ENTRY_POINTS if name in self.calls]
+        if not roots:
+            raise ValueError("The program has neither {}.".format(
+                " nor ".join(ENTRY_POINTS)))
+        for class_name in OS_CLASSES.intersection(self.classes):
+            roots.extend(self.classes[class_name])
+        return roots
+
+    def reachable(self) -> typing.Set[str]:
+        """
+        Returns:
+            typing.Set[str]: the full names of the subroutines of the program
+            that a run of it may call, from the roots on.
+
+        Raises:
+            ValueError: if the program has no entry point.
+        """
+        calls = self.calls
+        reached = set()
+        pending = self.roots()
+        while pending:
+            name = pending.pop()
+            if name in reached or name not in calls:
+                continue  # Seen already, or not part of the program.
+            reached.add(name)
+            pending.extend(calls[name])
+        return reached
+
+
+def prune(tree: Class, reachable: typing.Set[str]) -> typing.Optional[Class]:
+    """
+    Args:
+        tree (Class): a class of a program.
+        reachable (typing.Set[str]): the subroutines of the program a run of
+            it may call, as CallGraph.reachable() gives them.
+
+    Returns:
+        typing.Optional[Class]: the class without the subroutines that are
+        not reachable, or None if none of its subroutines is.
+    """
+    subroutine_decs = [
+        subroutine for subroutine in tree.subroutine_decs
+        if tree.name + "." + subroutine.name in reachable]
+    if not subroutine_decs:
+        return None
+    if len(subroutine_decs) == len(tree.subroutine_decs):
+        return tree
+    return Class(tree.name, tree.class_var_decs, subroutine_decs)
@@ -1,509 +1,758 @@
-"""
-This file is part of nand2tetris, as taught in The Hebrew University, and
-was written by Aviv Yaish. It is an extension to the specifications given
-[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
-as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
-Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
-"""
-import typing
-import xml.etree.ElementTree as ET
-import JackTokenizer
-
-
-class CompilationEngine:
-    """Gets input from a JackTokenizer and emits its parsed structure into an
-    output stream.
-    """
-
-    def __init__(self, input_stream: "JackTokenizer", output_stream) -> None:
-        """
-        Creates a new compilation engine with the given input and output. The
-        next routine called must be compileClass()
-        :param input_stream: The input stream.
-        :param output_stream: The output stream.
-        """
-        # Your code goes here!
-        # Note that you can write to output_stream like so:
-        # output_stream.write("Hello world! \n")
-        class Token:
-            def __init__(self, tag, text):
-                self.tag = tag
-                self.text = text
-
-        xml_file = "tmp.xml"
-        tree = ET.parse(xml_file)
-        root = tree.getroot()
-        self.output_stream = output_stream
-        self.tokenizer = input_stream
-        self.tokens = [Token(token.tag, token.text.strip()) for token in root]
-        self.current_token_index = 0
-
-    def compile_class(self) -> None:
-        """Compiles a complete class."""
-        # Your code goes here!
-        if self.tokens[self.current_token_index].tag != "KEYWORD" or self.tokens[self.current_token_index].text != "CLASS":
-            raise ValueError("Expected a class declaration")
-        self.output_stream.write("<class>\n")
-        self.output_stream.write("<keyword> class </keyword>\n")
-        self.current_token_index += 1
-        if self.tokens[self.current_token_index].tag != "IDENTIFIER":
-            raise ValueError("Expected an identifier.")
-        self.output_stream.write("<identifier> {} </identifier>\n".format(self.tokens[self.current_token_index].text))
-        self.current_token_index += 1
-        if self.tokens[self.current_token_index].tag != "SYMBOL" or self.tokens[self.current_token_index].text != "{":
-            raise ValueError("Expected an opening curly bracket.")
-        self.output_stream.write("<symbol> { </symbol>\n")
-        self.current_token_index += 1
-        self.compile_class_var_dec()
-        self.compile_subroutine()
-        if self.tokens[self.current_token_index].tag != "SYMBOL" or self.tokens[self.current_token_index].text != "}":
-            raise ValueError("Expected a closing curly bracket.")
-        self.output_stream.write("<symbol> } </symbol>\n")
-        self.current_token_index += 1
-        self.output_stream.write("</class>\n")
-
-    def compile_class_var_dec(self) -> None:
-        """Compiles a static declaration or a field declaration."""
-        # Your code goes here!
-        if self.tokens[self.current_token_index].tag != "KEYWORD" or self.tokens[self.current_token_index].text not in ["STATIC", "FIELD"]:
-            return
-        self.output_stream.write("<classVarDec>\n")
-        self.output_stream.write("<keyword> {} </keyword>\n".format(self.tokens[self.current_token_index].text).lower())
-        self.current_token_index += 1
-        if self.tokens[self.current_token_index].tag not in ["KEYWORD", "IDENTIFIER"]:
-            raise ValueError("Expected a type.")
-        if self.tokens[self.current_token_index].text.upper() not in ["INT", "CHAR", "BOOLEAN"]:
-            self.output_stream.write("<identifier> {} </identifier>\n".format(self.tokens[self.current_token_index].text))
-        else:
-            self.output_stream.write("<keyword> {} </keyword>\n".format(self.tokens[self.current_token_index].text).lower())
-        self.current_token_index += 1
-        if self.tokens[self.current_token_index].tag != "IDENTIFIER":
-            raise ValueError("Expected an identifier.")
-        self.output_stream.write("<identifier> {} </identifier>\n".format(self.tokens[self.current_token_index].text))
-        self.current_token_index += 1
-        while self.tokens[self.current_token_index].tag == "SYMBOL" and self.tokens[self.current_token_index].text == ",":
-            self.output_stream.write("<symbol> , </symbol>\n")
-            self.current_token_index += 1
-            if self.tokens[self.current_token_index].tag != "IDENTIFIER":
-                raise ValueError("Expected an identifier.")
-            self.output_stream.write("<identifier> {} </identifier>\n".format(self.tokens[self.current_token_index].text))
-            self.current_token_index += 1
-        if self.tokens[self.current_token_index].tag != "SYMBOL" or self.tokens[self.current_token_index].text != ";":
-            raise ValueError("Expected a semicolon.")
-        self.output_stream.write("<symbol> ; </symbol>\n")
-        self.current_token_index += 1
-        self.output_stream.write("</classVarDec>\n")
-        self.compile_class_var_dec()
-
-    def compile_subroutine(self) -> None:
-        """
-        Compiles a complete method, function, or constructor.
-        You can assume that classes with constructors have at least one field,
-        you will understand why this is necessary in project 11.
-        """
-        # Your code goes here!
-        if self.tokens[self.current_token_index].tag not in ["KEYWORD", "IDENTIFIER"]:
-            return
-        self.output_stream.write("<subroutineDec>\n")
-        self.output_stream.write("<keyword> {} </keyword>\n".format(self.tokens[self.current_token_index].text).lower())
-        self.current_token_index += 1
-        if self.tokens[self.current_token_index].tag not in ["KEYWORD", "IDENTIFIER"]:
-            raise ValueError("Expected a type.")
-        if self.tokens[self.current_token_index].text.upper() not in ["INT", "CHAR", "BOOLEAN", "VOID"]:
-            self.output_stream.write("<identifier> {} </identifier>\n".format(self.tokens[self.current_token_index].text))
-        else:
-            self.output_stream.write("<keyword> {} </keyword>\n".format(self.tokens[self.current_token_index].text).lower())
-        self.current_token_index += 1
-        if self.tokens[self.current_token_index].tag != "IDENTIFIER":
-            raise ValueError("Expected an identifier.")
-        self.output_stream.write("<identifier> {} </identifier>\n".format(self.tokens[self.current_token_index].text))
-        self.current_token_index += 1
-        if self.tokens[self.current_token_index].tag != "SYMBOL" or self.tokens[self.current_token_index].text != "(":
-            raise ValueError("Expected an opening parenthesis.")
-        self.output_stream.write("<symbol> ( </symbol>\n")
-        self.current_token_index += 1
-        self.compile_parameter_list()
-        if self.tokens[self.current_token_index].tag != "SYMBOL" or self.tokens[self.current_token_index].text != ")":
-            raise ValueError("Expected a closing parenthesis.")
-        self.output_stream.write("<symbol> ) </symbol>\n")
-        self.current_token_index += 1
-        self.output_stream.write("<subroutineBody>\n")
-        if self.tokens[self.current_token_index].tag != "SYMBOL" or self.tokens[self.current_token_index].text != "{":
-            raise ValueError("Expected an opening curly bracket.")
-        self.output_stream.write("<symbol> { </symbol>\n")
-        self.current_token_index += 1
-        while self.tokens[self.current_token_index].tag == "KEYWORD" and self.tokens[self.current_token_index].text == "VAR":
-            self.compile_var_dec()
-        self.compile_statements()
-        if self.tokens[self.current_token_index].tag != "SYMBOL" or self.tokens[self.current_token_index].text != "}":
-            raise ValueError("Expected a closing curly bracket.")
-        self.output_stream.write("<symbol> } </symbol>\n")
-        self.current_token_index += 1
-        self.output_stream.write("</subroutineBody>\n")
-        self.output_stream.write("</subroutineDec>\n")
-        self.compile_subroutine()
-
-    def compile_parameter_list(self) -> None:
-        """Compiles a (possibly empty) parameter list, not including the 
-        enclosing "()".
-        """
-        # Your code goes here!
-        self.output_stream.write("<parameterList>\n")
-        if self.tokens[self.current_token_index].tag == "SYMBOL" and self.tokens[self.current_token_index].text == ")":
-            self.output_stream.write("</parameterList>\n")
-            return
-        if self.tokens[self.current_token_index].tag not in ["KEYWORD", "IDENTIFIER"]:
-            raise ValueError("Expected a type.")
-        if self.tokens[self.current_token_index].text.upper() not in ["INT", "CHAR", "BOOLEAN"]:
-            self.output_stream.write("<identifier> {} </identifier>\n".format(self.tokens[self.current_token_index].text))
-        else:
-            self.output_stream.write("<keyword> {} </keyword>\n".format(self.tokens[self.current_token_index].text).lower())
-        self.current_token_index += 1
-        if self.tokens[self.current_token_index].tag != "IDENTIFIER":
-            raise ValueError("Expected an identifier.")
-        self.output_stream.write("<identifier> {} </identifier>\n".format(self.tokens[self.current_token_index].text))
-        self.current_token_index += 1
-        while self.tokens[self.current_token_index].tag == "SYMBOL" and self.tokens[self.current_token_index].text == ",":
-            self.output_stream.write("<symbol> , </symbol>\n")
-            self.current_token_index += 1
-            if self.tokens[self.current_token_index].tag not in ["KEYWORD", "IDENTIFIER"]:
-                raise ValueError("Expected a type.")
-            if self.tokens[self.current_token_index].text.upper() not in ["INT", "CHAR", "BOOLEAN"]:
-                self.output_stream.write("<identifier> {} </identifier>\n".format(self.tokens[self.current_token_index].text))
-            else:
-                self.output_stream.write("<keyword> {} </keyword>\n".format(self.tokens[self.current_token_index].text).lower())
-            self.current_token_index += 1
-            if self.tokens[self.current_token_index].tag != "IDENTIFIER":
-                raise ValueError("Expected an identifier.")
-            self.output_stream.write("<identifier> {} </identifier>\n".format(self.tokens[self.current_token_index].text))
-            self.current_token_index += 1
-        self.output_stream.write("</parameterList>\n")
-
-    def compile_var_dec(self) -> None:
-        """Compiles a var declaration."""
-        # Your code goes here!
-        if self.tokens[self.current_token_index].tag != "KEYWORD" or self.tokens[self.current_token_index].text != "VAR":
-            return
-        self.output_stream.write("<varDec>\n")
-        self.output_stream.write("<keyword> var </keyword>\n")
-        self.current_token_index += 1
-        if self.tokens[self.current_token_index].tag not in ["KEYWORD", "IDENTIFIER"]:
-            raise ValueError("Expected a type.")
-        if self.tokens[self.current_token_index].tag == "KEYWORD" and self.tokens[self.current_token_index].text not in ["INT", "CHAR", "BOOLEAN"]:
-            raise ValueError("Expected a type.")
-        if self.tokens[self.current_token_index].tag == "IDENTIFIER":
-            self.output_stream.write("<identifier> {} </identifier>\n".format(self.tokens[self.current_token_index].text))
-        else:
-            self.output_stream.write("<keyword> {} </keyword>\n".format(self.tokens[self.current_token_index].text).lower())
-        self.current_token_index += 1
-        if self.tokens[self.current_token_index].tag != "IDENTIFIER":
-            raise ValueError("Expected an identifier.")
-        self.output_stream.write("<identifier> {} </identifier>\n".format(self.tokens[self.current_token_index].text))
-        self.current_token_index += 1
-        while self.tokens[self.current_token_index].tag == "SYMBOL" and self.tokens[self.current_token_index].text == ",":
-            self.output_stream.write("<symbol> , </symbol>\n")
-            self.current_token_index += 1
-            if self.tokens[self.current_token_index].tag != "IDENTIFIER":
-                raise ValueError("Expected an identifier.")
-            self.output_stream.write("<identifier> {} </identifier>\n".format(self.tokens[self.current_token_index].text))
-            self.current_token_index += 1
-        if self.tokens[self.current_token_index].tag != "SYMBOL" or self.tokens[self.current_token_index].text != ";":
-            raise ValueError("Expected a semicolon.")
-        self.output_stream.write("<symbol> ; </symbol>\n")
-        self.current_token_index += 1
-        self.output_stream.write("</varDec>\n")
-
-    def compile_statements(self) -> None:
-        """Compiles a sequence of statements, not including the enclosing 
-        "{}".
-        """
-        # Your code goes here!
-        self.output_stream.write("<statements>\n")
-        if self.tokens[self.current_token_index].tag != "KEYWORD" or self.tokens[self.current_token_index].text not in ["LET", "IF", "WHILE", "DO", "RETURN"]:
-            self.output_stream.write("</statements>\n")
-            return
-        while self.tokens[self.current_token_index].tag == "KEYWORD" and self.tokens[self.current_token_index].text in ["LET", "IF", "WHILE", "DO", "RETURN"]:
-            if self.tokens[self.current_token_index].text == "LET":
-                self.compile_let()
-            elif self.tokens[self.current_token_index].text == "IF":
-                self.compile_if()
-            elif self.tokens[self.current_token_index].text == "WHILE":
-                self.compile_while()
-            elif self.tokens[self.current_token_index].text == "DO":
-                self.compile_do()
-            elif self.tokens[self.current_token_index].text == "RETURN":
-                self.compile_return()
-        self.output_stream.write("</statements>\n")
-
-    def compile_do(self) -> None:
-        """Compiles a do statement."""
-        # Your code goes here!
-        if self.tokens[self.current_token_index].tag != "KEYWORD" or self.tokens[self.current_token_index].text != "DO":
-            raise ValueError("Expected a do statement.")
-        self.output_stream.write("<doStatement>\n")
-        self.output_stream.write("<keyword> do </keyword>\n")
-        self.current_token_index += 1
-        self.compile_subroutine_call()
-        if self.tokens[self.current_token_index].tag != "SYMBOL" or self.tokens[self.current_token_index].text != ";":
-            raise ValueError("Expected a semicolon.")
-        self.output_stream.write("<symbol> ; </symbol>\n")
-        self.current_token_index += 1
-        self.output_stream.write("</doStatement>\n")
-
-    def compile_let(self) -> None:
-        """Compiles a let statement."""
-        # Your code goes here!
-        if self.tokens[self.current_token_index].tag != "KEYWORD" or self.tokens[self.current_token_index].text != "LET":
-            raise ValueError("Expected a let statement.")
-        self.output_stream.write("<letStatement>\n")
-        self.output_stream.write("<keyword> let </keyword>\n")
-        self.current_token_index += 1
-        if self.tokens[self.current_token_index].tag != "IDENTIFIER":
-            raise ValueError("Expected an identifier.")
-        self.output_stream.write("<identifier> {} </identifier>\n".format(self.tokens[self.current_token_index].text))
-        self.current_token_index += 1
-        if self.tokens[self.current_token_index].tag != "SYMBOL" or self.tokens[self.current_token_index].text not in "[=":
-            raise ValueError("Expected an opening square bracket or an equal sign.")
-        if self.tokens[self.current_token_index].text == "[":
-            self.output_stream.write("<symbol> [ </symbol>\n")
-            self.current_token_index += 1
-            self.compile_expression()
-            if self.tokens[self.current_token_index].tag != "SYMBOL" or self.tokens[self.current_token_index].text != "]":
-                raise ValueError("Expected a closing square bracket.")
-            self.output_stream.write("<symbol> ] </symbol>\n")
-            self.current_token_index += 1
-        if self.tokens[self.current_token_index].tag != "SYMBOL" or self.tokens[self.current_token_index].text != "=":
-            raise ValueError("Expected an equal sign.")
-        self.output_stream.write("<symbol> = </symbol>\n")
-        self.current_token_index += 1
-        self.compile_expression()
-        if self.tokens[self.current_token_index].tag != "SYMBOL" or self.tokens[self.current_token_index].text != ";":
-            raise ValueError("Expected a semicolon.")
-        self.output_stream.write("<symbol> ; </symbol>\n")
-        self.current_token_index += 1
-        self.output_stream.write("</letStatement>\n")
-
-    def compile_while(self) -> None:
-        """Compiles a while statement."""
-        # Your code goes here!
-        if self.tokens[self.current_token_index].tag != "KEYWORD" or self.tokens[self.current_token_index].text != "WHILE":
-            raise ValueError("Expected a while statement.")
-        self.output_stream.write("<whileStatement>\n")
-        self.output_stream.write("<keyword> while </keyword>\n")
-        self.current_token_index += 1
-        if self.tokens[self.current_token_index].tag != "SYMBOL" or self.tokens[self.current_token_index].text != "(":
-            raise ValueError("Expected an opening parenthesis.")
-        self.output_stream.write("<symbol> ( </symbol>\n")
-        self.current_token_index += 1
-        self.compile_expression()
-        if self.tokens[self.current_token_index].tag != "SYMBOL" or self.tokens[self.current_token_index].text != ")":
-            raise ValueError("Expected a closing parenthesis.")
-        self.output_stream.write("<symbol> ) </symbol>\n")
-        self.current_token_index += 1
-        if self.tokens[self.current_token_index].tag != "SYMBOL" or self.tokens[self.current_token_index].text != "{":
-            raise ValueError("Expected an opening curly bracket.")
-        self.output_stream.write("<symbol> { </symbol>\n")
-        self.current_token_index += 1
-        self.compile_statements()
-        if self.tokens[self.current_token_index].tag != "SYMBOL" or self.tokens[self.current_token_index].text != "}":
-            raise ValueError("Expected a closing curly bracket.")
-        self.output_stream.write("<symbol> } </symbol>\n")
-        self.current_token_index += 1
-        self.output_stream.write("</whileStatement>\n")
-
-    def compile_return(self) -> None:
-        """Compiles a return statement."""
-        # Your code goes here!
-        if self.tokens[self.current_token_index].tag != "KEYWORD" or self.tokens[self.current_token_index].text != "RETURN":
-            raise ValueError("Expected a return statement.")
-        self.output_stream.write("<returnStatement>\n")
-        self.output_stream.write("<keyword> return </keyword>\n")
-        self.current_token_index += 1
-        if self.tokens[self.current_token_index].tag != "SYMBOL" or self.tokens[self.current_token_index].text != ";":
-            self.compile_expression()
-        if self.tokens[self.current_token_index].tag != "SYMBOL" or self.tokens[self.current_token_index].text != ";":
-            raise ValueError("Expected a semicolon.")
-        self.output_stream.write("<symbol> ; </symbol>\n")
-        self.current_token_index += 1
-        self.output_stream.write("</returnStatement>\n")
-
-    def compile_if(self) -> None:
-        """Compiles a if statement, possibly with a trailing else clause."""
-        # Your code goes here!
-        if self.tokens[self.current_token_index].tag != "KEYWORD" or self.tokens[self.current_token_index].text != "IF":
-            raise ValueError("Expected an if statement.")
-        self.output_stream.write("<ifStatement>\n")
-        self.output_stream.write("<keyword> if </keyword>\n")
-        self.current_token_index += 1
-        if self.tokens[self.current_token_index].tag != "SYMBOL" or self.tokens[self.current_token_index].text != "(":
-            raise ValueError("Expected an opening parenthesis.")
-        self.output_stream.write("<symbol> ( </symbol>\n")
-        self.current_token_index += 1
-        self.compile_expression()
-        if self.tokens[self.current_token_index].tag != "SYMBOL" or self.tokens[self.current_token_index].text != ")":
-            raise ValueError("Expected a closing parenthesis.")
-        self.output_stream.write("<symbol> ) </symbol>\n")
-        self.current_token_index += 1
-        if self.tokens[self.current_token_index].tag != "SYMBOL" or self.tokens[self.current_token_index].text != "{":
-            raise ValueError("Expected an opening curly bracket.")
-        self.output_stream.write("<symbol> { </symbol>\n")
-        self.current_token_index += 1
-        self.compile_statements()
-        if self.tokens[self.current_token_index].tag != "SYMBOL" or self.tokens[self.current_token_index].text != "}":
-            raise ValueError("Expected a closing curly bracket.")
-        self.output_stream.write("<symbol> } </symbol>\n")
-        self.current_token_index += 1
-        if self.tokens[self.current_token_index].tag == "KEYWORD" and self.tokens[self.current_token_index].text == "ELSE":
-            self.output_stream.write("<keyword> else </keyword>\n")
-            self.current_token_index += 1
-            if self.tokens[self.current_token_index].tag != "SYMBOL" or self.tokens[self.current_token_index].text != "{":
-                raise ValueError("Expected an opening curly bracket.")
-            self.output_stream.write("<symbol> { </symbol>\n")
-            self.current_token_index += 1
-            self.compile_statements()
-            if self.tokens[self.current_token_index].tag != "SYMBOL" or self.tokens[self.current_token_index].text != "}":
-                raise ValueError("Expected a closing curly bracket.")
-            self.output_stream.write("<symbol> } </symbol>\n")
-            self.current_token_index += 1
-        self.output_stream.write("</ifStatement>\n")
-
-    def compile_expression(self) -> None:
-        """Compiles an expression."""
-        # Your code goes here!
-        if self.tokens[self.current_token_index].tag not in ["INT_CONST", "STRING_CONST", "KEYWORD", "IDENTIFIER", "SYMBOL"]:
-            return
-        self.output_stream.write("<expression>\n")
-        self.compile_term()
-        while self.tokens[self.current_token_index].tag == "SYMBOL" and self.tokens[self.current_token_index].text in "+-*/&|<>=.":
-            if self.tokens[self.current_token_index].text == "<":
-                self.output_stream.write("<symbol> &lt; </symbol>\n")
-            elif self.tokens[self.current_token_index].text == ">":
-                self.output_stream.write("<symbol> &gt; </symbol>\n")
-            elif self.tokens[self.current_token_index].text == "&":
-                self.output_stream.write("<symbol> &amp; </symbol>\n")
-            else:
-                self.output_stream.write("<symbol> {} </symbol>\n".format(self.tokens[self.current_token_index].text))
-            self.current_token_index += 1
-            self.compile_term()
-        self.output_stream.write("</expression>\n")
-
-    def compile_term(self) -> None:
-        """Compiles a term. 
-        This routine is faced with a slight difficulty when
-        trying to decide between some of the alternative parsing rules.
-        Specifically, if the current token is an identifier, the routing must
-        distinguish between a variable, an array entry, and a subroutine call.
-        A single look-ahead token, which may be one of "[", "(", or "." suffices
-        to distinguish between the three possibilities. Any other token is not
-        part of this term and should not be advanced over.
-        """
-        # Your code goes here!
-        if self.tokens[self.current_token_index].tag not in ["INT_CONST", "STRING_CONST", "KEYWORD", "IDENTIFIER", "SYMBOL"]:
-            return
-        if self.tokens[self.current_token_index].tag == "INT_CONST":
-            self.output_stream.write("<term>\n")
-            self.output_stream.write("<integerConstant> {} </integerConstant>\n".format(int(self.tokens[self.current_token_index].text)))
-            self.current_token_index += 1
-            self.output_stream.write("</term>\n")
-        elif self.tokens[self.current_token_index].tag == "STRING_CONST":
-            self.output_stream.write("<term>\n")
-            self.output_stream.write("<stringConstant> {} </stringConstant>\n".format(self.tokens[self.current_token_index].text))
-            self.current_token_index += 1
-            self.output_stream.write("</term>\n")
-        elif self.tokens[self.current_token_index].tag == "KEYWORD" and self.tokens[self.current_token_index].text in ["TRUE", "FALSE", "NULL", "THIS"]:
-            self.output_stream.write("<term>\n")
-            self.output_stream.write("<keyword> {} </keyword>\n".format(self.tokens[self.current_token_index].text).lower())
-            self.current_token_index += 1
-            self.output_stream.write("</term>\n")
-        elif self.tokens[self.current_token_index].tag == "SYMBOL" and self.tokens[self.current_token_index].text in "-~":
-            self.output_stream.write("<term>\n")
-            self.output_stream.write("<symbol> {} </symbol>\n".format(self.tokens[self.current_token_index].text))
-            self.current_token_index += 1
-            self.compile_term()
-            self.output_stream.write("</term>\n")
-        elif self.tokens[self.current_token_index].tag == "SYMBOL" and self.tokens[self.current_token_index].text == "(":
-            self.output_stream.write("<term>\n")
-            self.output_stream.write("<symbol> ( </symbol>\n")
-            self.current_token_index += 1
-            self.compile_expression()
-            if self.tokens[self.current_token_index].tag != "SYMBOL" or self.tokens[self.current_token_index].text != ")":
-                raise ValueError("Expected a closing parenthesis.")
-            self.output_stream.write("<symbol> ) </symbol>\n")
-            self.current_token_index += 1
-            self.output_stream.write("</term>\n")
-        elif self.tokens[self.current_token_index].tag == "IDENTIFIER":
-            self.output_stream.write("<term>\n")
-            self.output_stream.write("<identifier> {} </identifier>\n".format(self.tokens[self.current_token_index].text))
-            self.current_token_index += 1
-            if self.tokens[self.current_token_index].tag == "SYMBOL" and self.tokens[self.current_token_index].text in "[(.":
-                if self.tokens[self.current_token_index].text == "[":
-                    self.output_stream.write("<symbol> [ </symbol>\n")
-                    self.current_token_index += 1
-                    self.compile_expression()
-                    if self.tokens[self.current_token_index].tag != "SYMBOL" or self.tokens[self.current_token_index].text != "]":
-                        raise ValueError("Expected a closing square bracket.")
-                    self.output_stream.write("<symbol> ] </symbol>\n")
-                    self.current_token_index += 1
-                elif self.tokens[self.current_token_index].text == "(":
-                    self.output_stream.write("<symbol> ( </symbol>\n")
-                    self.current_token_index += 1
-                    self.compile_expression_list()
-                    if self.tokens[self.current_token_index].tag != "SYMBOL" or self.tokens[self.current_token_index].text != ")":
-                        raise ValueError("Expected a closing parenthesis.")
-                    self.output_stream.write("<symbol> ) </symbol>\n")
-                    self.current_token_index += 1
-                elif self.tokens[self.current_token_index].text == ".":
-                    self.output_stream.write("<symbol> . </symbol>\n")
-                    self.current_token_index += 1
-                    if self.tokens[self.current_token_index].tag != "IDENTIFIER":
-                        raise ValueError("Expected an identifier.")
-                    self.output_stream.write("<identifier> {} </identifier>\n".format(self.tokens[self.current_token_index].text))
-                    self.current_token_index += 1
-                    if self.tokens[self.current_token_index].tag != "SYMBOL" or self.tokens[self.current_token_index].text != "(":
-                        raise ValueError("Expected an opening parenthesis.")
-                    self.output_stream.write("<symbol> ( </symbol>\n")
-                    self.current_token_index += 1
-                    self.compile_expression_list()
-                    if self.tokens[self.current_token_index].tag != "SYMBOL" or self.tokens[self.current_token_index].text != ")":
-                        raise ValueError("Expected a closing parenthesis.")
-                    self.output_stream.write("<symbol> ) </symbol>\n")
-                    self.current_token_index += 1
-            self.output_stream.write("</term>\n")
-
-    def compile_expression_list(self) -> None:
-        """Compiles a (possibly empty) comma-separated list of expressions."""
-        # Your code goes here!
-        self.output_stream.write("<expressionList>\n")
-        if self.tokens[self.current_token_index].tag == "SYMBOL" and self.tokens[self.current_token_index].text == ")":
-            self.output_stream.write("</expressionList>\n")
-            return
-        self.compile_expression()
-        while self.tokens[self.current_token_index].tag == "SYMBOL" and self.tokens[self.current_token_index].text == ",":
-            self.output_stream.write("<symbol> , </symbol>\n")
-            self.current_token_index += 1
-            self.compile_expression()
-        self.output_stream.write("</expressionList>\n")
-
-    def compile_subroutine_call(self) -> None:
-        """Compiles a subroutine call."""
-        # Your code goes here!
-        if self.tokens[self.current_token_index].tag != "IDENTIFIER":
-            raise ValueError("Expected an identifier.")
-        self.output_stream.write("<identifier> {} </identifier>\n".format(self.tokens[self.current_token_index].text))
-        self.current_token_index += 1
-        if self.tokens[self.current_token_index].tag == "SYMBOL" and self.tokens[self.current_token_index].text == ".":
-            self.output_stream.write("<symbol> . </symbol>\n")
-            self.current_token_index += 1
-            if self.tokens[self.current_token_index].tag != "IDENTIFIER":
-                raise ValueError("Expected an identifier.")
-            self.output_stream.write("<identifier> {} </identifier>\n".format(self.tokens[self.current_token_index].text))
-            self.current_token_index += 1
-        if self.tokens[self.current_token_index].tag != "SYMBOL" or self.tokens[self.current_token_index].text != "(":
-            raise ValueError("Expected an opening parenthesis.")
-        self.output_stream.write("<symbol> ( </symbol>\n")
-        self.current_token_index += 1
-        self.compile_expression_list()
-        if self.tokens[self.current_token_index].tag != "SYMBOL" or self.tokens[self.current_token_index].text != ")":
-            raise ValueError("Expected a closing parenthesis.")
-        self.output_stream.write("<symbol> ) </symbol>\n")
-        self.current_token_index += 1
\ No newline at end of file
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+import JackAST
+import JackTokenizer
+from JackErrors import MAX_ERRORS, JackSyntaxError
+from JackSerializers import XMLSerializer
+from JackTokenizer import (
+    _KEYWORD_LIST, KEYWORD, SYMBOL, IDENTIFIER, INT_CONST, STRING_CONST, CLASS,
+    CONSTRUCTOR, FUNCTION, METHOD, FIELD, STATIC, VAR, INT, CHAR, BOOLEAN,
+    TRUE, FALSE, NULL, THIS, LET, DO, IF, ELSE, WHILE, RETURN)
+
+# Symbol codes the parser looks for.
+(_LEFT_CURLY, _RIGHT_CURLY, _LEFT_PAREN, _RIGHT_PAREN, _LEFT_SQUARE,
+ _RIGHT_SQUARE, _DOT, _COMMA, _SEMICOLON, _EQUALS) = map(ord, '{}()[].,;=')
+_OPS = frozenset(map(ord, '+-*/&|<>=.'))
+_UNARY_OPS = frozenset(map(ord, '-~'))
+_TERM_START_SYMBOLS = _UNARY_OPS | {_LEFT_PAREN}
+
+# Keyword codes grouped the way the grammar uses them.
+_TYPES = frozenset((INT, CHAR, BOOLEAN))
+_SUBROUTINE_KINDS = frozenset((CONSTRUCTOR, FUNCTION, METHOD))
+_CLASS_VAR_KINDS = frozenset((STATIC, FIELD))
+_STATEMENTS = frozenset((LET, IF, WHILE, DO, RETURN))
+_CLASS_MEMBERS = _CLASS_VAR_KINDS | _SUBROUTINE_KINDS
+# Keywords that start something a statement that failed to parse can be
+# skipped up to.
+_STATEMENT_RESUMES = _STATEMENTS | _CLASS_MEMBERS | {VAR}
+_KEYWORD_CONSTANTS = frozenset((TRUE, FALSE, NULL, THIS))
+
+# Kinds of the frames _compile_expression() keeps on its stack.
+_UNARY_FRAME, _PAREN_FRAME, _INDEX_FRAME, _CALL_FRAME = range(4)
+
+
+class CompilationEngine:
+    """Gets input from a JackTokenizer, builds its syntax tree out of the
+    nodes in JackAST, and serializes the tree into an output stream.
+
+    Syntax errors are JackSyntaxErrors, at the position of the token they
+    were found at. compile_class() does not stop at the first one: it records
+    it in self.errors, skips ahead to the next statement or class member,
+    and goes on, in panic mode, so that a single pass finds all the errors.
+    It raises them all, along with those of the tokenizer, once done.
+    """
+
+    def __init__(self, input_stream: "JackTokenizer", output_stream,
+                 serializer=None, lazy: bool = False) -> None:
+        """
+        Creates a new compilation engine with the given input and output. The
+        next routine called must be compileClass()
+        :param input_stream: The input stream.
+        :param output_stream: The output stream, or None to only build the
+            syntax tree.
+        :param serializer: What compileClass() writes the syntax tree with,
+            one of the serializers in JackSerializers. Defaults to an
+            XMLSerializer writing to output_stream.
+        :param lazy: Pull tokens from the tokenizer one at a time as they are
+            parsed, rather than lexing the whole input first, and serialize
+            every class member as soon as it is parsed. Together with a
+            streaming tokenizer, memory is then bounded by the largest class
+            member rather than by the input.
+        """
+        # Your code goes here!
+        # Note that you can write to output_stream like so:
+        # output_stream.write("Hello world! \n")
+        self.output_stream = output_stream
+        if serializer is None and output_stream is not None:
+            serializer = XMLSerializer(output_stream)
+        self.serializer = serializer
+        self.lazy = lazy
+        self.tokenizer = input_stream
+        self.errors = []
+        if lazy:
+            self.tokens = self.kinds = self.codes = None
+            self._advance = self._advance_lazily
+            self._text = self._text_lazily
+            self._position = self._position_lazily
+            self._line = self._column = 1
+        else:
+            self.tokens = input_stream.token_stream()
+            self.kinds = self.tokens.kinds
+            self.codes = self.tokens.codes
+        self.current_token_index = -1
+        self._advance()
+
+    def _advance(self) -> None:
+        """Moves on to the next token, caching its kind and code in self.kind
+        and self.code. Both are None once all tokens have been consumed.
+        """
+        self.current_token_index += 1
+        if self.current_token_index < len(self.kinds):
+            self.kind = self.kinds[self.current_token_index]
+            self.code = self.codes[self.current_token_index]
+        else:
+            self.kind = self.code = None
+
+    def _advance_lazily(self) -> None:
+        """_advance() in lazy mode, which consumes the next token from the
+        tokenizer.
+        """
+        self.current_token_index += 1
+        token = self.tokenizer.consume()
+        if token is None:
+            if self.kind is not None:
+                self._column += len(self._current_text)
+            self.kind = self.code = self._current_text = None
+        else:
+            (self.kind, self.code, self._current_text, self._line,
+             self._column) = token
+
+    def _text(self) -> str:
+        """
+        Returns:
+            str: the text of the current token.
+        """
+        return self.tokens.text(self.current_token_index)
+
+    def _text_lazily(self) -> str:
+        """_text() in lazy mode."""
+        return self._current_text
+
+    def _position(self) -> typing.Tuple[int, int]:
+        """
+        Returns:
+            typing.Tuple[int, int]: the line and column of the current token,
+            or of the end of the last token once all have been consumed.
+        """
+        tokens = self.tokens
+        if self.current_token_index < len(tokens):
+            return tokens.position(self.current_token_index)
+        if not len(tokens):
+            return 1, 1
+        last = len(tokens) - 1
+        line, column = tokens.position(last)
+        return line, column + tokens.ends[last] - tokens.starts[last]
+
+    def _position_lazily(self) -> typing.Tuple[int, int]:
+        """_position() in lazy mode."""
+        return self._line, self._column
+
+    def _error(self, message: str) -> JackSyntaxError:
+        """
+        Args:
+            message (str): what was expected at the current token.
+
+        Returns:
+            JackSyntaxError: the error, at the current token, saying what was
+            found there instead.
+        """
+        if self.kind is None:
+            found = "the end of the file"
+        elif self.kind == STRING_CONST:
+            found = '"{}"'.format(self._text())
+        else:
+            found = "'{}'".format(self._text())
+        line, column = self._position()
+        return JackSyntaxError(
+            "{}, found {}.".format(message.rstrip("."), found), line, column,
+            self.tokenizer.path)
+
+    def _record(self, error: JackSyntaxError) -> None:
+        """Records a syntax error, unless it is at the same position as the
+        last one, which it most likely follows from. Gives up by raising all
+        the errors if there are too many.
+        """
+        if self.errors and (self.errors[-1].line, self.errors[-1].column) == \
+                (error.line, error.column):
+            return
+        self.errors.append(error)
+        if len(self.errors) + len(self.tokenizer.errors) >= MAX_ERRORS:
+            raise JackSyntaxError.collect(self.errors + self.tokenizer.errors)
+
+    def _recover(self, error: JackSyntaxError, in_class: bool) -> None:
+        """Records a syntax error, and skips the tokens after it up to where
+        parsing can resume, skipping whole blocks between curly brackets.
+
+        Args:
+            error (JackSyntaxError): the error.
+            in_class (bool): the error is in a class member rather than in a
+                statement. Parsing resumes at the next class member, or at
+                the closing curly bracket of the class. Otherwise, it resumes
+                after the next semicolon, at the next keyword a statement, or
+                a class member, starts with, or at the closing curly bracket
+                of the block.
+        """
+        self._record(error)
+        resumes = _CLASS_MEMBERS if in_class else _STATEMENT_RESUMES
+        depth = 0
+        while self.kind is not None:
+            if self.kind == SYMBOL:
+                if self.code == _LEFT_CURLY:
+                    depth += 1
+                elif self.code == _RIGHT_CURLY:
+                    if not depth:
+                        return
+                    depth -= 1
+                elif self.code == _SEMICOLON and not depth and not in_class:
+                    self._advance()
+                    return
+            elif self.kind == KEYWORD and self.code in resumes and not depth:
+                return
+            self._advance()
+
+    def _starts_term(self) -> bool:
+        """
+        Returns:
+            bool: whether the current token can start a term, and so an
+            expression.
+        """
+        if self.kind == SYMBOL:
+            return self.code in _TERM_START_SYMBOLS
+        if self.kind == KEYWORD:
+            return self.code in _KEYWORD_CONSTANTS
+        return self.kind in (IDENTIFIER, INT_CONST, STRING_CONST)
+
+    def _type(self) -> str:
+        """Consumes a type, which is any keyword or identifier: only var
+        declarations insist on the keyword being a built-in type.
+
+        Returns:
+            str: the type.
+        """
+        if self.kind == KEYWORD:
+            type_name = _KEYWORD_LIST[self.code]
+        elif self.kind == IDENTIFIER:
+            type_name = self._text()
+        else:
+            raise self._error("Expected a type.")
+        self._advance()
+        return type_name
+
+    def _identifier(self) -> str:
+        """Consumes an identifier.
+
+        Returns:
+            str: the identifier.
+        """
+        if self.kind != IDENTIFIER:
+            raise self._error("Expected an identifier.")
+        name = self._text()
+        self._advance()
+        return name
+
+    def compile_class(self) -> typing.Optional[JackAST.Class]:
+        """Compiles a complete class.
+
+        Returns:
+            typing.Optional[JackAST.Class]: the syntax tree of the class,
+            which has also been serialized if the engine has a serializer. In
+            lazy mode with a serializer, the members of the class are
+            serialized as they are parsed and then dropped, so None is
+            returned instead.
+        """
+        # Your code goes here!
+        if self.lazy and self.serializer is not None:
+            self._compile_class(self.serializer)
+            return None
+        tree = self._compile_class(None)
+        if self.serializer is not None:
+            self.serializer.serialize(tree)
+        return tree
+
+    def _compile_class(self, serializer) -> typing.Optional[JackAST.Class]:
+        """Compiles a complete class.
+
+        Args:
+            serializer: None to build the whole syntax tree of the class, or
+                a serializer to write every member of the class out with as
+                soon as it is parsed, in which case nothing is kept.
+
+        Returns:
+            typing.Optional[JackAST.Class]: the syntax tree, if there is no
+            serializer.
+        """
+        try:
+            if self.kind != KEYWORD or self.code != CLASS:
+                raise self._error("Expected a class declaration")
+            self._advance()
+            name = self._identifier()
+            if self.kind != SYMBOL or self.code != _LEFT_CURLY:
+                raise self._error("Expected an opening curly bracket.")
+            self._advance()
+        except JackSyntaxError as error:
+            # Nothing past a broken class header would make sense, but the
+            # rest of the input is still lexed for its errors.
+            while self.kind is not None:
+                self._advance()
+            raise JackSyntaxError.collect(
+                self.errors + self.tokenizer.errors + [error])
+        class_var_decs = []
+        subroutine_decs = []
+        if serializer is None:
+            add_class_var_dec = class_var_decs.append
+            add_subroutine_dec = subroutine_decs.append
+        else:
+            serializer.begin_class(name)
+            add_class_var_dec = add_subroutine_dec = serializer.member
+        in_subroutines = False
+        while True:
+            try:
+                if self.kind == KEYWORD and self.code in _CLASS_VAR_KINDS:
+                    if in_subroutines:
+                        # Parsed anyway, to resume right after it.
+                        error = self._error(
+                            "Expected a subroutine declaration.")
+                        self.compile_class_var_dec()
+                        self._record(error)
+                    else:
+                        add_class_var_dec(self.compile_class_var_dec())
+                elif self.kind == KEYWORD and self.code in _SUBROUTINE_KINDS:
+                    in_subroutines = True
+                    add_subroutine_dec(self.compile_subroutine())
+                elif self.kind != SYMBOL or self.code != _RIGHT_CURLY:
+                    raise self._error("Expected a closing curly bracket.")
+                else:
+                    break
+            except JackSyntaxError as error:
+                self._recover(error, True)
+                if self.kind is None:
+                    break
+        if self.kind is not None:
+            self._advance()
+            if self.kind is not None:
+                self._record(self._error("Expected the end of the file."))
+                # Lexes the rest of the input for its errors.
+                while self.kind is not None:
+                    self._advance()
+        errors = self.errors + self.tokenizer.errors
+        if errors:
+            raise JackSyntaxError.collect(errors)
+        if serializer is not None:
+            serializer.end_class()
+            return None
+        return JackAST.Class(name, class_var_decs, subroutine_decs)
+
+    def compile_class_var_dec(self) -> typing.Optional[JackAST.ClassVarDec]:
+        """Compiles a static declaration or a field declaration.
+
+        Returns:
+            typing.Optional[JackAST.ClassVarDec]: the declaration, or None if
+            the next token does not start one.
+        """
+        # Your code goes here!
+        if self.kind != KEYWORD or self.code not in _CLASS_VAR_KINDS:
+            return None
+        kind = _KEYWORD_LIST[self.code]
+        self._advance()
+        type_name = self._type()
+        names = [self._identifier()]
+        while self.kind == SYMBOL and self.code == _COMMA:
+            self._advance()
+            names.append(self._identifier())
+        if self.kind != SYMBOL or self.code != _SEMICOLON:
+            raise self._error("Expected a semicolon.")
+        self._advance()
+        return JackAST.ClassVarDec(kind, type_name, names)
+
+    def compile_subroutine(self) -> typing.Optional[JackAST.SubroutineDec]:
+        """
+        Compiles a complete method, function, or constructor.
+        You can assume that classes with constructors have at least one field,
+        you will understand why this is necessary in project 11.
+
+        Returns:
+            typing.Optional[JackAST.SubroutineDec]: the subroutine, or None if
+            the next token does not start one.
+        """
+        # Your code goes here!
+        if self.kind != KEYWORD or self.code not in _SUBROUTINE_KINDS:
+            return None
+        kind = _KEYWORD_LIST[self.code]
+        self._advance()
+        return_type = self._type()
+        name = self._identifier()
+        if self.kind != SYMBOL or self.code != _LEFT_PAREN:
+            raise self._error("Expected an opening parenthesis.")
+        self._advance()
+        parameters = self.compile_parameter_list()
+        if self.kind != SYMBOL or self.code != _RIGHT_PAREN:
+            raise self._error("Expected a closing parenthesis.")
+        self._advance()
+        if self.kind != SYMBOL or self.code != _LEFT_CURLY:
+            raise self._error("Expected an opening curly bracket.")
+        self._advance()
+        var_decs = []
+        while self.kind == KEYWORD and self.code == VAR:
+            try:
+                var_decs.append(self.compile_var_dec())
+            except JackSyntaxError as error:
+                self._recover(error, False)
+        statements = self.compile_statements()
+        if self.kind != SYMBOL or self.code != _RIGHT_CURLY:
+            raise self._error("Expected a closing curly bracket.")
+        self._advance()
+        return JackAST.SubroutineDec(
+            kind, return_type, name, parameters, var_decs, statements)
+
+    def compile_parameter_list(self) -> typing.List[JackAST.Parameter]:
+        """Compiles a (possibly empty) parameter list, not including the 
+        enclosing "()".
+        """
+        # Your code goes here!
+        parameters = []
+        if self.kind == SYMBOL and self.code == _RIGHT_PAREN:
+            return parameters
+        type_name = self._type()
+        parameters.append(JackAST.Parameter(type_name, self._identifier()))
+        while self.kind == SYMBOL and self.code == _COMMA:
+            self._advance()
+            type_name = self._type()
+            parameters.append(JackAST.Parameter(type_name, self._identifier()))
+        return parameters
+
+    def compile_var_dec(self) -> JackAST.VarDec:
+        """Compiles a var declaration."""
+        # Your code goes here!
+        if self.kind != KEYWORD or self.code != VAR:
+            raise self._error("Expected a var declaration.")
+        self._advance()
+        if self.kind == KEYWORD and self.code not in _TYPES:
+            raise self._error("Expected a type.")
+        type_name = self._type()
+        names = [self._identifier()]
+        while self.kind == SYMBOL and self.code == _COMMA:
+            self._advance()
+            names.append(self._identifier())
+        if self.kind != SYMBOL or self.code != _SEMICOLON:
+            raise self._error("Expected a semicolon.")
+        self._advance()
+        return JackAST.VarDec(type_name, names)
+
+    def compile_statements(self) -> typing.List[JackAST.Statement]:
+        """Compiles a sequence of statements, not including the enclosing 
+        "{}". A statement with a syntax error is recorded in self.errors and
+        skipped.
+        """
+        # Your code goes here!
+        statements = []
+        while True:
+            kind = self.kind
+            code = self.code
+            try:
+                if kind == KEYWORD and code in _STATEMENTS:
+                    if code == LET:
+                        statements.append(self.compile_let())
+                    elif code == IF:
+                        statements.append(self.compile_if())
+                    elif code == WHILE:
+                        statements.append(self.compile_while())
+                    elif code == DO:
+                        statements.append(self.compile_do())
+                    else:
+                        statements.append(self.compile_return())
+                elif kind == KEYWORD and code == VAR:
+                    # Parsed anyway, to resume right after it.
+                    error = self._error("Expected a statement.")
+                    self.compile_var_dec()
+                    self._record(error)
+                elif kind is None or (kind == SYMBOL and code == _RIGHT_CURLY) \
+                        or (kind == KEYWORD and code in _CLASS_MEMBERS):
+                    # Whoever expects the closing curly bracket reports it if
+                    # it is missing.
+                    return statements
+                else:
+                    raise self._error("Expected a statement.")
+            except JackSyntaxError as error:
+                self._recover(error, False)
+
+    def compile_do(self) -> JackAST.DoStatement:
+        """Compiles a do statement."""
+        # Your code goes here!
+        if self.kind != KEYWORD or self.code != DO:
+            raise self._error("Expected a do statement.")
+        self._advance()
+        call = self.compile_subroutine_call()
+        if self.kind != SYMBOL or self.code != _SEMICOLON:
+            raise self._error("Expected a semicolon.")
+        self._advance()
+        return JackAST.DoStatement(call)
+
+    def compile_let(self) -> JackAST.LetStatement:
+        """Compiles a let statement."""
+        # Your code goes here!
+        if self.kind != KEYWORD or self.code != LET:
+            raise self._error("Expected a let statement.")
+        self._advance()
+        name = self._identifier()
+        if self.kind != SYMBOL or self.code not in (_LEFT_SQUARE, _EQUALS):
+            raise self._error("Expected an opening square bracket or an equal sign.")
+        index = None
+        if self.code == _LEFT_SQUARE:
+            self._advance()
+            index = self.compile_expression()
+            if self.kind != SYMBOL or self.code != _RIGHT_SQUARE:
+                raise self._error("Expected a closing square bracket.")
+            self._advance()
+        if self.kind != SYMBOL or self.code != _EQUALS:
+            raise self._error("Expected an equal sign.")
+        self._advance()
+        value = self.compile_expression()
+        if self.kind != SYMBOL or self.code != _SEMICOLON:
+            raise self._error("Expected a semicolon.")
+        self._advance()
+        return JackAST.LetStatement(name, index, value)
+
+    def compile_while(self) -> JackAST.WhileStatement:
+        """Compiles a while statement."""
+        # Your code goes here!
+        if self.kind != KEYWORD or self.code != WHILE:
+            raise self._error("Expected a while statement.")
+        self._advance()
+        if self.kind != SYMBOL or self.code != _LEFT_PAREN:
+            raise self._error("Expected an opening parenthesis.")
+        self._advance()
+        condition = self.compile_expression()
+        if self.kind != SYMBOL or self.code != _RIGHT_PAREN:
+            raise self._error("Expected a closing parenthesis.")
+        self._advance()
+        if self.kind != SYMBOL or self.code != _LEFT_CURLY:
+            raise self._error("Expected an opening curly bracket.")
+        self._advance()
+        statements = self.compile_statements()
+        if self.kind != SYMBOL or self.code != _RIGHT_CURLY:
+            raise self._error("Expected a closing curly bracket.")
+        self._advance()
+        return JackAST.WhileStatement(condition, statements)
+
+    def compile_return(self) -> JackAST.ReturnStatement:
+        """Compiles a return statement."""
+        # Your code goes here!
+        if self.kind != KEYWORD or self.code != RETURN:
+            raise self._error("Expected a return statement.")
+        self._advance()
+        value = None
+        # A value is only tried when one can start here, so that "return }"
+        # is reported as missing its semicolon rather than a term.
+        if self._starts_term():
+            value = self.compile_expression()
+        if self.kind != SYMBOL or self.code != _SEMICOLON:
+            raise self._error("Expected a semicolon.")
+        self._advance()
+        return JackAST.ReturnStatement(value)
+
+    def compile_if(self) -> JackAST.IfStatement:
+        """Compiles a if statement, possibly with a trailing else clause."""
+        # Your code goes here!
+        if self.kind != KEYWORD or self.code != IF:
+            raise self._error("Expected an if statement.")
+        self._advance()
+        if self.kind != SYMBOL or self.code != _LEFT_PAREN:
+            raise self._error("Expected an opening parenthesis.")
+        self._advance()
+        condition = self.compile_expression()
+        if self.kind != SYMBOL or self.code != _RIGHT_PAREN:
+            raise self._error("Expected a closing parenthesis.")
+        self._advance()
+        if self.kind != SYMBOL or self.code != _LEFT_CURLY:
+            raise self._error("Expected an opening curly bracket.")
+        self._advance()
+        statements = self.compile_statements()
+        if self.kind != SYMBOL or self.code != _RIGHT_CURLY:
+            raise self._error("Expected a closing curly bracket.")
+        self._advance()
+        else_statements = None
+        if self.kind == KEYWORD and self.code == ELSE:
+            self._advance()
+            if self.kind != SYMBOL or self.code != _LEFT_CURLY:
+                raise self._error("Expected an opening curly bracket.")
+            self._advance()
+            else_statements = self.compile_statements()
+            if self.kind != SYMBOL or self.code != _RIGHT_CURLY:
+                raise self._error("Expected a closing curly bracket.")
+            self._advance()
+        return JackAST.IfStatement(condition, statements, else_statements)
+
+    def compile_expression(self) -> JackAST.Expression:
+        """Compiles an expression."""
+        # Your code goes here!
+        return self._compile_expression(False)
+
+    def compile_term(self) -> JackAST.Term:
+        """Compiles a term. 
+        This routine is faced with a slight difficulty when
+        trying to decide between some of the alternative parsing rules.
+        Specifically, if the current token is an identifier, the routing must
+        distinguish between a variable, an array entry, and a subroutine call.
+        A single look-ahead token, which may be one of "[", "(", or "." suffices
+        to distinguish between the three possibilities. Any other token is not
+        part of this term and should not be advanced over.
+        """
+        # Your code goes here!
+        return self._compile_expression(True)
+
+    def _compile_expression(self, term_only: bool) -> typing.Union[
+            JackAST.Expression, JackAST.Term]:
+        """Compiles an expression, or only its first term, without recursing.
+
+        Jack expressions nest through parentheses, unary operators, array
+        indices and call arguments. Rather than calling itself for each
+        level, this keeps the constructs it is inside of on an explicit
+        stack, so that expressions of any depth take constant Python stack.
+        Every frame on it is a tuple whose first item is one of:
+
+        - _UNARY_FRAME, op: a unary operator waiting for its term.
+        - _PAREN_FRAME, outer: "(" waiting for its expression and ")".
+        - _INDEX_FRAME, outer, name: "name[" waiting for its expression and
+          "]".
+        - _CALL_FRAME, outer, receiver, name, arguments: a call waiting for
+          its next argument and then "," or ")".
+
+        where outer is the expression that was being built when the construct
+        started, and is resumed once it ends.
+
+        Args:
+            term_only (bool): stop after the first term, as compile_term().
+
+        Returns:
+            typing.Union[JackAST.Expression, JackAST.Term]: the expression,
+            or the term if term_only is set.
+        """
+        advance = self._advance
+        text = self._text
+        new_expression = JackAST.Expression
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        expression = new_expression([], [])
+        while True:
+            # Reads tokens until they make up a whole term, pushing a frame
+            # for every construct the term opens.
+            kind = self.kind
+            code = self.code
+            # Identifiers and integers are by far the most common terms.
+            if kind == IDENTIFIER:
+                name = text()
+                advance()
+                if self.kind != SYMBOL:
+                    term = JackAST.Variable(name)
+                elif self.code == _LEFT_SQUARE:
+                    push((_INDEX_FRAME, expression, name))
+                    expression = new_expression([], [])
+                    advance()
+                    continue
+                elif self.code == _LEFT_PAREN or self.code == _DOT:
+                    receiver = None
+                    if self.code == _DOT:
+                        advance()
+                        receiver = name
+                        name = self._identifier()
+                    if self.kind != SYMBOL or self.code != _LEFT_PAREN:
+                        raise self._error("Expected an opening parenthesis.")
+                    advance()
+                    if self.kind == SYMBOL and self.code == _RIGHT_PAREN:
+                        term = JackAST.SubroutineCall(receiver, name, [])
+                        advance()
+                    else:
+                        push((_CALL_FRAME, expression, receiver, name, []))
+                        expression = new_expression([], [])
+                        continue
+                else:
+                    term = JackAST.Variable(name)
+            elif kind == INT_CONST:
+                term = JackAST.IntegerConstant(
+                    int(text()))
+                advance()
+            elif kind == SYMBOL and code == _LEFT_PAREN:
+                push((_PAREN_FRAME, expression))
+                expression = new_expression([], [])
+                advance()
+                continue
+            elif kind == SYMBOL and code in _UNARY_OPS:
+                push((_UNARY_FRAME, chr(code)))
+                advance()
+                continue
+            elif kind == STRING_CONST:
+                term = JackAST.StringConstant(text())
+                advance()
+            elif kind == KEYWORD and code in _KEYWORD_CONSTANTS:
+                term = JackAST.KeywordConstant(_KEYWORD_LIST[code])
+                advance()
+            else:
+                raise self._error("Expected a term.")
+            # Adds the term to the expression being built, and closes every
+            # construct that ends with it, until one expects another term.
+            while True:
+                while stack and stack[-1][0] == _UNARY_FRAME:
+                    term = JackAST.UnaryOp(pop()[1], term)
+                if term_only and not stack:
+                    return term
+                expression.terms.append(term)
+                if self.kind == SYMBOL and self.code in _OPS:
+                    expression.ops.append(chr(self.code))
+                    advance()
+                    break
+                if not stack:
+                    return expression
+                frame = stack[-1]
+                if frame[0] == _CALL_FRAME:
+                    frame[4].append(expression)
+                    if self.kind == SYMBOL and self.code == _COMMA:
+                        # The call stays open for its next argument.
+                        advance()
+                        expression = new_expression([], [])
+                        break
+                    if self.kind != SYMBOL or self.code != _RIGHT_PAREN:
+                        raise self._error("Expected a closing parenthesis.")
+                    term = JackAST.SubroutineCall(frame[2], frame[3], frame[4])
+                elif frame[0] == _PAREN_FRAME:
+                    if self.kind != SYMBOL or self.code != _RIGHT_PAREN:
+                        raise self._error("Expected a closing parenthesis.")
+                    term = JackAST.ParenthesizedExpression(expression)
+                else:
+                    if self.kind != SYMBOL or self.code != _RIGHT_SQUARE:
+                        raise self._error("Expected a closing square bracket.")
+                    term = JackAST.ArrayAccess(frame[2], expression)
+                advance()
+                pop()
+                expression = frame[1]
+
+    def compile_expression_list(self) -> typing.List[JackAST.Expression]:
+        """Compiles a (possibly empty) comma-separated list of expressions."""
+        # Your code goes here!
+        expressions = []
+        if self.kind == SYMBOL and self.code == _RIGHT_PAREN:
+            return expressions
+        expressions.append(self.compile_expression())
+        while self.kind == SYMBOL and self.code == _COMMA:
+            self._advance()
+            expressions.append(self.compile_expression())
+        return expressions
+
+    def compile_subroutine_call(self) -> JackAST.SubroutineCall:
+        """Compiles a subroutine call."""
+        # Your code goes here!
+        return self._compile_call(self._identifier())
+
+    def _compile_call(self, name: str) -> JackAST.SubroutineCall:
+        """Compiles the rest of a subroutine call, given the identifier it
+        starts with.
+        """
+        receiver = None
+        if self.kind == SYMBOL and self.code == _DOT:
+            self._advance()
+            receiver = name
+            name = self._identifier()
+        if self.kind != SYMBOL or self.code != _LEFT_PAREN:
+            raise self._error("Expected an opening parenthesis.")
+        self._advance()
+        arguments = self.compile_expression_list()
+        if self.kind != SYMBOL or self.code != _RIGHT_PAREN:
+            raise self._error("Expected a closing parenthesis.")
+        self._advance()
+        return JackAST.SubroutineCall(receiver, name, arguments)
@@ -0,0 +1,250 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+
+Parses successive versions of the source of a class, as an editor sends
+them, reparsing only the subroutine an edit falls in, so that the time an
+edit takes depends on the size of that subroutine rather than of the class.
+"""
+import bisect
+import io
+import typing
+import JackAST
+from CompilationEngine import CompilationEngine
+from JackErrors import JackSyntaxError
+from JackSerializers import SERIALIZERS, Serializer
+from JackTokenizer import JackTokenizer
+
+# The formats whose outputs are spliced together from the outputs of every
+# class member, rather than written whole: text formats whose serializer
+# writes a class a member at a time.
+SPLICED_FORMATS = tuple(
+    output_format for output_format, (serializer, _, binary)
+    in SERIALIZERS.items()
+    if not binary and serializer.member is not Serializer.member)
+_BLOCK_SIZE = 4096  # Characters compared at a time when diffing sources.
+
+
+def _common_prefix_length(old: str, new: str) -> int:
+    """
+    Returns:
+        int: the length of the longest common prefix of old and new.
+    """
+    size = min(len(old), len(new))
+    # Skips equal blocks with comparisons in C, then bisects the block where
+    # the first different character is.
+    start = 0
+    while start + _BLOCK_SIZE <= size and \
+            old[start:start + _BLOCK_SIZE] == new[start:start + _BLOCK_SIZE]:
+        start += _BLOCK_SIZE
+    low, high = start, min(start + _BLOCK_SIZE, size)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if old[start:middle] == new[start:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _common_suffix_length(old: str, new: str, limit: int) -> int:
+    """
+    Returns:
+        int: the length of the longest common suffix of old and new, up to
+        limit, which is at most the length of either.
+    """
+    old_size = len(old)
+    new_size = len(new)
+    end = 0
+    while end + _BLOCK_SIZE <= limit and \
+            old[old_size - end - _BLOCK_SIZE:old_size - end] == \
+            new[new_size - end - _BLOCK_SIZE:new_size - end]:
+        end += _BLOCK_SIZE
+    low, high = end, min(end + _BLOCK_SIZE, limit)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if old[old_size - middle:old_size - end] == \
+                new[new_size - middle:new_size - end]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+class _MemberSpanEngine(CompilationEngine):
+    """A CompilationEngine that records which tokens every class member it
+    compiles spans, as (first, last + 1) token indices, in self.spans.
+    """
+
+    def __init__(self, tokenizer: JackTokenizer) -> None:
+        self.spans = []
+        super().__init__(tokenizer, None)
+
+    def compile_class_var_dec(self) -> typing.Optional[JackAST.ClassVarDec]:
+        first = self.current_token_index
+        node = super().compile_class_var_dec()
+        self.spans.append((first, self.current_token_index))
+        return node
+
+    def compile_subroutine(self) -> typing.Optional[JackAST.SubroutineDec]:
+        first = self.current_token_index
+        node = super().compile_subroutine()
+        self.spans.append((first, self.current_token_index))
+        return node
+
+
+class IncrementalParser:
+    """Parses successive versions of the source of a single class.
+
+    The parser keeps the last source it parsed, its syntax tree, and where
+    every member of the class starts and ends in it. A new version is diffed
+    against the last by their common prefix and suffix. If all that changed
+    lies within a single subroutine, only the new text of that subroutine is
+    lexed and parsed, and the subroutine it parses into replaces the old one
+    in the tree, which keeps every other node as it was. Anything else, an
+    edit between members or across several of them, or a subroutine that no
+    longer parses on its own, falls back to parsing the whole source.
+
+    The output of the formats in SPLICED_FORMATS is spliced together in the
+    same way, from the output of every member, so that only the output of
+    the subroutine that changed is written again.
+
+    A source that does not compile raises its syntax errors, as a parse of
+    the whole source reports them, and leaves the parser at the last source
+    that did, so that the edit that fixes it is diffed against that.
+    """
+
+    def __init__(self, path: typing.Optional[str] = None) -> None:
+        """
+        Args:
+            path (typing.Optional[str]): the path of the source, that syntax
+                errors are reported in, if it has one.
+        """
+        self.path = path
+        self.source = None
+        self.tree = None
+        self.full_parses = 0
+        self.subroutine_parses = 0
+        self._starts = []  # Where every member of the class starts,
+        self._ends = []  # and ends, in the source, in order.
+        # The outputs of the formats in SPLICED_FORMATS, by format, as the
+        # output before the members, that of every member, or None where it
+        # is out of date, and the output after them.
+        self._outputs = {}
+
+    def parse(self, source: str) -> JackAST.Class:
+        """Parses the next version of the source.
+
+        Args:
+            source (str): the source of the class.
+
+        Returns:
+            JackAST.Class: its syntax tree.
+
+        Raises:
+            JackSyntaxError: if the source has syntax errors.
+        """
+        if source == self.source:
+            return self.tree
+        if self.source is None or not self._parse_subroutine(source):
+            self._parse_class(source)
+        return self.tree
+
+    def _parse_class(self, source: str) -> None:
+        """Parses the whole source, and records where every member is."""
+        tokenizer = JackTokenizer(io.StringIO(source))
+        tokenizer.path = self.path
+        engine = _MemberSpanEngine(tokenizer)
+        tree = engine.compile_class()
+        tokens = engine.tokens
+        self._starts = [tokens.starts[first] for first, _ in engine.spans]
+        self._ends = [tokens.ends[end - 1] for _, end in engine.spans]
+        self.source = source
+        self.tree = tree
+        self._outputs = {}
+        self.full_parses += 1
+
+    def _parse_subroutine(self, source: str) -> bool:
+        """Parses only the subroutine all the changes since the last source
+        are in, if they are all in one.
+
+        Returns:
+            bool: whether it could, and the tree is up to date.
+        """
+        old = self.source
+        prefix = _common_prefix_length(old, source)
+        suffix = _common_suffix_length(
+            old, source, min(len(old), len(source)) - prefix)
+        # The changes are in old[prefix:old_end], which must lie past the
+        # first character of a subroutine and before its last, so that the
+        # tokens before and after it stay the same.
+        old_end = len(old) - suffix
+        index = bisect.bisect_left(self._starts, prefix) - 1
+        if index < len(self.tree.class_var_decs) or \
+                old_end >= self._ends[index]:
+            return False
+        shift = len(source) - len(old)
+        start = self._starts[index]
+        end = self._ends[index] + shift
+        tokenizer = JackTokenizer(io.StringIO(source[start:end]))
+        try:
+            engine = CompilationEngine(tokenizer, None)
+            subroutine = engine.compile_subroutine()
+        except JackSyntaxError:
+            return False
+        if subroutine is None or engine.kind is not None or engine.errors \
+                or tokenizer.errors:
+            return False
+        tree = self.tree
+        subroutine_decs = list(tree.subroutine_decs)
+        subroutine_decs[index - len(tree.class_var_decs)] = subroutine
+        self.tree = JackAST.Class(tree.name, tree.class_var_decs,
+                                  subroutine_decs)
+        self.source = source
+        for later in range(index + 1, len(self._starts)):
+            self._starts[later] += shift
+            self._ends[later] += shift
+        self._ends[index] = end
+        for _, member_outputs, _ in self._outputs.values():
+            member_outputs[index] = None
+        self.subroutine_parses += 1
+        return True
+
+    def output(self, output_format: str) -> str:
+        """
+        Args:
+            output_format (str): one of SPLICED_FORMATS.
+
+        Returns:
+            str: the output of the last source parsed in that format, which
+            is the same as serializing its whole tree.
+        """
+        tree = self.tree
+        members = tree.class_var_decs + tree.subroutine_decs
+        output_stream = io.StringIO()
+        serializer = SERIALIZERS[output_format][0](output_stream)
+
+        def written() -> str:
+            text = output_stream.getvalue()
+            output_stream.seek(0)
+            output_stream.truncate()
+            return text
+
+        serializer.begin_class(tree.name)
+        header = written()
+        if output_format not in self._outputs:
+            member_outputs = []
+            for member in members:
+                serializer.member(member)
+                member_outputs.append(written())
+            serializer.end_class()
+            self._outputs[output_format] = (header, member_outputs, written())
+        header, member_outputs, footer = self._outputs[output_format]
+        for index, member_output in enumerate(member_outputs):
+            if member_output is None:
+                serializer.member(members[index])
+                member_outputs[index] = written()
+        return header + "".join(member_outputs) + footer
@@ -0,0 +1,242 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+
+The typed syntax tree CompilationEngine builds, one class per construct of
+the Jack grammar. Every field of a node is a plain value (str, int or None),
+another node, or a list of plain values or of nodes, and __slots__ lists the
+fields in the order they appear in the source.
+"""
+import typing
+
+
+class Node:
+    """Base class of all syntax tree nodes."""
+    __slots__ = ()
+
+    def __eq__(self, other: object) -> bool:
+        # Compares with an explicit stack, as trees can be arbitrarily deep.
+        pairs = [(self, other)]
+        while pairs:
+            left, right = pairs.pop()
+            if isinstance(left, Node):
+                if left.__class__ is not right.__class__:
+                    return False
+                pairs.extend((getattr(left, field), getattr(right, field))
+                             for field in left.__slots__)
+            elif left.__class__ is list:
+                if right.__class__ is not list or len(left) != len(right):
+                    return False
+                pairs.extend(zip(left, right))
+            elif left != right:
+                return False
+        return True
+
+    def __repr__(self) -> str:
+        return "{}({})".format(self.__class__.__name__, ", ".join(
+            repr(getattr(self, field)) for field in self.__slots__))
+
+
+class Class(Node):
+    """'class' name '{' class_var_decs subroutine_decs '}'"""
+    __slots__ = ('name', 'class_var_decs', 'subroutine_decs')
+
+    def __init__(self, name: str, class_var_decs: typing.List["ClassVarDec"],
+                 subroutine_decs: typing.List["SubroutineDec"]) -> None:
+        self.name = name
+        self.class_var_decs = class_var_decs
+        self.subroutine_decs = subroutine_decs
+
+
+class ClassVarDec(Node):
+    """kind type names ';', where kind is 'static' or 'field'."""
+    __slots__ = ('kind', 'type', 'names')
+
+    def __init__(self, kind: str, type: str, names: typing.List[str]) -> None:
+        self.kind = kind
+        self.type = type
+        self.names = names
+
+
+class SubroutineDec(Node):
+    """kind return_type name '(' parameters ')' '{' var_decs statements '}',
+    where kind is 'constructor', 'function' or 'method'.
+    """
+    __slots__ = ('kind', 'return_type', 'name', 'parameters', 'var_decs',
+                 'statements')
+
+    def __init__(self, kind: str, return_type: str, name: str,
+                 parameters: typing.List["Parameter"],
+                 var_decs: typing.List["VarDec"],
+                 statements: typing.List["Statement"]) -> None:
+        self.kind = kind
+        self.return_type = return_type
+        self.name = name
+        self.parameters = parameters
+        self.var_decs = var_decs
+        self.statements = statements
+
+
+class Parameter(Node):
+    """type name"""
+    __slots__ = ('type', 'name')
+
+    def __init__(self, type: str, name: str) -> None:
+        self.type = type
+        self.name = name
+
+
+class VarDec(Node):
+    """'var' type names ';'"""
+    __slots__ = ('type', 'names')
+
+    def __init__(self, type: str, names: typing.List[str]) -> None:
+        self.type = type
+        self.names = names
+
+
+class LetStatement(Node):
+    """'let' name ('[' index ']')? '=' value ';', index is None if absent."""
+    __slots__ = ('name', 'index', 'value')
+
+    def __init__(self, name: str, index: typing.Optional["Expression"],
+                 value: "Expression") -> None:
+        self.name = name
+        self.index = index
+        self.value = value
+
+
+class IfStatement(Node):
+    """'if' '(' condition ')' '{' statements '}'
+    ('else' '{' else_statements '}')?, else_statements is None if absent.
+    """
+    __slots__ = ('condition', 'statements', 'else_statements')
+
+    def __init__(self, condition: "Expression",
+                 statements: typing.List["Statement"],
+                 else_statements: typing.Optional[
+                     typing.List["Statement"]]) -> None:
+        self.condition = condition
+        self.statements = statements
+        self.else_statements = else_statements
+
+
+class WhileStatement(Node):
+    """'while' '(' condition ')' '{' statements '}'"""
+    __slots__ = ('condition', 'statements')
+
+    def __init__(self, condition: "Expression",
+                 statements: typing.List["Statement"]) -> None:
+        self.condition = condition
+        self.statements = statements
+
+
+class DoStatement(Node):
+    """'do' call ';'"""
+    __slots__ = ('call'),
+
+    def __init__(self, call: "SubroutineCall") -> None:
+        self.call = call
+
+
+class ReturnStatement(Node):
+    """'return' value? ';', value is None if absent."""
+    __slots__ = ('value'),
+
+    def __init__(self, value: typing.Optional["Expression"]) -> None:
+        self.value = value
+
+
+class Expression(Node):
+    """terms[0] (ops[0] terms[1])*, where every op is a symbol."""
+    __slots__ = ('terms', 'ops')
+
+    def __init__(self, terms: typing.List["Term"],
+                 ops: typing.List[str]) -> None:
+        self.terms = terms
+        self.ops = ops
+
+
+class IntegerConstant(Node):
+    __slots__ = ('value'),
+
+    def __init__(self, value: int) -> None:
+        self.value = value
+
+
+class StringConstant(Node):
+    """A string constant, value is its text without the double quotes."""
+    __slots__ = ('value'),
+
+    def __init__(self, value: str) -> None:
+        self.value = value
+
+
+class KeywordConstant(Node):
+    """'true', 'false', 'null' or 'this'."""
+    __slots__ = ('value'),
+
+    def __init__(self, value: str) -> None:
+        self.value = value
+
+
+class Variable(Node):
+    __slots__ = ('name'),
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+
+class ArrayAccess(Node):
+    """name '[' index ']'"""
+    __slots__ = ('name', 'index')
+
+    def __init__(self, name: str, index: "Expression") -> None:
+        self.name = name
+        self.index = index
+
+
+class SubroutineCall(Node):
+    """(receiver '.')? name '(' arguments ')', receiver is None if absent."""
+    __slots__ = ('receiver', 'name', 'arguments')
+
+    def __init__(self, receiver: typing.Optional[str], name: str,
+                 arguments: typing.List["Expression"]) -> None:
+        self.receiver = receiver
+        self.name = name
+        self.arguments = arguments
+
+
+class ParenthesizedExpression(Node):
+    """'(' expression ')'"""
+    __slots__ = ('expression'),
+
+    def __init__(self, expression: "Expression") -> None:
+        self.expression = expression
+
+
+class UnaryOp(Node):
+    """op term, where op is '-' or '~'."""
+    __slots__ = ('op', 'term')
+
+    def __init__(self, op: str, term: "Term") -> None:
+        self.op = op
+        self.term = term
+
+
+Statement = typing.Union[LetStatement, IfStatement, WhileStatement,
+                         DoStatement, ReturnStatement]
+Term = typing.Union[IntegerConstant, StringConstant, KeywordConstant,
+                    Variable, ArrayAccess, SubroutineCall,
+                    ParenthesizedExpression, UnaryOp]
+
+# Every node class, in a fixed order that serialized trees refer to them by:
+# only ever append to it.
+NODE_TYPES = (
+    Class, ClassVarDec, SubroutineDec, Parameter, VarDec, LetStatement,
+    IfStatement, WhileStatement, DoStatement, ReturnStatement, Expression,
+    IntegerConstant, StringConstant, KeywordConstant, Variable, ArrayAccess,
+    SubroutineCall, ParenthesizedExpression, UnaryOp)
@@ -1,71 +1,1001 @@
-"""
-This file is part of nand2tetris, as taught in The Hebrew University, and
-was written by Aviv Yaish. It is an extension to the specifications given
-[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
-as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
-Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
-"""
-import os
-import sys
-import typing
-from CompilationEngine import CompilationEngine
-from JackTokenizer import JackTokenizer
-import xml.etree.cElementTree as ET
-
-
-def analyze_file(
-        input_file: typing.TextIO, output_file: typing.TextIO) -> None:
-    """Analyzes a single file.
-
-    Args:
-        input_file (typing.TextIO): the file to analyze.
-        output_file (typing.TextIO): writes all output to this file.
-    """
-    # Your code goes here!
-    # It might be good to start by creating a new JackTokenizer and CompilationEngine:
-    # tokenizer = JackTokenizer(input_file)
-    # engine = CompilationEngine(tokenizer, output_file)
-    root = ET.Element("tokens")
-    tokenizer = JackTokenizer(input_file)
-    for _ in tokenizer.advance():
-        token_type = tokenizer.token_type()
-        if token_type == "KEYWORD":
-            ET.SubElement(root, token_type).text = tokenizer.keyword()
-        elif token_type == "SYMBOL":
-            ET.SubElement(root, token_type).text = tokenizer.symbol()
-        elif token_type == "IDENTIFIER":
-            ET.SubElement(root, token_type).text = tokenizer.identifier()
-        elif token_type == "INT_CONST":
-            ET.SubElement(root, token_type).text = str(tokenizer.int_val())
-        elif token_type == "STRING_CONST":
-            ET.SubElement(root, token_type).text = tokenizer.string_val()
-    tree = ET.ElementTree(root)
-    tree.write("tmp.xml")
-
-    engine = CompilationEngine(tokenizer, output_file)
-    engine.compile_class()
-
-
-if "__main__" == __name__:
-    # Parses the input path and calls analyze_file on each input file.
-    # This opens both the input and the output files!
-    # Both are closed automatically when the code finishes running.
-    # If the output file does not exist, it is created automatically in the
-    # correct path, using the correct filename.
-    if not len(sys.argv) == 2:
-        sys.exit("Invalid usage, please use: JackAnalyzer <input path>")
-    argument_path = os.path.abspath(sys.argv[1])
-    if os.path.isdir(argument_path):
-        files_to_assemble = [
-            os.path.join(argument_path, filename)
-            for filename in os.listdir(argument_path)]
-    else:
-        files_to_assemble = [argument_path]
-    for input_path in files_to_assemble:
-        filename, extension = os.path.splitext(input_path)
-        if extension.lower() != ".jack":
-            continue
-        output_path = filename + ".xml"
-        with open(input_path, 'r') as input_file, \
-                open(output_path, 'w') as output_file:
-            analyze_file(input_file, output_file)
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import collections.abc
+import contextlib
+import fnmatch
+import io
+import itertools
+import operator
+import os
+import re
+import sys
+import typing
+import JackAST
+from CompilationEngine import CompilationEngine
+from JackErrors import JackSyntaxError
+from JackSerializers import (
+    SERIALIZERS, Serializer, TeeSerializer, VMSerializer, XMLSerializer)
+from JackStats import NO_STATS, BuildStats, FileStats
+from JackTokenizer import DEFAULT_CHUNK_SIZE, JackTokenizer
+if typing.TYPE_CHECKING:
+    # Only the options that need them import these, a run on a single file
+    # with none does not.
+    from BuildArchive import BuildArchive, OutputBuffer
+    from BuildManifest import BuildManifest
+    from IncrementalParser import IncrementalParser
+    from ParseTreeCache import ParseTreeCache
+    from SignatureIndex import ProgramSignatures, SignatureIndex
+    from VMOptimizer import PeepholeOptimizer
+
+# Recorded in build manifests, bump it whenever the output for a given input
+# changes, so that incremental builds redo everything built by older versions.
+ANALYZER_VERSION = "3"
+DEFAULT_FORMATS = ("xml",)
+
+
+def parse_file(input_file: typing.TextIO,
+               cache: typing.Optional["ParseTreeCache"] = None,
+               stats: FileStats = NO_STATS) -> JackAST.Class:
+    """Parses a single file.
+
+    Args:
+        input_file (typing.TextIO): the file to parse.
+        cache (typing.Optional[ParseTreeCache]): if given, the syntax tree is
+            taken from this cache when it holds one for the same source, and
+            stored in it otherwise.
+        stats (FileStats): records the time of every phase, and the tokens,
+            in these statistics.
+
+    Returns:
+        JackAST.Class: the syntax tree of the class in the file.
+    """
+    with stats.phase("read"):
+        tokenizer = JackTokenizer(input_file)
+    if cache is not None:
+        with stats.phase("cache"):
+            key = cache.key(tokenizer.input)
+            tree = cache.load(key)
+        if tree is not None:
+            return tree
+    with stats.phase("lex"):
+        tokens = tokenizer.token_stream()
+    stats.count_tokens(tokens)
+    with stats.phase("parse"):
+        tree = CompilationEngine(tokenizer, None).compile_class()
+    if cache is not None:
+        with stats.phase("cache"):
+            cache.store(key, tree)
+    return tree
+
+
+def analyze_file(
+        input_file: typing.TextIO, output_file: typing.TextIO,
+        cache: typing.Optional["ParseTreeCache"] = None) -> None:
+    """Analyzes a single file.
+
+    Args:
+        input_file (typing.TextIO): the file to analyze.
+        output_file (typing.TextIO): writes all output to this file.
+        cache (typing.Optional[ParseTreeCache]): parse tree cache to use, as
+            in parse_file().
+    """
+    XMLSerializer(output_file).serialize(parse_file(input_file, cache))
+
+
+def analyze_source(
+        source: str, cache: typing.Optional["ParseTreeCache"] = None,
+        formats: typing.Sequence[str] = DEFAULT_FORMATS,
+        optimize: bool = False,
+        parser: typing.Optional["IncrementalParser"] = None) -> \
+        typing.Dict[str, typing.Union[str, bytes]]:
+    """Analyzes the source of a single class, without touching any file.
+
+    Args:
+        source (str): the source of the class.
+        cache (typing.Optional[ParseTreeCache]): parse tree cache to use, as
+            in parse_file().
+        formats (typing.Sequence[str]): formats of the outputs, from
+            JackSerializers.SERIALIZERS.
+        optimize (bool): run VM code through the peephole optimizer.
+        parser (typing.Optional[IncrementalParser]): if given, the source is
+            taken as the next version of the one this parser parsed last,
+            and only what changed since is parsed, and written out for the
+            formats in IncrementalParser.SPLICED_FORMATS. The cache is not
+            used then.
+
+    Returns:
+        typing.Dict[str, typing.Union[str, bytes]]: the output in every
+        format, by format, as bytes for binary formats and str otherwise.
+    """
+    if parser is None:
+        tree = parse_file(io.StringIO(source), cache)
+    else:
+        tree = parser.parse(source)
+    optimizer = _new_optimizer(optimize)
+    spliced_formats = ()
+    if parser is not None:
+        from IncrementalParser import SPLICED_FORMATS as spliced_formats
+    outputs = {}
+    for output_format in formats:
+        if output_format in spliced_formats:
+            outputs[output_format] = parser.output(output_format)
+            continue
+        binary = SERIALIZERS[output_format][2]
+        output_file = io.BytesIO() if binary else io.StringIO()
+        _new_serializer(output_format, output_file, optimizer).serialize(
+            tree)
+        outputs[output_format] = output_file.getvalue()
+    return outputs
+
+
+def _new_optimizer(optimize: bool) -> typing.Optional["PeepholeOptimizer"]:
+    """Returns a new peephole optimizer if optimize, and None otherwise."""
+    if not optimize:
+        return None
+    from VMOptimizer import PeepholeOptimizer
+    return PeepholeOptimizer()
+
+
+def _new_serializer(output_format: str, output_file: typing.IO,
+                    optimizer: typing.Optional["PeepholeOptimizer"]) -> \
+        Serializer:
+    """
+    Args:
+        output_format (str): one of the formats in JackSerializers.SERIALIZERS.
+        output_file (typing.IO): the file to write to.
+        optimizer (typing.Optional[PeepholeOptimizer]): the optimizer VM code
+            goes through, if any.
+
+    Returns:
+        Serializer: a serializer of that format, writing to the file.
+    """
+    serializer = SERIALIZERS[output_format][0]
+    if serializer is VMSerializer:
+        return VMSerializer(output_file, optimizer)
+    return serializer(output_file)
+
+
+def _compile_patterns(patterns: typing.Sequence[str]) -> typing.Tuple[
+        typing.Optional[typing.Pattern], typing.Optional[typing.Pattern]]:
+    """
+    Args:
+        patterns (typing.Sequence[str]): glob patterns.
+
+    Returns:
+        typing.Tuple[typing.Optional[typing.Pattern],
+        typing.Optional[typing.Pattern]]: a regular expression matching any
+        of the patterns without a "/", which are matched against names, and
+        one matching any of the others, which are matched against paths
+        relative to the directory being walked. None where there are none.
+    """
+    name_patterns = [fnmatch.translate(pattern) for pattern in patterns
+                     if "/" not in pattern]
+    path_patterns = [fnmatch.translate(pattern) for pattern in patterns
+                     if "/" in pattern]
+    return tuple(re.compile("|".join(translated)) if translated else None
+                 for translated in (name_patterns, path_patterns))
+
+
+def _matches(patterns: typing.Tuple[typing.Optional[typing.Pattern],
+                                    typing.Optional[typing.Pattern]],
+             name: str, relative_path: str) -> bool:
+    name_pattern, path_pattern = patterns
+    return (name_pattern is not None and name_pattern.match(name) is not None
+            or path_pattern is not None
+            and path_pattern.match(relative_path) is not None)
+
+
+_entry_name = operator.attrgetter("name")
+
+
+def iter_input_files(input_paths: typing.Iterable[str],
+                     recursive: bool = False,
+                     include: typing.Sequence[str] = (),
+                     exclude: typing.Sequence[str] = ()) -> \
+        typing.Iterator[str]:
+    """Finds the .jack files to analyze, yielding each as soon as it is found,
+    so that they can be analyzed while the rest are still being looked for.
+
+    Args:
+        input_paths (typing.Iterable[str]): .jack files and directories. The
+            filters only apply to the files found in directories, a .jack
+            file given is always yielded.
+        recursive (bool): walk into the subdirectories of every directory,
+            rather than only taking the .jack files right in it. Symbolic
+            links to directories are not followed.
+        include (typing.Sequence[str]): if given, only yield the .jack files
+            found in directories that match one of these glob patterns.
+        exclude (typing.Sequence[str]): skip files found in directories, and
+            subdirectories, that match one of these glob patterns.
+
+    Patterns are matched as by fnmatch, against the name of a file or
+    directory, or, if they hold a "/", against its path relative to the
+    directory given, with "/" separators. As in fnmatch, "*" matches "/" too.
+
+    Yields:
+        str: the absolute path of every .jack file, once, in the order they
+        are found, which is sorted by name within every directory.
+    """
+    include_patterns = _compile_patterns(include)
+    exclude_patterns = _compile_patterns(exclude)
+    seen = set()
+    for input_path in input_paths:
+        input_path = os.path.abspath(input_path)
+        if not os.path.isdir(input_path):
+            if os.path.splitext(input_path)[1].lower() == ".jack" and \
+                    input_path not in seen:
+                seen.add(input_path)
+                yield input_path
+            continue
+        # Walks with an explicit stack of (directory, relative path) pairs,
+        # so that the depth of a tree does not matter.
+        directories = [(input_path, "")]
+        while directories:
+            directory, relative_directory = directories.pop()
+            with os.scandir(directory) as entries:
+                entries = sorted(entries, key=_entry_name)
+            subdirectories = []
+            for entry in entries:
+                name = entry.name
+                if exclude and _matches(exclude_patterns, name,
+                                        relative_directory + name):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        subdirectories.append(
+                            (entry.path, relative_directory + name + "/"))
+                    continue
+                if not name.lower().endswith(".jack") or name == ".jack":
+                    continue
+                if include and not _matches(include_patterns, name,
+                                            relative_directory + name):
+                    continue
+                path = entry.path
+                if path not in seen:
+                    seen.add(path)
+                    yield path
+            directories.extend(reversed(subdirectories))
+
+
+def input_files_for(input_path: str) -> typing.List[str]:
+    """
+    Args:
+        input_path (str): a .jack file or a directory.
+
+    Returns:
+        typing.List[str]: absolute paths of the .jack file, or of the .jack
+        files in the directory.
+    """
+    return list(iter_input_files([input_path]))
+
+
+def output_path_for(input_path: str, output_format: str = "xml") -> str:
+    """
+    Args:
+        input_path (str): path of a .jack file.
+        output_format (str): one of the formats in JackSerializers.SERIALIZERS.
+
+    Returns:
+        str: path of the output file analyze_path() writes for it in this
+        format.
+    """
+    return os.path.splitext(input_path)[0] + SERIALIZERS[output_format][1]
+
+
+def analyze_path(input_path: str,
+                 cache: typing.Optional["ParseTreeCache"] = None,
+                 formats: typing.Sequence[str] = DEFAULT_FORMATS,
+                 stream: bool = False,
+                 stats: FileStats = NO_STATS,
+                 optimize: bool = False,
+                 archive: typing.Union["BuildArchive", "OutputBuffer",
+                                       None] = None,
+                 program: typing.Optional["ProgramSignatures"] = None) -> \
+        typing.List[str]:
+    """Analyzes a single .jack file into output files beside it, one for every
+    format. The file is parsed once, whatever the number of formats.
+
+    Args:
+        input_path (str): path of the file to analyze.
+        cache (typing.Optional[ParseTreeCache]): parse tree cache to use.
+        formats (typing.Sequence[str]): formats of the output files, from
+            JackSerializers.SERIALIZERS.
+        stream (bool): stream the file in, and lex, parse and write it out in
+            a single pass, a class member at a time, so that memory does not
+            grow with the size of the file. The cache is not used then.
+        stats (FileStats): records statistics of analyzing the file in these.
+            In streaming mode, there is a single phase, "stream", and no
+            token counts.
+        optimize (bool): run VM code through the peephole optimizer, and
+            record what it did in stats.
+        archive (typing.Union[BuildArchive, OutputBuffer, None]): if given,
+            the outputs go into this archive, or buffer, under their paths,
+            rather than to files. It cannot be streamed into.
+        program (typing.Optional[ProgramSignatures]): if given, the calls of
+            the class are checked against the signatures of the program it
+            is part of, before anything is written. A streamed file is not
+            checked.
+
+    Returns:
+        typing.List[str]: paths of the output files.
+
+    Raises:
+        JackCallError: if a call of the class is not valid in the program.
+    """
+    optimizer = _new_optimizer(optimize)
+    with stats.analyzing():
+        stats.add_input(input_path)
+        if stream:
+            with stats.phase("stream"):
+                output_paths = _stream_path(input_path, formats, optimizer)
+            for output_path in output_paths:
+                stats.add_output(output_path)
+        else:
+            with open(input_path, 'r') as input_file:
+                tree = parse_file(input_file, cache, stats)
+            if program is not None:
+                with stats.phase("check calls"):
+                    program.check_class(tree, input_path)
+            output_paths = _write_outputs(
+                input_path, tree, formats, optimizer, stats, archive)
+        if optimizer is not None and "vm" in formats:
+            stats.add_optimization(optimizer)
+    return output_paths
+
+
+def _write_outputs(input_path: str, tree: JackAST.Class,
+                   formats: typing.Sequence[str],
+                   optimizer: typing.Optional["PeepholeOptimizer"],
+                   stats: FileStats,
+                   archive: typing.Union["BuildArchive", "OutputBuffer",
+                                         None] = None) -> \
+        typing.List[str]:
+    """Writes the syntax tree of a file into output files beside it, one for
+    every format, or into an archive, as analyze_path() does, and records
+    their sizes in stats.
+
+    Returns:
+        typing.List[str]: paths of the output files.
+    """
+    if archive is not None:
+        return _archive_outputs(input_path, tree, formats, optimizer, stats,
+                                archive)
+    output_paths = []
+    for output_format in formats:
+        binary = SERIALIZERS[output_format][2]
+        output_path = output_path_for(input_path, output_format)
+        try:
+            with stats.phase("write " + output_format), \
+                    open(output_path, 'wb' if binary else 'w') as output_file:
+                _new_serializer(output_format, output_file,
+                                optimizer).serialize(tree)
+        except BaseException:
+            # Such as VM code for a class that uses an undefined variable,
+            # or an interrupted write: the output is not left half written,
+            # for an incremental build to take as up to date.
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(output_path)
+            raise
+        stats.add_output(output_path)
+        output_paths.append(output_path)
+    return output_paths
+
+
+def _archive_outputs(input_path: str, tree: JackAST.Class,
+                     formats: typing.Sequence[str],
+                     optimizer: typing.Optional["PeepholeOptimizer"],
+                     stats: FileStats,
+                     archive: typing.Union["BuildArchive",
+                                           "OutputBuffer"]) -> \
+        typing.List[str]:
+    """_write_outputs() into an archive. Every output is serialized in memory
+    first, and none goes into the archive unless all of them succeed, as an
+    archive member cannot be taken back.
+    """
+    outputs = []
+    for output_format in formats:
+        binary = SERIALIZERS[output_format][2]
+        with stats.phase("write " + output_format):
+            output_file = io.BytesIO() if binary else io.StringIO()
+            _new_serializer(output_format, output_file, optimizer).serialize(
+                tree)
+            data = output_file.getvalue()
+            if not binary:
+                data = data.encode("utf-8")
+        outputs.append((output_path_for(input_path, output_format), data))
+    with stats.phase("archive"):
+        for output_path, data in outputs:
+            archive.add(output_path, data)
+            stats.add_output(output_path, len(data))
+    return [output_path for output_path, _ in outputs]
+
+
+def _stream_path(input_path: str, formats: typing.Sequence[str],
+                 optimizer: typing.Optional["PeepholeOptimizer"]) -> \
+        typing.List[str]:
+    """analyze_path() in streaming mode."""
+    output_paths = []
+    try:
+        with open(input_path, 'r') as input_file, \
+                contextlib.ExitStack() as output_files:
+            serializers = []
+            for output_format in formats:
+                binary = SERIALIZERS[output_format][2]
+                output_path = output_path_for(input_path, output_format)
+                output_file = output_files.enter_context(
+                    open(output_path, 'wb' if binary else 'w'))
+                serializers.append(
+                    _new_serializer(output_format, output_file, optimizer))
+                output_paths.append(output_path)
+            tokenizer = JackTokenizer(input_file,
+                                      chunk_size=DEFAULT_CHUNK_SIZE)
+            engine = CompilationEngine(
+                tokenizer, None, TeeSerializer(serializers), lazy=True)
+            engine.compile_class()
+    except BaseException:
+        # Outputs are written as the file is parsed, so a syntax error, or
+        # any other failure, leaves them half written: they are removed,
+        # once closed, as _write_outputs() removes its own.
+        for output_path in output_paths:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(output_path)
+        raise
+    return output_paths
+
+
+def _analyze_in_worker(input_path: str,
+                       cache: typing.Optional["ParseTreeCache"],
+                       formats: typing.Sequence[str], stream: bool,
+                       stats: FileStats, optimize: bool,
+                       archived: bool,
+                       program: typing.Optional["ProgramSignatures"]) -> \
+        typing.Tuple[FileStats, typing.Optional["OutputBuffer"]]:
+    """analyze_path() in a worker process, which returns the statistics it
+    filled in, as they are a copy of those of the parent process, and, if
+    archived, the outputs, for the parent process to write to its archive.
+    """
+    outputs = None
+    if archived:
+        from BuildArchive import OutputBuffer
+        outputs = OutputBuffer()
+    analyze_path(input_path, cache, formats, stream, stats, optimize, outputs,
+                 program)
+    return stats, outputs
+
+
+def _analyze_all(input_paths: typing.Iterable[str], jobs: int,
+                 cache: typing.Optional["ParseTreeCache"],
+                 formats: typing.Sequence[str], stream: bool,
+                 stats: typing.Optional[BuildStats] = None,
+                 optimize: bool = False,
+                 archive: typing.Optional["BuildArchive"] = None,
+                 signatures: typing.Optional["SignatureIndex"] = None) -> \
+        typing.Iterator[typing.Tuple[str, typing.Optional[Exception]]]:
+    """Analyzes many .jack files, possibly in parallel, adding the statistics
+    of every file that succeeds to stats, if given, and checking the calls
+    of every class against the program of its directory in signatures, if
+    given.
+
+    Files are handed out to the workers as input_paths yields them, so that
+    the first files are analyzed while the rest are still being found. Only
+    this process writes to the archive, if any, as each file finishes.
+
+    Yields:
+        typing.Tuple[str, typing.Optional[Exception]]: every input path with
+        the error it failed with, or None, in the order they finish.
+    """
+    if isinstance(input_paths, collections.abc.Sequence):
+        # Start the largest files first, so that a big file picked up last
+        # does not keep the whole batch waiting once every other worker is
+        # idle. Only possible when all files are known up front.
+        input_paths = sorted(input_paths, key=os.path.getsize, reverse=True)
+    input_paths = iter(input_paths)
+    first_paths = list(itertools.islice(input_paths, 2))
+    input_paths = itertools.chain(first_paths, input_paths)
+    if jobs <= 1 or len(first_paths) <= 1:
+        for input_path in input_paths:
+            file_stats = NO_STATS if stats is None else \
+                stats.new_file(input_path)
+            try:
+                analyze_path(input_path, cache, formats, stream, file_stats,
+                             optimize, archive,
+                             _program_of(signatures, input_path))
+            except Exception as error:
+                yield input_path, error
+            else:
+                if stats is not None:
+                    stats.add(file_stats)
+                yield input_path, None
+        return
+    # Only imported here, as most of the startup time of a build of a few
+    # files would otherwise go to importing them.
+    import concurrent.futures
+    import queue
+    with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+        futures = {}
+        finished = queue.SimpleQueue()  # Futures, as they finish.
+
+        def collect(future: concurrent.futures.Future) -> typing.Tuple[
+                str, typing.Optional[Exception]]:
+            error = future.exception()
+            if error is None:
+                file_stats, outputs = future.result()
+                if stats is not None:
+                    stats.add(file_stats)
+                if outputs is not None:
+                    for output_path, data in outputs.outputs:
+                        archive.add(output_path, data)
+            return futures.pop(future), error
+
+        for input_path in input_paths:
+            future = executor.submit(
+                _analyze_in_worker, input_path, cache, formats, stream,
+                NO_STATS if stats is None else stats.new_file(input_path),
+                optimize, archive is not None,
+                _program_of(signatures, input_path))
+            futures[future] = input_path
+            future.add_done_callback(finished.put)
+            while not finished.empty():
+                yield collect(finished.get())
+        while futures:
+            yield collect(finished.get())
+
+
+def _program_of(signatures: typing.Optional["SignatureIndex"],
+                input_path: str) -> typing.Optional["ProgramSignatures"]:
+    if signatures is None:
+        return None
+    return signatures.program(os.path.dirname(input_path))
+
+
+def _output_paths_for(input_path: str,
+                      formats: typing.Sequence[str]) -> typing.List[str]:
+    return [output_path_for(input_path, output_format)
+            for output_format in formats]
+
+
+def format_failure(input_path: str, error: Exception) -> str:
+    """
+    Args:
+        input_path (str): path of a file that failed to analyze.
+        error (Exception): what it failed with.
+
+    Returns:
+        str: the error, as reported to the user. Syntax errors are listed
+        one per line, each as "path:line:column: message".
+    """
+    if isinstance(error, JackSyntaxError):
+        return str(error)
+    return "{}: {}".format(input_path, error)
+
+
+def _stale_paths(input_paths: typing.Iterable[str],
+                 formats: typing.Sequence[str],
+                 manifests: typing.Dict[str, "BuildManifest"],
+                 stats: typing.Optional[BuildStats],
+                 analyzer_version: str,
+                 signatures: typing.Optional["SignatureIndex"] = None) -> \
+        typing.Iterator[str]:
+    """Yields the input paths whose outputs are not up to date, loading the
+    BuildManifest of every directory into manifests as it goes. If calls are
+    checked against signatures, every file of a directory whose signatures
+    changed is, as calls that were valid may no longer be.
+    """
+    from BuildManifest import BuildManifest
+    for input_path in input_paths:
+        directory = os.path.dirname(input_path)
+        if directory not in manifests:
+            manifests[directory] = BuildManifest(directory, analyzer_version)
+        if (signatures is None or not signatures.changed(directory)) and \
+                manifests[directory].is_up_to_date(
+                input_path, _output_paths_for(input_path, formats)):
+            if stats is not None:
+                stats.up_to_date += 1
+        else:
+            yield input_path
+
+
+def analyze_paths(input_paths: typing.Iterable[str], jobs: int = 1,
+                  incremental: bool = False,
+                  cache: typing.Optional["ParseTreeCache"] = None,
+                  formats: typing.Sequence[str] = DEFAULT_FORMATS,
+                  stream: bool = False,
+                  stats: typing.Optional[BuildStats] = None,
+                  optimize: bool = False,
+                  archive: typing.Optional["BuildArchive"] = None,
+                  signatures: typing.Optional["SignatureIndex"] = None) -> \
+        typing.List[typing.Tuple[str, Exception]]:
+    """Analyzes many .jack files, possibly in parallel.
+
+    A file that fails to compile does not stop the others.
+
+    Args:
+        input_paths (typing.Iterable[str]): paths of the files to analyze.
+            When all of them are given up front, as a list, the largest are
+            analyzed first. Otherwise, they are analyzed as they come, as
+            iter_input_files() finds them.
+        jobs (int): number of worker processes to fan the files out to. With
+            a single job the files are analyzed one after another, in this
+            process.
+        incremental (bool): skip files whose output is up to date according
+            to the BuildManifest of their directory, and update it.
+        cache (typing.Optional[ParseTreeCache]): parse tree cache to share
+            between all files. It is trimmed to its size limit at the end.
+        formats (typing.Sequence[str]): formats of the output files, from
+            JackSerializers.SERIALIZERS.
+        stream (bool): analyze every file in a single streaming pass, as in
+            analyze_path().
+        stats (typing.Optional[BuildStats]): if given, records statistics of
+            the build, and of every file analyzed, in these.
+        optimize (bool): run VM code through the peephole optimizer, as in
+            analyze_path().
+        archive (typing.Optional[BuildArchive]): if given, all outputs go
+            into this archive, in the order their files finish, rather than
+            to files, as in analyze_path(). It cannot be combined with an
+            incremental or streaming build, which both need output files.
+        signatures (typing.Optional[SignatureIndex]): if given, the calls of
+            every class are checked against the program of its directory, as
+            in analyze_path(), and an incremental build redoes every file of
+            a directory whose signatures changed. It must be up to date with
+            the directories of the files.
+
+    Returns:
+        typing.List[typing.Tuple[str, Exception]]: the path and error of
+        every file that failed, in the order they failed.
+    """
+    building = contextlib.nullcontext() if stats is None else \
+        stats.building()
+    with building:
+        manifests = {}
+        if incremental:
+            # Optimized outputs differ from the others, so an incremental
+            # build redoes the outputs built the other way.
+            stale_paths = _stale_paths(
+                input_paths, formats, manifests, stats,
+                ANALYZER_VERSION + "-O" if optimize else ANALYZER_VERSION,
+                signatures)
+            input_paths = list(stale_paths) if isinstance(
+                input_paths, collections.abc.Sequence) else stale_paths
+        failures = []
+        for input_path, error in _analyze_all(
+                input_paths, jobs, cache, formats, stream, stats, optimize,
+                archive, signatures):
+            manifest = manifests.get(os.path.dirname(input_path))
+            if error is not None:
+                failures.append((input_path, error))
+                if manifest is not None:
+                    manifest.forget(input_path)
+            elif manifest is not None:
+                manifest.record(
+                    input_path, _output_paths_for(input_path, formats))
+        for manifest in manifests.values():
+            manifest.save()
+        if cache is not None:
+            cache.evict()
+    if stats is not None:
+        stats.failures += len(failures)
+    return failures
+
+
+def analyze_program(input_paths: typing.Iterable[str],
+                    cache: typing.Optional["ParseTreeCache"] = None,
+                    formats: typing.Sequence[str] = DEFAULT_FORMATS,
+                    stats: typing.Optional[BuildStats] = None,
+                    optimize: bool = False,
+                    archive: typing.Optional["BuildArchive"] = None,
+                    signatures: typing.Optional["SignatureIndex"] = None) -> \
+        typing.List[typing.Tuple[str, Exception]]:
+    """Analyzes the .jack files of a whole program into output files beside
+    them, as analyze_paths() does, but leaves out every subroutine that a run
+    of the program can never call, as CallGraph finds them, and writes no
+    output at all for a class none of whose subroutines it can call. Stale
+    outputs of such classes are removed.
+
+    Every file is parsed before anything is written, and nothing is written
+    if any of them fails to compile, as the calls it makes are unknown.
+
+    Args:
+        input_paths (typing.Iterable[str]): paths of all the files of the
+            program.
+        cache (typing.Optional[ParseTreeCache]): parse tree cache to use.
+        formats (typing.Sequence[str]): formats of the output files, from
+            JackSerializers.SERIALIZERS.
+        stats (typing.Optional[BuildStats]): if given, records statistics of
+            the build, and of every file analyzed, in these.
+        optimize (bool): run VM code through the peephole optimizer, as in
+            analyze_path().
+        archive (typing.Optional[BuildArchive]): if given, the outputs go
+            into this archive rather than to files, as in analyze_path(),
+            and classes left out have no stale outputs to remove.
+        signatures (typing.Optional[SignatureIndex]): if given, the calls of
+            every class are checked, as in analyze_paths(), and a class with
+            a call that is not valid fails.
+
+    Returns:
+        typing.List[typing.Tuple[str, Exception]]: the path and error of
+        every file that failed.
+
+    Raises:
+        ValueError: if the program has none of CallGraph.ENTRY_POINTS.
+    """
+    from CallGraph import CallGraph, prune
+    building = contextlib.nullcontext() if stats is None else \
+        stats.building()
+    with building:
+        trees = {}
+        failures = []
+        graph = CallGraph()
+        for input_path in input_paths:
+            file_stats = NO_STATS if stats is None else \
+                stats.new_file(input_path)
+            try:
+                with file_stats.analyzing():
+                    file_stats.add_input(input_path)
+                    with open(input_path, 'r') as input_file:
+                        tree = parse_file(input_file, cache, file_stats)
+                    if signatures is not None:
+                        with file_stats.phase("check calls"):
+                            _program_of(signatures, input_path).check_class(
+                                tree, input_path)
+                    with file_stats.phase("call graph"):
+                        graph.add_class(tree)
+            except Exception as error:
+                failures.append((input_path, error))
+            else:
+                trees[input_path] = (tree, file_stats)
+        if failures:
+            trees = {}
+        else:
+            reachable = graph.reachable()
+            if stats is not None:
+                stats.unreachable_subroutines += len(graph.calls) - len(
+                    reachable)
+        for input_path, (tree, file_stats) in trees.items():
+            if stats is not None:
+                stats.add(file_stats)
+            tree = prune(tree, reachable)
+            if tree is None:
+                if archive is None:
+                    for output_path in _output_paths_for(input_path,
+                                                         formats):
+                        with contextlib.suppress(FileNotFoundError):
+                            os.remove(output_path)
+                if stats is not None:
+                    stats.unreachable_classes += 1
+                continue
+            optimizer = _new_optimizer(optimize)
+            with file_stats.analyzing():
+                _write_outputs(input_path, tree, formats, optimizer,
+                               file_stats, archive)
+            if optimizer is not None and "vm" in formats:
+                file_stats.add_optimization(optimizer)
+        if cache is not None:
+            cache.evict()
+    if stats is not None:
+        stats.failures += len(failures)
+    return failures
+
+
+if "__main__" == __name__:
+    # Parses the input path and calls analyze_file on each input file.
+    # This opens both the input and the output files!
+    # Both are closed automatically when the code finishes running.
+    # If the output file does not exist, it is created automatically in the
+    # correct path, using the correct filename.
+    if len(sys.argv) > 1 and not any(
+            argument.startswith("-") for argument in sys.argv[1:]):
+        # Only input paths, as the course runs it: every option has its
+        # default, so the arguments need no parser. Importing argparse, and
+        # the modules it loads to format help, takes a good part of the
+        # startup time of a run on a single small file.
+        failures = analyze_paths(iter_input_files(sys.argv[1:]))
+        for input_path, error in failures:
+            print(format_failure(input_path, error), file=sys.stderr)
+        sys.exit(1 if failures else 0)
+    import argparse
+    parser = argparse.ArgumentParser(
+        prog="JackAnalyzer",
+        usage="JackAnalyzer <input path> [<input path> ...] [options]")
+    parser.add_argument(
+        "input_paths", nargs="*", metavar="input_path",
+        help=".jack files or directories")
+    parser.add_argument(
+        "--files-from", metavar="FILE",
+        help="also analyze the .jack files and directories listed in FILE, "
+             "one per line, or on stdin if FILE is -")
+    parser.add_argument(
+        "-r", "--recursive", action="store_true",
+        help="also analyze the .jack files in the subdirectories of every "
+             "directory, at any depth")
+    parser.add_argument(
+        "--include", action="append", default=[], metavar="GLOB",
+        help="only analyze the .jack files found in directories whose name, "
+             "or relative path if GLOB holds a /, matches GLOB; may be given "
+             "several times")
+    parser.add_argument(
+        "--exclude", action="append", default=[], metavar="GLOB",
+        help="skip the files and subdirectories found in directories whose "
+             "name, or relative path if GLOB holds a /, matches GLOB; may be "
+             "given several times")
+    parser.add_argument(
+        "-j", "--jobs", type=int, nargs="?", const=os.cpu_count(), default=1,
+        metavar="N", help="analyze files in N worker processes "
+                          "(default: 1, or the CPU count if N is omitted)")
+    parser.add_argument(
+        "-i", "--incremental", action="store_true",
+        help="only analyze files whose sources changed or whose outputs are "
+             "missing or stale since the last incremental run")
+    parser.add_argument(
+        "--cache-dir", metavar="DIR",
+        help="reuse and store parse trees in this cache directory")
+    parser.add_argument(
+        "--cache-size", type=int, metavar="BYTES",
+        help="evict least recently used parse trees beyond this size "
+             "(default: 256 MiB)")
+    parser.add_argument(
+        "-f", "--format", action="append", dest="formats",
+        choices=list(SERIALIZERS), metavar="FORMAT",
+        help="write outputs in this format, one of {}; may be given several "
+             "times to write several formats from a single parse (default: "
+             "xml)".format(", ".join(SERIALIZERS)))
+    parser.add_argument(
+        "-O", "--optimize", action="store_true",
+        help="run the VM code of the vm format through a peephole "
+             "optimizer; --stats reports what it did")
+    parser.add_argument(
+        "-W", "--whole-program", action="store_true",
+        help="treat the input files as a single program, and leave out of "
+             "the outputs the subroutines and classes that no run of it, from "
+             "Main.main or Sys.init, can call")
+    parser.add_argument(
+        "--check-calls", action="store_true",
+        help="fail a class that calls a class or subroutine its program, the "
+             ".jack files of its directory and the Jack OS, does not have, or "
+             "with the wrong number of arguments; the signatures of every "
+             "directory are kept in an index file in it and only reparsed for "
+             "files that changed")
+    parser.add_argument(
+        "-o", "--output", metavar="ARCHIVE",
+        help="write all outputs into a single archive rather than beside "
+             "their sources, named by their paths relative to the working "
+             "directory; a .tar file, compressed if named .tar.gz, .tgz, "
+             ".tar.bz2, .tar.xz or .txz, a .zip file, or - for records on "
+             "stdout, each a big-endian 4-byte name length and 8-byte data "
+             "length followed by the name and data; an archive file is only "
+             "replaced if every file compiles")
+    parser.add_argument(
+        "--stream", action="store_true",
+        help="stream every file in and write its outputs a class member at a "
+             "time, so memory stays bounded for very large files")
+    parser.add_argument(
+        "--stats", action="store_true",
+        help="print the time of every phase, token counts and output sizes "
+             "to stderr once done")
+    parser.add_argument(
+        "--stats-json", metavar="FILE",
+        help="write the same statistics, for the build and every file, as "
+             "JSON to FILE, or to stdout if FILE is -")
+    parser.add_argument(
+        "--stats-memory", action="store_true",
+        help="also record the peak allocation of every file in the "
+             "statistics, which makes analysis several times slower")
+    parser.add_argument(
+        "--profile", nargs="?", const="", metavar="FILE",
+        help="run the analysis of a single file under cProfile and print the "
+             "slowest functions to stderr, saving the profile to FILE if "
+             "given")
+    arguments = parser.parse_args()
+    if arguments.files_from is not None:
+        with contextlib.nullcontext(sys.stdin) \
+                if arguments.files_from == "-" \
+                else open(arguments.files_from, 'r') as files_from:
+            arguments.input_paths.extend(
+                line.strip() for line in files_from if line.strip())
+    if not arguments.input_paths:
+        parser.error("no input paths given")
+    if arguments.cache_size is not None and arguments.cache_size < 0:
+        parser.error("--cache-size cannot be negative")
+    if arguments.stream and arguments.cache_dir is not None:
+        parser.error("--stream cannot be combined with --cache-dir")
+    if arguments.stream and arguments.check_calls:
+        parser.error("--stream cannot be combined with --check-calls")
+    if arguments.whole_program and (arguments.stream or arguments.incremental
+                                    or arguments.profile is not None):
+        parser.error("--whole-program cannot be combined with --stream, "
+                     "--incremental or --profile")
+    if arguments.output is not None and (arguments.stream
+                                         or arguments.incremental):
+        parser.error("--output cannot be combined with --stream or "
+                     "--incremental")
+    if arguments.output is not None:
+        from BuildArchive import STDOUT, open_archive
+        if arguments.output == STDOUT and arguments.stats_json == "-":
+            parser.error("--output and --stats-json cannot both write to "
+                         "stdout")
+    cache = None
+    if arguments.cache_dir is not None:
+        from ParseTreeCache import DEFAULT_MAX_BYTES, ParseTreeCache
+        cache = ParseTreeCache(
+            arguments.cache_dir, ANALYZER_VERSION,
+            DEFAULT_MAX_BYTES if arguments.cache_size is None
+            else arguments.cache_size)
+    files_to_assemble = iter_input_files(
+        arguments.input_paths, arguments.recursive, arguments.include,
+        arguments.exclude)
+    if arguments.jobs > 1 and arguments.files_from != "-":
+        # Parallel builds start the largest files first, which takes every
+        # file up front, but paths read from stdin keep the order they were
+        # given in.
+        files_to_assemble = list(files_to_assemble)
+    formats = list(dict.fromkeys(arguments.formats or DEFAULT_FORMATS))
+    signatures = None
+    if arguments.check_calls:
+        from SignatureIndex import SignatureIndex
+        files_to_assemble = list(files_to_assemble)
+        signatures = SignatureIndex(cache)
+        signatures.update(map(os.path.dirname, files_to_assemble),
+                          arguments.jobs)
+    if arguments.profile is not None:
+        files_to_assemble = list(files_to_assemble)
+        if len(files_to_assemble) != 1:
+            parser.error("--profile needs a single .jack file")
+        import JackStats
+        print("\n".join(JackStats.profile(
+            lambda: analyze_path(files_to_assemble[0], cache, formats,
+                                 arguments.stream, NO_STATS,
+                                 arguments.optimize, None,
+                                 _program_of(signatures,
+                                             files_to_assemble[0])),
+            arguments.profile or None)), file=sys.stderr)
+        sys.exit(0)
+    stats = None
+    if arguments.stats or arguments.stats_json is not None:
+        stats = BuildStats(arguments.stats_memory)
+    archive = None
+    if arguments.output is not None:
+        try:
+            archive = open_archive(arguments.output)
+        except ValueError as error:
+            parser.error(str(error))
+        except OSError as error:
+            parser.error("cannot write {}: {}".format(arguments.output,
+                                                      error.strerror))
+    with archive or contextlib.nullcontext():
+        if arguments.whole_program:
+            try:
+                failures = analyze_program(files_to_assemble, cache, formats,
+                                           stats, arguments.optimize, archive,
+                                           signatures)
+            except ValueError as error:
+                parser.exit(1, "{}: {}\n".format(parser.prog, error))
+        else:
+            failures = analyze_paths(
+                files_to_assemble, arguments.jobs, arguments.incremental,
+                cache, formats, arguments.stream, stats, arguments.optimize,
+                archive, signatures)
+        if failures and archive is not None:
+            # The archive of the last build is kept rather than replaced by
+            # one without the outputs of the files that failed.
+            archive.discard()
+        if signatures is not None:
+            signatures.save()
+    for input_path, error in failures:
+        print(format_failure(input_path, error), file=sys.stderr)
+    if arguments.stats:
+        print("\n".join(stats.table()), file=sys.stderr)
+    if arguments.stats_json is not None:
+        import json
+        if arguments.stats_json == "-":
+            json.dump(stats.to_dict(), sys.stdout, indent=2)
+            print()
+        else:
+            with open(arguments.stats_json, 'w') as stats_file:
+                json.dump(stats.to_dict(), stats_file, indent=2)
+                stats_file.write("\n")
+    if failures:
+        sys.exit(1)
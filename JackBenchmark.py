@@ -0,0 +1,578 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+
+Benchmarks JackTokenizer, CompilationEngine, writing parse trees out as XML
+and compiling them into VM code, and JackAnalyzer.analyze_file(), separately
+on a corpus generated by JackCorpus, and checks that each of them scales
+linearly with the size of its input. Results are JSON, so that a run
+can be compared against a baseline saved by an earlier one.
+
+With --startup, it instead checks the startup time of JackAnalyzer on a
+single small file against the budget in README.md, as -X importtime reports
+it, and that none of the modules only other modes need is imported.
+
+With --expressions, it instead times CompilationEngine on single expressions
+grown deep or wide in every way JackCorpus.EXPRESSION_SHAPES lists, which
+ordinary code is too shallow to tell apart.
+"""
+import argparse
+import gc
+import io
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import typing
+import JackCorpus
+from CompilationEngine import CompilationEngine
+from JackAnalyzer import ANALYZER_VERSION, analyze_file
+from JackSerializers import VMSerializer, XMLSerializer
+from JackTokenizer import JackTokenizer
+
+STAGES = ("tokenizer", "engine", "write_xml", "write_vm", "analyze_file")
+DEFAULT_FILES = 20
+DEFAULT_REPEAT = 5
+DEFAULT_SCALES = (1, 10, 100)
+# A stage whose time grows faster than its input to this power between two
+# scales is flagged as super-linear.
+DEFAULT_MAX_EXPONENT = 1.25
+DEFAULT_TOLERANCE = 0.2
+# The time, in milliseconds, that the imports of a run of JackAnalyzer on a
+# single small file may take, beyond those of the interpreter starting up.
+DEFAULT_STARTUP_BUDGET_MS = 50
+# The modules such a run must not import, as only other modes need them.
+DEFERRED_MODULES = (
+    "BuildArchive", "BuildManifest", "CallGraph", "IncrementalParser",
+    "ParseTreeCache", "SignatureIndex", "VMOptimizer", "VMWriter",
+    "argparse", "concurrent.futures", "cProfile", "hashlib", "json",
+    "tarfile", "tracemalloc", "zipfile")
+_ANALYZER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              "JackAnalyzer.py")
+_IMPORT_TIME_PREFIX = "import time:"
+_MEGABYTE = 1024 * 1024
+_MIN_TIMED_SECONDS = 0.2
+
+
+def _stage_functions(paths: typing.List[str]) -> \
+        typing.Dict[str, typing.Callable[[], None]]:
+    """
+    Args:
+        paths (typing.List[str]): paths of the .jack files to run on.
+
+    Returns:
+        typing.Dict[str, typing.Callable[[], None]]: a function running every
+        stage on all the files, by stage.
+    """
+    sources = []
+    for path in paths:
+        with open(path, 'r') as input_file:
+            sources.append(input_file.read())
+    # A tokenizer only lexes its input once, so the engine can be timed on
+    # tokenizers that are done lexing.
+    tokenizers = [JackTokenizer(io.StringIO(source)) for source in sources]
+    for tokenizer in tokenizers:
+        tokenizer.token_stream()
+    # The back ends are timed on the same trees, so that compiling into VM
+    # code can be compared with writing XML.
+    trees = [CompilationEngine(tokenizer, None).compile_class()
+             for tokenizer in tokenizers]
+
+    def tokenize() -> None:
+        for source in sources:
+            JackTokenizer(io.StringIO(source)).token_stream()
+
+    def parse() -> None:
+        for tokenizer in tokenizers:
+            CompilationEngine(tokenizer, None).compile_class()
+
+    def write_xml() -> None:
+        for tree in trees:
+            XMLSerializer(io.StringIO()).serialize(tree)
+
+    def write_vm() -> None:
+        for tree in trees:
+            VMSerializer(io.StringIO()).serialize(tree)
+
+    def analyze() -> None:
+        for path in paths:
+            with open(path, 'r') as input_file, \
+                    open(os.path.splitext(path)[0] + ".xml", 'w') as \
+                    output_file:
+                analyze_file(input_file, output_file)
+
+    return {"tokenizer": tokenize, "engine": parse, "write_xml": write_xml,
+            "write_vm": write_vm, "analyze_file": analyze}
+
+
+def _best_time(function: typing.Callable[[], None], repeat: int) -> float:
+    """The fastest of repeat runs of function, where a run that is too short
+    to time reliably is repeated until it is not, as timeit does.
+
+    As in timeit, the cyclic garbage collector is off while function runs.
+    Syntax trees hold no cycles, but a collection walks every node alive, so
+    that the time of a stage building a large tree would otherwise grow
+    faster than its input, with the number of collections it triggers.
+    """
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        number = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                function()
+            best = time.perf_counter() - start
+            if best >= _MIN_TIMED_SECONDS:
+                break
+            number *= 2
+        for _ in range(repeat - 1):
+            start = time.perf_counter()
+            for _ in range(number):
+                function()
+            best = min(best, time.perf_counter() - start)
+    finally:
+        if collecting:
+            gc.enable()
+    return best / number
+
+
+def _peak_memory(function: typing.Callable[[], None]) -> int:
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(paths: typing.List[str], repeat: int = DEFAULT_REPEAT) -> \
+        typing.Dict[str, typing.Any]:
+    """Times every stage on a set of files.
+
+    Args:
+        paths (typing.List[str]): paths of the .jack files to run on.
+        repeat (int): the number of runs of every stage, of which the fastest
+            is reported. Runs shorter than 0.2 seconds run the stage several
+            times over.
+
+    Returns:
+        typing.Dict[str, typing.Any]: the size of the input, in "bytes" and
+        "tokens", and under "stages", the "seconds", "tokens_per_second",
+        "mb_per_second" and "peak_memory_bytes" of every stage. Peak memory is
+        what Python allocated, as traced in a separate run.
+    """
+    size = sum(os.path.getsize(path) for path in paths)
+    tokens = 0
+    for path in paths:
+        with open(path, 'r') as input_file:
+            tokens += len(JackTokenizer(input_file).token_stream())
+    stages = {}
+    for stage, function in _stage_functions(paths).items():
+        seconds = _best_time(function, repeat)
+        stages[stage] = {
+            "seconds": seconds,
+            "tokens_per_second": tokens / seconds,
+            "mb_per_second": size / _MEGABYTE / seconds,
+            "peak_memory_bytes": _peak_memory(function)}
+    return {"bytes": size, "tokens": tokens, "stages": stages}
+
+
+def measure_scaling(directory: str, scales: typing.Sequence[int],
+                    seed: str, settings: typing.Dict[str, typing.Any],
+                    repeat: int = DEFAULT_REPEAT,
+                    max_exponent: float = DEFAULT_MAX_EXPONENT) -> \
+        typing.Dict[str, typing.Any]:
+    """Times every stage on a single class generated at several sizes.
+
+    The class at scale n has n times the subroutines of the class at scale 1.
+    Between every two consecutive scales, the growth of the time of a stage
+    is fitted to the growth of the number of tokens as tokens ** exponent,
+    and a stage is flagged as super-linear if an exponent exceeds
+    max_exponent.
+
+    Args:
+        directory (str): where to write the classes.
+        scales (typing.Sequence[int]): the sizes, in increasing order.
+        seed (str): seeds the generator.
+        settings (typing.Dict[str, typing.Any]): the settings of
+            JackCorpus.generate_class() at scale 1.
+        repeat (int): as in measure().
+        max_exponent (float): the largest exponent tolerated.
+
+    Returns:
+        typing.Dict[str, typing.Any]: under "runs", the result of measure()
+        at every scale, with its "scale", and under "exponents", the
+        exponents of every stage. "superlinear" lists the stages flagged.
+    """
+    runs = []
+    for scale in scales:
+        scaled_settings = dict(settings)
+        scaled_settings["subroutines"] = settings["subroutines"] * scale
+        path = os.path.join(directory, "Scale{}.jack".format(scale))
+        with open(path, 'w') as output_file:
+            output_file.write(JackCorpus.generate_class(
+                "Scale{}".format(scale), seed, **scaled_settings))
+        run = measure([path], repeat)
+        run["scale"] = scale
+        runs.append(run)
+    exponents = {stage: [] for stage in STAGES}
+    for smaller, larger in zip(runs, runs[1:]):
+        growth = math.log(larger["tokens"] / smaller["tokens"])
+        for stage in STAGES:
+            exponents[stage].append(math.log(
+                larger["stages"][stage]["seconds"] /
+                smaller["stages"][stage]["seconds"]) / growth)
+    return {"runs": runs, "exponents": exponents,
+            "superlinear": [stage for stage in STAGES
+                            if any(exponent > max_exponent
+                                   for exponent in exponents[stage])]}
+
+
+def measure_expressions(size: int = JackCorpus.DEFAULT_EXPRESSION_SIZE,
+                        repeat: int = DEFAULT_REPEAT) -> \
+        typing.Dict[str, typing.Dict[str, float]]:
+    """Times CompilationEngine on a class returning a single expression of
+    every shape in JackCorpus.EXPRESSION_SHAPES.
+
+    Args:
+        size (int): the size of every expression, as in
+            JackCorpus.generate_expression().
+        repeat (int): as in measure().
+
+    Returns:
+        typing.Dict[str, typing.Dict[str, float]]: the "tokens", "seconds"
+        and "tokens_per_second" of parsing the class, by shape.
+    """
+    results = {}
+    for shape in JackCorpus.EXPRESSION_SHAPES:
+        tokenizer = JackTokenizer(io.StringIO(
+            JackCorpus.generate_expression_class(shape, size)))
+        tokens = len(tokenizer.token_stream())
+        seconds = _best_time(
+            lambda: CompilationEngine(tokenizer, None).compile_class(),
+            repeat)
+        results[shape] = {"tokens": tokens, "seconds": seconds,
+                          "tokens_per_second": tokens / seconds}
+    return results
+
+
+def _import_times(arguments: typing.List[str]) -> \
+        typing.Tuple[typing.Dict[str, int], typing.Set[str]]:
+    """Runs a new interpreter under -X importtime.
+
+    Args:
+        arguments (typing.List[str]): its arguments, after the options.
+
+    Returns:
+        typing.Tuple[typing.Dict[str, int], typing.Set[str]]: the cumulative
+        time, in microseconds, of every import made at the top level rather
+        than by another import, by module, and all the modules imported.
+
+    Raises:
+        subprocess.CalledProcessError: if the run fails.
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime"] + arguments, check=True,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        universal_newlines=True)
+    top_level = {}
+    modules = set()
+    for line in process.stderr.splitlines():
+        if not line.startswith(_IMPORT_TIME_PREFIX):
+            continue
+        fields = line[len(_IMPORT_TIME_PREFIX):].split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue  # The header.
+        # Nested imports are indented by two more spaces per level.
+        module = fields[2].strip()
+        modules.add(module)
+        if not fields[2].startswith("  "):
+            top_level[module] = int(fields[1])
+    return top_level, modules
+
+
+def measure_startup(repeat: int = DEFAULT_REPEAT) -> \
+        typing.Dict[str, typing.Any]:
+    """Times runs of JackAnalyzer on a single small generated class, each in
+    a new interpreter, as an editor or the course's test scripts run it.
+
+    Args:
+        repeat (int): the number of runs, of which the fastest is reported.
+
+    Returns:
+        typing.Dict[str, typing.Any]: under "import_ms", the time the
+        imports of a run take, beyond those of the interpreter starting up,
+        under "seconds" and "interpreter_seconds", the wall time of a whole
+        run and of an interpreter that runs nothing, and under "modules", the
+        modules a run imports beyond those of the interpreter, sorted.
+    """
+    interpreter_modules = _import_times(["-c", "pass"])[1]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "Main.jack")
+        with open(path, 'w') as output_file:
+            output_file.write(JackCorpus.generate_class("Main", subroutines=2))
+        import_microseconds = None
+        for _ in range(repeat):
+            top_level, modules = _import_times([_ANALYZER_PATH, path])
+            microseconds = sum(
+                cumulative for module, cumulative in top_level.items()
+                if module not in interpreter_modules)
+            if import_microseconds is None or \
+                    microseconds < import_microseconds:
+                import_microseconds = microseconds
+
+        def run(*arguments: str) -> None:
+            subprocess.run((sys.executable,) + arguments, check=True,
+                           stdout=subprocess.DEVNULL)
+
+        seconds = min(_wall_time(run, _ANALYZER_PATH, path)
+                      for _ in range(repeat))
+        interpreter_seconds = min(_wall_time(run, "-c", "pass")
+                                  for _ in range(repeat))
+    return {"import_ms": import_microseconds / 1000, "seconds": seconds,
+            "interpreter_seconds": interpreter_seconds,
+            "modules": sorted(modules - interpreter_modules)}
+
+
+def _wall_time(function: typing.Callable[..., None], *arguments) -> float:
+    start = time.perf_counter()
+    function(*arguments)
+    return time.perf_counter() - start
+
+
+def check_startup(results: typing.Dict[str, typing.Any],
+                  budget_ms: float = DEFAULT_STARTUP_BUDGET_MS) -> \
+        typing.List[str]:
+    """
+    Args:
+        results (typing.Dict[str, typing.Any]): results of measure_startup().
+        budget_ms (float): the time the imports may take, in milliseconds.
+
+    Returns:
+        typing.List[str]: a line for every way the run went over budget.
+    """
+    problems = []
+    if results["import_ms"] > budget_ms:
+        problems.append("imports took {:.1f} ms, over the budget of {:g} "
+                        "ms".format(results["import_ms"], budget_ms))
+    for module in DEFERRED_MODULES:
+        if module in results["modules"]:
+            problems.append("{} was imported, although only other modes "
+                            "need it".format(module))
+    return problems
+
+
+def run_benchmark(files: int = DEFAULT_FILES, seed: str = "0",
+                  settings: typing.Optional[typing.Dict[str, typing.Any]] =
+                  None, repeat: int = DEFAULT_REPEAT,
+                  scales: typing.Sequence[int] = DEFAULT_SCALES,
+                  max_exponent: float = DEFAULT_MAX_EXPONENT) -> \
+        typing.Dict[str, typing.Any]:
+    """Generates a corpus in a temporary directory and benchmarks it.
+
+    Args:
+        files (int): the number of files in the corpus.
+        seed (str): seeds the generator.
+        settings (typing.Optional[typing.Dict[str, typing.Any]]): the
+            settings of JackCorpus.generate_class(), its defaults if not
+            given.
+        repeat (int): as in measure().
+        scales (typing.Sequence[int]): as in measure_scaling(), which is not
+            run if there are less than two.
+        max_exponent (float): as in measure_scaling().
+
+    Returns:
+        typing.Dict[str, typing.Any]: the results, which are JSON
+        serializable.
+    """
+    settings = dict(settings or {})
+    settings.setdefault("subroutines", JackCorpus.DEFAULT_SUBROUTINES)
+    results = {
+        "analyzer_version": ANALYZER_VERSION,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "corpus": dict(settings, files=files, seed=seed)}
+    with tempfile.TemporaryDirectory() as directory:
+        paths = JackCorpus.generate_corpus(
+            os.path.join(directory, "corpus"), files, seed, **settings)
+        results.update(measure(paths, repeat))
+        if len(scales) > 1:
+            results["scaling"] = measure_scaling(
+                directory, scales, seed, settings, repeat, max_exponent)
+    return results
+
+
+def compare(results: typing.Dict[str, typing.Any],
+            baseline: typing.Dict[str, typing.Any],
+            tolerance: float = DEFAULT_TOLERANCE) -> \
+        typing.Tuple[typing.List[str], typing.List[str]]:
+    """Compares results against a baseline.
+
+    Throughput is compared rather than time, so that corpora of different
+    sizes can still be compared, although results are only meaningful for
+    the same corpus settings, on the same machine.
+
+    Args:
+        results (typing.Dict[str, typing.Any]): results of run_benchmark().
+        baseline (typing.Dict[str, typing.Any]): earlier results.
+        tolerance (float): the fraction by which throughput may drop, or peak
+            memory grow, before it counts as a regression.
+
+    Returns:
+        typing.Tuple[typing.List[str], typing.List[str]]: a line describing
+        the change of every stage, and a line for every regression.
+    """
+    lines = []
+    regressions = []
+    if results.get("corpus") != baseline.get("corpus"):
+        lines.append("warning: the corpus settings differ from the baseline")
+    for stage in STAGES:
+        new = results["stages"].get(stage)
+        old = baseline.get("stages", {}).get(stage)
+        if new is None or old is None:
+            continue
+        speed = new["tokens_per_second"] / old["tokens_per_second"] - 1
+        memory = new["peak_memory_bytes"] / old["peak_memory_bytes"] - 1
+        lines.append("{:<13} throughput {:+.1%}, peak memory {:+.1%}".format(
+            stage, speed, memory))
+        if speed < -tolerance:
+            regressions.append("{}: throughput dropped by {:.1%}".format(
+                stage, -speed))
+        if memory > tolerance:
+            regressions.append("{}: peak memory grew by {:.1%}".format(
+                stage, memory))
+    return lines, regressions
+
+
+def summary(results: typing.Dict[str, typing.Any]) -> typing.List[str]:
+    """
+    Args:
+        results (typing.Dict[str, typing.Any]): results of run_benchmark().
+
+    Returns:
+        typing.List[str]: the results, as lines of text.
+    """
+    lines = ["{} files, {:.2f} MB, {} tokens".format(
+        results["corpus"]["files"], results["bytes"] / _MEGABYTE,
+        results["tokens"])]
+    for stage in STAGES:
+        numbers = results["stages"][stage]
+        lines.append(
+            "{:<13} {:8.4f} s {:10.0f} tokens/s {:7.2f} MB/s "
+            "peak {:7.2f} MB".format(
+                stage, numbers["seconds"], numbers["tokens_per_second"],
+                numbers["mb_per_second"],
+                numbers["peak_memory_bytes"] / _MEGABYTE))
+    scaling = results.get("scaling")
+    if scaling is not None:
+        lines.append("scaling over {} tokens, time grows as tokens to the "
+                     "power of:".format(" -> ".join(
+                         str(run["tokens"]) for run in scaling["runs"])))
+        for stage in STAGES:
+            lines.append("{:<13} {}{}".format(stage, ", ".join(
+                "{:.2f}".format(exponent)
+                for exponent in scaling["exponents"][stage]),
+                " SUPER-LINEAR" if stage in scaling["superlinear"] else ""))
+    return lines
+
+
+if "__main__" == __name__:
+    parser = argparse.ArgumentParser(
+        prog="JackBenchmark",
+        description="Benchmarks the tokenizer, the compilation engine, the "
+                    "XML and VM back ends and the whole analyzer on a "
+                    "generated corpus. Exits with "
+                    "status 1 if a stage scales super-linearly or regressed "
+                    "against the baseline, or, with --startup, if startup "
+                    "went over its budget.")
+    parser.add_argument(
+        "--files", type=int, default=DEFAULT_FILES, metavar="N",
+        help="number of files in the corpus (default: %(default)s)")
+    JackCorpus.add_settings_arguments(parser)
+    parser.add_argument(
+        "--repeat", type=int, default=DEFAULT_REPEAT, metavar="N",
+        help="runs of every stage, the fastest counts (default: %(default)s)")
+    parser.add_argument(
+        "--scales", type=int, nargs="*", default=list(DEFAULT_SCALES),
+        metavar="N", help="sizes of the scaling runs, relative to a single "
+                          "class of the corpus; none to skip them "
+                          "(default: 1 10 100)")
+    parser.add_argument(
+        "--max-exponent", type=float, default=DEFAULT_MAX_EXPONENT,
+        metavar="E", help="flag a stage whose time grows faster than its "
+                          "input to this power (default: %(default)s)")
+    parser.add_argument(
+        "--output", metavar="FILE", help="save the results as JSON")
+    parser.add_argument(
+        "--baseline", metavar="FILE",
+        help="compare against results saved by an earlier run")
+    parser.add_argument(
+        "--tolerance", type=float, default=DEFAULT_TOLERANCE, metavar="F",
+        help="fraction by which a stage may get slower, or use more memory, "
+             "than in the baseline (default: %(default)s)")
+    parser.add_argument(
+        "--startup", action="store_true",
+        help="only time the startup of JackAnalyzer on a single small file, "
+             "and check it against the budget")
+    parser.add_argument(
+        "--startup-budget", type=float, default=DEFAULT_STARTUP_BUDGET_MS,
+        metavar="MS", help="milliseconds the imports of such a run may take "
+                           "(default: %(default)s)")
+    parser.add_argument(
+        "--expressions", action="store_true",
+        help="only time the compilation engine on single expressions of "
+             "every shape: {}".format(", ".join(JackCorpus.EXPRESSION_SHAPES)))
+    parser.add_argument(
+        "--expression-size", type=int,
+        default=JackCorpus.DEFAULT_EXPRESSION_SIZE, metavar="N",
+        help="nesting depth, or width, of such an expression "
+             "(default: %(default)s)")
+    arguments = parser.parse_args()
+    if arguments.expressions:
+        results = measure_expressions(arguments.expression_size,
+                                      arguments.repeat)
+        for shape, numbers in results.items():
+            print("{:<13} {:8.1f} ms {:10.0f} tokens/s".format(
+                shape, numbers["seconds"] * 1000,
+                numbers["tokens_per_second"]))
+        sys.exit(0)
+    if arguments.startup:
+        results = measure_startup(arguments.repeat)
+        print("imports {:.1f} ms, run {:.1f} ms, interpreter alone {:.1f} "
+              "ms, {} modules imported".format(
+                  results["import_ms"], results["seconds"] * 1000,
+                  results["interpreter_seconds"] * 1000,
+                  len(results["modules"])))
+        problems = check_startup(results, arguments.startup_budget)
+        for problem in problems:
+            print("regression: " + problem, file=sys.stderr)
+        sys.exit(1 if problems else 0)
+    results = run_benchmark(
+        arguments.files, arguments.seed,
+        JackCorpus.settings_from_arguments(arguments), arguments.repeat,
+        arguments.scales, arguments.max_exponent)
+    print("\n".join(summary(results)))
+    if arguments.output is not None:
+        with open(arguments.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2, sort_keys=True)
+            output_file.write("\n")
+    failed = bool(results.get("scaling", {}).get("superlinear"))
+    if arguments.baseline is not None:
+        with open(arguments.baseline, 'r') as baseline_file:
+            lines, regressions = compare(results, json.load(baseline_file),
+                                         arguments.tolerance)
+        print("\n".join(lines))
+        for regression in regressions:
+            print("regression: " + regression, file=sys.stderr)
+        failed = failed or bool(regressions)
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,361 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+
+Generates synthetic, valid Jack programs to benchmark with, which declare
+every variable they use, so that they compile to VM code as well. The same
+seed and settings always generate the same programs.
+"""
+import argparse
+import os
+import random
+import typing
+
+DEFAULT_SUBROUTINES = 8
+DEFAULT_STATEMENTS = 6
+DEFAULT_EXPRESSION_DEPTH = 3
+DEFAULT_COMMENT_DENSITY = 0.1
+DEFAULT_STRING_DENSITY = 0.1
+# The shapes of the expressions generate_expression_class() writes, each the
+# way an expression grows deep or wide, by how many of its parts it has.
+EXPRESSION_SHAPES = ("deep_parens", "unary_chain", "nested_calls",
+                     "nested_index", "wide_ops", "wide_args")
+DEFAULT_EXPRESSION_SIZE = 20000
+
+_NAMES = ('a', 'b', 'i', 'x', 'y', 'count', 'total', 'size', 'next_1',
+          'Screen', 'Memory', 'Output', 'buffer')
+_CLASS_NAMES = ('Array', 'String', 'Math', 'Output', 'Memory', 'Screen')
+_TYPES = ('int', 'char', 'boolean', 'Array', 'String', 'Point')
+_OPS = ('+', '-', '*', '/', '&', '|', '<', '>', '=')
+_KEYWORD_CONSTANTS = ('true', 'false', 'null', 'this')
+_STRINGS = ('', 'hello', 'hello world', 'x = 1;', 'a < b & c > d',
+            '// not a comment', '/* not a comment */', 'The score is: ')
+_COMMENTS = ('// {}\n', '/* {} */\n', '/** {}\n * @return nothing\n */\n')
+_COMMENT_TEXT = ('TODO', 'sum the values', 'let x = y; is not code here',
+                 'edge case: a < b', 'see also Math.multiply')
+_INDENT = "    "
+
+
+class _Generator:
+    """Generates the classes of a corpus out of a single random stream."""
+
+    def __init__(self, seed: typing.Union[int, str], subroutines: int,
+                 statements: int, expression_depth: int,
+                 comment_density: float, string_density: float) -> None:
+        self.random = random.Random(seed)
+        self.subroutines = subroutines
+        self.statements = statements
+        self.expression_depth = expression_depth
+        self.comment_density = comment_density
+        self.string_density = string_density
+
+    def _comment(self, indent: str) -> str:
+        if self.random.random() >= self.comment_density:
+            return ""
+        comment = self.random.choice(_COMMENTS).format(
+            self.random.choice(_COMMENT_TEXT))
+        return "".join(indent + line + "\n"
+                       for line in comment.splitlines())
+
+    def _leaf(self) -> str:
+        """A term that holds no expression."""
+        choice = self.random
+        if choice.random() < self.string_density:
+            return '"' + choice.choice(_STRINGS) + '"'
+        roll = choice.random()
+        if roll < 0.3:
+            return str(choice.randint(0, 32767))
+        if roll < 0.45:
+            return choice.choice(_KEYWORD_CONSTANTS)
+        return choice.choice(_NAMES)
+
+    def _call(self, arguments: str) -> typing.Tuple[str, str]:
+        """The text before and after the arguments of a subroutine call."""
+        choice = self.random
+        name = "f{}".format(choice.randrange(self.subroutines))
+        if choice.random() < 0.5:
+            name = choice.choice(_CLASS_NAMES + _NAMES) + "." + name
+        return name + "(" + arguments, ")"
+
+    def expression(self, depth: typing.Optional[int] = None) -> str:
+        """
+        Args:
+            depth (typing.Optional[int]): how deep terms nest in the
+                expression, expression_depth if not given.
+
+        Returns:
+            str: an expression whose terms nest exactly this deep.
+        """
+        if depth is None:
+            depth = self.expression_depth
+        choice = self.random
+        # One term on every level wraps the next level, its siblings are
+        # leaves, so the text grows linearly with the depth and is built
+        # without recursion.
+        prefixes = []
+        suffixes = []
+        for _ in range(depth):
+            before = "".join(self._leaf() + " " + choice.choice(_OPS) + " "
+                             for _ in range(choice.randint(0, 1)))
+            after = "".join(" " + choice.choice(_OPS) + " " + self._leaf()
+                            for _ in range(choice.randint(0, 1)))
+            roll = choice.randrange(5)
+            if roll == 0:
+                opening, closing = "(", ")"
+            elif roll == 1:
+                opening, closing = choice.choice(_NAMES) + "[", "]"
+            elif roll == 2:
+                opening, closing = choice.choice("-~") + "(", ")"
+            else:
+                arguments = "".join(
+                    self._leaf() + ", " for _ in range(choice.randint(0, 2)))
+                opening, closing = self._call(arguments)
+            prefixes.append(before + opening)
+            suffixes.append(closing + after)
+        terms = [self._leaf() for _ in range(choice.randint(1, 3))]
+        innermost = terms[0] + "".join(
+            " " + choice.choice(_OPS) + " " + term for term in terms[1:])
+        return "".join(prefixes) + innermost + "".join(reversed(suffixes))
+
+    def _statements(self, count: int, indent: str, nesting: int) -> str:
+        choice = self.random
+        lines = []
+        for _ in range(count):
+            lines.append(self._comment(indent))
+            roll = choice.randrange(6 if nesting else 4)
+            if roll == 0:
+                index = ""
+                if choice.random() < 0.3:
+                    index = "[" + self.expression() + "]"
+                lines.append("{}let {}{} = {};\n".format(
+                    indent, choice.choice(_NAMES), index, self.expression()))
+            elif roll == 1:
+                arguments = ", ".join(
+                    self.expression() for _ in range(choice.randint(0, 2)))
+                opening, closing = self._call(arguments)
+                lines.append(indent + "do " + opening + closing + ";\n")
+            elif roll == 2:
+                value = " " + self.expression() if choice.random() < 0.7 \
+                    else ""
+                lines.append(indent + "return" + value + ";\n")
+            elif roll == 3:
+                lines.append("{}let {} = {};\n".format(
+                    indent, choice.choice(_NAMES), self.expression()))
+            else:
+                keyword = "if" if roll == 4 else "while"
+                body = self._statements(
+                    choice.randint(0, 3), indent + _INDENT, nesting - 1)
+                lines.append("{}{} ({}) {{\n{}{}}}".format(
+                    indent, keyword, self.expression(), body, indent))
+                if keyword == "if" and choice.random() < 0.5:
+                    body = self._statements(
+                        choice.randint(0, 3), indent + _INDENT, nesting - 1)
+                    lines.append(" else {{\n{}{}}}".format(body, indent))
+                lines.append("\n")
+        return "".join(lines)
+
+    def jack_class(self, name: str) -> str:
+        """
+        Args:
+            name (str): the name of the class.
+
+        Returns:
+            str: the source of a class with this name.
+        """
+        choice = self.random
+        parts = [self._comment(""), "class ", name, " {\n"]
+        # Every name is a class variable, so that every statement can use
+        # any of them.
+        names = choice.sample(_NAMES, len(_NAMES))
+        while names:
+            parts.append(self._comment(_INDENT))
+            count = choice.randint(1, min(len(names), 5))
+            parts.append("{}{} {} {};\n".format(
+                _INDENT, choice.choice(("static", "field")),
+                choice.choice(_TYPES), ", ".join(names[:count])))
+            del names[:count]
+        body_indent = _INDENT * 2
+        for index in range(self.subroutines):
+            parts.append(self._comment(_INDENT))
+            # Parameters and local variables hide class variables, and are
+            # all named differently.
+            names = choice.sample(_NAMES, len(_NAMES))
+            count = choice.randint(0, 3)
+            parameters = ", ".join(
+                choice.choice(_TYPES) + " " + parameter
+                for parameter in names[:count])
+            del names[:count]
+            parts.append("{}{} {} f{}({}) {{\n".format(
+                _INDENT, choice.choice(("constructor", "function", "method")),
+                choice.choice(_TYPES + ("void",)), index, parameters))
+            for _ in range(choice.randint(0, 2)):
+                count = choice.randint(1, 3)
+                parts.append("{}var {} {};\n".format(
+                    body_indent, choice.choice(_TYPES),
+                    ", ".join(names[:count])))
+                del names[:count]
+            parts.append(self._statements(self.statements, body_indent, 2))
+            parts.append(_INDENT + "}\n")
+        parts.append("}\n")
+        return "".join(parts)
+
+
+def generate_class(
+        name: str, seed: typing.Union[int, str] = 0,
+        subroutines: int = DEFAULT_SUBROUTINES,
+        statements: int = DEFAULT_STATEMENTS,
+        expression_depth: int = DEFAULT_EXPRESSION_DEPTH,
+        comment_density: float = DEFAULT_COMMENT_DENSITY,
+        string_density: float = DEFAULT_STRING_DENSITY) -> str:
+    """Generates the source of a single Jack class.
+
+    Args:
+        name (str): the name of the class.
+        seed (typing.Union[int, str]): seeds the generator.
+        subroutines (int): the number of subroutines in the class.
+        statements (int): the number of top level statements in every
+            subroutine. Statements nest up to two levels deep below them.
+        expression_depth (int): how deep terms nest in every expression.
+        comment_density (float): the probability of a comment before every
+            class member and statement.
+        string_density (float): the probability of every term that holds no
+            expression being a string constant.
+
+    Returns:
+        str: the source of the class.
+    """
+    return _Generator(seed, subroutines, statements, expression_depth,
+                      comment_density, string_density).jack_class(name)
+
+
+def generate_expression(shape: str,
+                        size: int = DEFAULT_EXPRESSION_SIZE) -> str:
+    """Generates a single expression of one of EXPRESSION_SHAPES: size
+    parentheses, unary operators, calls or array indices nested in each
+    other, or size terms between binary operators, or size arguments of a
+    single call.
+
+    Args:
+        shape (str): the shape of the expression.
+        size (int): the number of its parts.
+
+    Returns:
+        str: the source of the expression.
+
+    Raises:
+        ValueError: if the shape is not one of EXPRESSION_SHAPES.
+    """
+    if shape == "deep_parens":
+        return "(" * size + "x" + ")" * size
+    if shape == "unary_chain":
+        return "-~" * (size // 2) + "-" * (size % 2) + "x"
+    if shape == "nested_calls":
+        return "Math.abs(" * size + "x" + ")" * size
+    if shape == "nested_index":
+        return "a[" * size + "x" + "]" * size
+    if shape == "wide_ops":
+        return " + ".join(["x"] * size)
+    if shape == "wide_args":
+        return "Math.max(" + ", ".join(["x"] * size) + ")"
+    raise ValueError("Unknown expression shape: {}".format(shape))
+
+
+def generate_expression_class(shape: str,
+                              size: int = DEFAULT_EXPRESSION_SIZE) -> str:
+    """Generates the source of a Jack class whose only subroutine returns an
+    expression generate_expression() generates, which it declares every
+    variable of.
+
+    Args:
+        shape (str): as in generate_expression().
+        size (int): as in generate_expression().
+
+    Returns:
+        str: the source of the class.
+    """
+    return ("class Main {{\n{0}function int main() {{\n{0}{0}var int x;\n"
+            "{0}{0}var Array a;\n{0}{0}return {1};\n{0}}}\n}}\n").format(
+                _INDENT, generate_expression(shape, size))
+
+
+def generate_corpus(directory: str, files: int = 10,
+                    seed: typing.Union[int, str] = 0,
+                    **settings) -> typing.List[str]:
+    """Writes a corpus of Jack classes, one per file, into a directory.
+
+    Args:
+        directory (str): the directory, created if missing.
+        files (int): the number of files.
+        seed (typing.Union[int, str]): seeds the generator. Every file is
+            generated from its own seed derived from it, so that a file does
+            not change with the number of files.
+        **settings: the settings of generate_class().
+
+    Returns:
+        typing.List[str]: paths of the files written.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for index in range(files):
+        name = "Class{}".format(index)
+        path = os.path.join(directory, name + ".jack")
+        with open(path, 'w') as output_file:
+            output_file.write(generate_class(
+                name, "{}:{}".format(seed, index), **settings))
+        paths.append(path)
+    return paths
+
+
+def add_settings_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds an option to parser for every setting of generate_class()."""
+    parser.add_argument(
+        "--seed", default="0", help="seeds the generator (default: 0)")
+    parser.add_argument(
+        "--subroutines", type=int, default=DEFAULT_SUBROUTINES, metavar="N",
+        help="subroutines per class (default: %(default)s)")
+    parser.add_argument(
+        "--statements", type=int, default=DEFAULT_STATEMENTS, metavar="N",
+        help="top level statements per subroutine (default: %(default)s)")
+    parser.add_argument(
+        "--expression-depth", type=int, default=DEFAULT_EXPRESSION_DEPTH,
+        metavar="N", help="nesting depth of every expression "
+                          "(default: %(default)s)")
+    parser.add_argument(
+        "--comment-density", type=float, default=DEFAULT_COMMENT_DENSITY,
+        metavar="P", help="probability of a comment before every member and "
+                          "statement (default: %(default)s)")
+    parser.add_argument(
+        "--string-density", type=float, default=DEFAULT_STRING_DENSITY,
+        metavar="P", help="probability of a simple term being a string "
+                          "constant (default: %(default)s)")
+
+
+def settings_from_arguments(arguments: argparse.Namespace) -> \
+        typing.Dict[str, typing.Union[int, float]]:
+    """
+    Returns:
+        typing.Dict[str, typing.Union[int, float]]: the settings of
+        generate_class() given by the options add_settings_arguments() added.
+    """
+    return {"subroutines": arguments.subroutines,
+            "statements": arguments.statements,
+            "expression_depth": arguments.expression_depth,
+            "comment_density": arguments.comment_density,
+            "string_density": arguments.string_density}
+
+
+if "__main__" == __name__:
+    parser = argparse.ArgumentParser(
+        prog="JackCorpus",
+        description="Writes a reproducible corpus of synthetic Jack classes.")
+    parser.add_argument("directory", help="where to write the .jack files")
+    parser.add_argument(
+        "--files", type=int, default=10, metavar="N",
+        help="number of files (default: %(default)s)")
+    add_settings_arguments(parser)
+    arguments = parser.parse_args()
+    generate_corpus(arguments.directory, arguments.files, arguments.seed,
+                    **settings_from_arguments(arguments))
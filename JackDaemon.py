@@ -0,0 +1,494 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+
+A compile daemon: a long-running JackAnalyzer process that keeps its modules
+imported, and its parse tree cache open, and takes compile requests over a
+Unix domain socket, together with a client that compiles in process when no
+daemon is running.
+
+Every message, both ways, is a frame: a 4 byte big-endian length followed by
+that many bytes of a UTF-8 JSON object. A connection may carry any number of
+requests, each answered in turn, and connections are served concurrently.
+Requests are:
+
+    {"op": "ping"}
+    {"op": "compile", "paths": [...], "formats": [...], "incremental": bool,
+     "optimize": bool}
+    {"op": "compile", "source": "...", "formats": [...], "optimize": bool,
+     "document": "..."}
+    {"op": "shutdown"}
+
+Every response holds "ok". When it is false, "error" holds the reason. A
+compile of paths writes the outputs beside the inputs, as JackAnalyzer does,
+and responds with "failures", a list of [path, error] pairs, where error is
+formatted as JackAnalyzer reports it, with syntax errors one per line at
+their line and column. A compile of
+source writes no file and responds with "outputs", the output in every
+format, by format, as text, or as {"base64": ...} for binary formats. A
+compile of source may name the document it is a version of, such as the path
+an editor has open, in which case the daemon diffs it against the last
+version of that document it compiled, and reparses only what changed.
+"""
+import argparse
+import base64
+import collections
+import json
+import os
+import signal
+import socket
+import socketserver
+import stat
+import struct
+import sys
+import threading
+import typing
+
+PROTOCOL_VERSION = 1
+DEFAULT_SOCKET_PATH = os.path.join(
+    os.environ.get("XDG_RUNTIME_DIR") or "/tmp",
+    "jackanalyzer-{}.sock".format(os.getuid()))
+MAX_FRAME_BYTES = 256 * 1024 * 1024
+# The documents the daemon keeps the last version of, for compiles of source
+# that name one, beyond which the least recently compiled is dropped.
+MAX_DOCUMENTS = 64
+_HEADER = struct.Struct(">I")
+
+
+def _receive_exactly(connection: socket.socket,
+                     size: int) -> typing.Optional[bytes]:
+    """Receives size bytes, or returns None if the peer closed the connection
+    before sending any of them.
+    """
+    chunks = []
+    remaining = size
+    while remaining:
+        chunk = connection.recv(min(remaining, 1024 * 1024))
+        if not chunk:
+            if remaining == size:
+                return None
+            raise ValueError("Connection closed in the middle of a frame.")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def receive_message(connection: socket.socket) -> typing.Optional[dict]:
+    """
+    Args:
+        connection (socket.socket): a connected socket.
+
+    Returns:
+        typing.Optional[dict]: the next message sent on it, or None if the
+        peer closed the connection.
+    """
+    header = _receive_exactly(connection, _HEADER.size)
+    if header is None:
+        return None
+    size, = _HEADER.unpack(header)
+    if size > MAX_FRAME_BYTES:
+        raise ValueError("Frame of {} bytes is too large.".format(size))
+    payload = _receive_exactly(connection, size) if size else b""
+    if payload is None:
+        raise ValueError("Connection closed in the middle of a frame.")
+    message = json.loads(payload.decode())
+    if not isinstance(message, dict):
+        raise ValueError("Message is not a JSON object.")
+    return message
+
+
+def send_message(connection: socket.socket, message: dict) -> None:
+    """
+    Args:
+        connection (socket.socket): a connected socket.
+        message (dict): the message to send on it, which must be JSON
+            serializable.
+    """
+    payload = json.dumps(message, separators=(',', ':')).encode()
+    if len(payload) > MAX_FRAME_BYTES:
+        raise ValueError("Frame of {} bytes is too large.".format(
+            len(payload)))
+    connection.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def _encode_outputs(outputs: typing.Dict[str, typing.Union[str, bytes]]) -> \
+        typing.Dict[str, typing.Union[str, typing.Dict[str, str]]]:
+    return {output_format: {"base64": base64.b64encode(output).decode()}
+            if isinstance(output, bytes) else output
+            for output_format, output in outputs.items()}
+
+
+def _decode_outputs(outputs: typing.Dict[
+        str, typing.Union[str, typing.Dict[str, str]]]) -> \
+        typing.Dict[str, typing.Union[str, bytes]]:
+    return {output_format: base64.b64decode(output["base64"])
+            if isinstance(output, dict) else output
+            for output_format, output in outputs.items()}
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    """Answers every request on a connection until the client closes it."""
+
+    def handle(self) -> None:
+        while True:
+            try:
+                message = receive_message(self.request)
+            except (OSError, ValueError):
+                return
+            if message is None:
+                return
+            try:
+                response = self.server.respond(message)
+            except Exception as error:
+                response = {"ok": False, "error": str(error)}
+            try:
+                send_message(self.request, response)
+            except OSError:
+                return
+            if message.get("op") == "shutdown":
+                # shutdown() waits for serve_forever() to return, so it cannot
+                # be called from the thread of a request.
+                threading.Thread(target=self.server.shutdown).start()
+                return
+
+
+class CompileServer(socketserver.ThreadingUnixStreamServer):
+    """Serves compile requests on a Unix domain socket, a thread per
+    connection.
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET_PATH,
+                 cache=None) -> None:
+        """
+        Args:
+            socket_path (str): path of the socket to listen on. A stale socket
+                of this user, left there by a daemon that is no longer
+                running, is replaced, anything else there is an error.
+            cache (typing.Optional[ParseTreeCache]): parse tree cache shared
+                by all requests.
+        """
+        # Importing here keeps the client, which may never compile anything,
+        # as quick to start as possible.
+        import JackAnalyzer
+        self.analyzer = JackAnalyzer
+        self.cache = cache
+        # An IncrementalParser, and the lock of whoever uses it, by document,
+        # least recently compiled first.
+        self._documents = collections.OrderedDict()
+        self._documents_lock = threading.Lock()
+        try:
+            status = os.lstat(socket_path)
+        except FileNotFoundError:
+            status = None
+        if status is not None:
+            # Only a socket of this user is replaced, as the path may be
+            # mistyped, or, in a shared directory such as /tmp, another's.
+            if not stat.S_ISSOCK(status.st_mode) or \
+                    status.st_uid != os.getuid():
+                raise ValueError("{} is not a socket of this user, not "
+                                 "replacing it.".format(socket_path))
+            if _is_running(socket_path):
+                raise ValueError("A daemon is already listening on {}.".format(
+                    socket_path))
+            os.unlink(socket_path)
+        super().__init__(socket_path, _RequestHandler)
+
+    def server_bind(self) -> None:
+        # The socket is created with the permissions the umask leaves it, so
+        # only its owner can ever connect, rather than anyone until it is
+        # chmod-ed. Nothing else runs yet to be affected by the umask.
+        umask = os.umask(0o077)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(umask)
+
+    def respond(self, message: dict) -> dict:
+        """
+        Args:
+            message (dict): a request.
+
+        Returns:
+            dict: the response to it.
+        """
+        op = message.get("op")
+        if op == "ping" or op == "shutdown":
+            return {"ok": True, "version": PROTOCOL_VERSION,
+                    "analyzer_version": self.analyzer.ANALYZER_VERSION}
+        if op != "compile":
+            raise ValueError("Unknown op: {!r}.".format(op))
+        formats = message.get("formats") or self.analyzer.DEFAULT_FORMATS
+        unknown_formats = [output_format for output_format in formats
+                           if output_format not in self.analyzer.SERIALIZERS]
+        if unknown_formats:
+            raise ValueError("Unknown formats: {}.".format(
+                ", ".join(map(str, unknown_formats))))
+        if "source" in message:
+            document = message.get("document")
+            if document is None:
+                outputs = self.analyzer.analyze_source(
+                    message["source"], self.cache, formats,
+                    bool(message.get("optimize")))
+            else:
+                lock, parser = self._document(str(document))
+                with lock:
+                    outputs = self.analyzer.analyze_source(
+                        message["source"], formats=formats,
+                        optimize=bool(message.get("optimize")),
+                        parser=parser)
+            return {"ok": True, "outputs": _encode_outputs(outputs)}
+        paths = message.get("paths", [])
+        if not isinstance(paths, list) or \
+                not all(isinstance(path, str) for path in paths):
+            raise ValueError("Paths must be a list of strings.")
+        for path in paths:
+            if not os.path.isabs(path):
+                raise ValueError("Path is not absolute: {}.".format(path))
+        input_paths = list(self.analyzer.iter_input_files(paths))
+        failures = self.analyzer.analyze_paths(
+            input_paths, incremental=bool(message.get("incremental")),
+            cache=self.cache, formats=formats,
+            optimize=bool(message.get("optimize")))
+        return {"ok": True, "failures": [
+            [input_path, self.analyzer.format_failure(input_path, error)]
+            for input_path, error in failures]}
+
+    def _document(self, document: str) -> tuple:
+        """
+        Args:
+            document (str): the name of a document.
+
+        Returns:
+            tuple: the lock and IncrementalParser of the document, new ones if
+            it is not one of the last MAX_DOCUMENTS compiled.
+        """
+        from IncrementalParser import IncrementalParser
+        with self._documents_lock:
+            if document in self._documents:
+                self._documents.move_to_end(document)
+            else:
+                self._documents[document] = (
+                    threading.Lock(),
+                    IncrementalParser(document))
+                if len(self._documents) > MAX_DOCUMENTS:
+                    self._documents.popitem(last=False)
+            return self._documents[document]
+
+    def server_close(self) -> None:
+        super().server_close()
+        try:
+            os.unlink(self.server_address)
+        except FileNotFoundError:
+            pass
+
+
+def _is_running(socket_path: str) -> bool:
+    """
+    Returns:
+        bool: whether a daemon is accepting connections on socket_path.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        try:
+            connection.connect(socket_path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            return False
+    return True
+
+
+def serve(socket_path: str = DEFAULT_SOCKET_PATH, cache=None) -> None:
+    """Serves compile requests until a shutdown request, SIGTERM or SIGINT.
+
+    Args:
+        socket_path (str): path of the socket to listen on.
+        cache (typing.Optional[ParseTreeCache]): parse tree cache shared by
+            all requests.
+    """
+    with CompileServer(socket_path, cache) as server:
+        def stop(signal_number, frame):
+            threading.Thread(target=server.shutdown).start()
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        server.serve_forever()
+
+
+def request(message: dict,
+            socket_path: str = DEFAULT_SOCKET_PATH) -> dict:
+    """Sends a single request to the daemon.
+
+    Args:
+        message (dict): the request.
+        socket_path (str): path of the socket the daemon listens on.
+
+    Returns:
+        dict: the response of the daemon.
+
+    Raises:
+        ConnectionError, FileNotFoundError: if no daemon listens on
+            socket_path.
+        ValueError: if the daemon did not respond, or responded with an
+            error.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socket_path)
+        send_message(connection, message)
+        response = receive_message(connection)
+    if response is None:
+        raise ValueError("The daemon closed the connection.")
+    if not response.get("ok"):
+        raise ValueError(response.get("error", "Request failed."))
+    return response
+
+
+def compile_paths(input_paths: typing.Sequence[str],
+                  formats: typing.Optional[typing.Sequence[str]] = None,
+                  incremental: bool = False,
+                  socket_path: str = DEFAULT_SOCKET_PATH,
+                  optimize: bool = False) -> \
+        typing.List[typing.Tuple[str, str]]:
+    """Compiles .jack files, or directories of them, into output files beside
+    them, on the daemon if one is running and in this process otherwise.
+
+    Args:
+        input_paths (typing.Sequence[str]): the files and directories.
+        formats (typing.Optional[typing.Sequence[str]]): formats of the output
+            files, from JackSerializers.SERIALIZERS, xml if not given.
+        incremental (bool): skip files whose outputs are up to date, as in
+            JackAnalyzer.analyze_paths().
+        socket_path (str): path of the socket the daemon listens on.
+        optimize (bool): run VM code through the peephole optimizer.
+
+    Returns:
+        typing.List[typing.Tuple[str, str]]: the path and error message of
+        every file that failed, as JackAnalyzer.format_failure() formats
+        it.
+    """
+    paths = [os.path.abspath(path) for path in input_paths]
+    try:
+        response = request({"op": "compile", "paths": paths,
+                            "formats": list(formats or ()),
+                            "incremental": incremental,
+                            "optimize": optimize}, socket_path)
+    except (ConnectionError, FileNotFoundError):
+        import JackAnalyzer
+        failures = JackAnalyzer.analyze_paths(
+            list(JackAnalyzer.iter_input_files(paths)),
+            incremental=incremental,
+            formats=formats or JackAnalyzer.DEFAULT_FORMATS,
+            optimize=optimize)
+        return [(path, JackAnalyzer.format_failure(path, error))
+                for path, error in failures]
+    return [(path, error) for path, error in response["failures"]]
+
+
+def compile_source(source: str,
+                   formats: typing.Optional[typing.Sequence[str]] = None,
+                   socket_path: str = DEFAULT_SOCKET_PATH,
+                   optimize: bool = False,
+                   document: typing.Optional[str] = None) -> \
+        typing.Dict[str, typing.Union[str, bytes]]:
+    """Compiles the source of a single class, on the daemon if one is running
+    and in this process otherwise.
+
+    Args:
+        source (str): the source of the class.
+        formats (typing.Optional[typing.Sequence[str]]): formats of the
+            outputs, from JackSerializers.SERIALIZERS, xml if not given.
+        socket_path (str): path of the socket the daemon listens on.
+        optimize (bool): run VM code through the peephole optimizer.
+        document (typing.Optional[str]): the document the source is a version
+            of, for the daemon to reparse only what changed since the last
+            version it compiled. A compile in this process ignores it.
+
+    Returns:
+        typing.Dict[str, typing.Union[str, bytes]]: the output in every
+        format, as in JackAnalyzer.analyze_source().
+
+    Raises:
+        ValueError: if the source does not compile.
+    """
+    message = {"op": "compile", "source": source,
+               "formats": list(formats or ()), "optimize": optimize}
+    if document is not None:
+        message["document"] = document
+    try:
+        response = request(message, socket_path)
+    except (ConnectionError, FileNotFoundError):
+        import JackAnalyzer
+        return JackAnalyzer.analyze_source(
+            source, formats=formats or JackAnalyzer.DEFAULT_FORMATS,
+            optimize=optimize)
+    return _decode_outputs(response["outputs"])
+
+
+if "__main__" == __name__:
+    parser = argparse.ArgumentParser(
+        prog="JackDaemon",
+        description="Keeps a JackAnalyzer process running to compile files "
+                    "sent to it, or sends files to it.")
+    parser.add_argument(
+        "--socket", default=DEFAULT_SOCKET_PATH, metavar="PATH",
+        help="the socket of the daemon (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser(
+        "serve", help="run the daemon until it is stopped")
+    serve_parser.add_argument(
+        "--cache-dir", metavar="DIR",
+        help="reuse and store parse trees in this cache directory")
+    serve_parser.add_argument(
+        "--cache-size", type=int, metavar="BYTES",
+        help="evict least recently used parse trees beyond this size")
+    commands.add_parser("stop", help="stop the running daemon")
+    commands.add_parser("ping", help="check whether a daemon is running")
+    compile_parser = commands.add_parser(
+        "compile", help="compile .jack files or directories, on the daemon "
+                        "if one is running and in this process otherwise")
+    compile_parser.add_argument("input_paths", nargs="+", metavar="input_path")
+    compile_parser.add_argument(
+        "-f", "--format", action="append", dest="formats", metavar="FORMAT",
+        help="write outputs in this format; may be given several times "
+             "(default: xml)")
+    compile_parser.add_argument(
+        "-i", "--incremental", action="store_true",
+        help="only compile files whose outputs are missing or stale")
+    compile_parser.add_argument(
+        "-O", "--optimize", action="store_true",
+        help="run VM code through the peephole optimizer")
+    arguments = parser.parse_args()
+    if arguments.command == "serve" and arguments.cache_size is not None \
+            and arguments.cache_size < 0:
+        parser.error("--cache-size cannot be negative")
+    try:
+        if arguments.command == "serve":
+            cache = None
+            if arguments.cache_dir is not None:
+                from JackAnalyzer import ANALYZER_VERSION
+                from ParseTreeCache import DEFAULT_MAX_BYTES, ParseTreeCache
+                cache = ParseTreeCache(
+                    arguments.cache_dir, ANALYZER_VERSION,
+                    DEFAULT_MAX_BYTES if arguments.cache_size is None
+                    else arguments.cache_size)
+            serve(arguments.socket, cache)
+        elif arguments.command == "stop":
+            request({"op": "shutdown"}, arguments.socket)
+        elif arguments.command == "ping":
+            print(request({"op": "ping"}, arguments.socket))
+        else:
+            failures = compile_paths(
+                arguments.input_paths,
+                list(dict.fromkeys(arguments.formats or ())),
+                arguments.incremental, arguments.socket, arguments.optimize)
+            for _, error in failures:
+                print(error, file=sys.stderr)
+            if failures:
+                sys.exit(1)
+    except (ConnectionError, FileNotFoundError):
+        print("No daemon is listening on {}.".format(arguments.socket),
+              file=sys.stderr)
+        sys.exit(1)
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,81 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+
+# Errors reported for a single file at most, past which it is not worth
+# going on, as the input is probably not Jack at all.
+MAX_ERRORS = 100
+
+
+class JackSyntaxError(ValueError):
+    """A syntax error, at a line and column of a source file, or all the
+    syntax errors found in a file.
+
+    The tokenizer and the compilation engine recover from most syntax errors
+    and go on, so that a single pass finds all the errors in a file. They
+    raise the first error once done, with every error found, itself
+    included, in errors, and str() of it lists them all, one per line.
+    """
+
+    def __init__(self, message: str, line: typing.Optional[int] = None,
+                 column: typing.Optional[int] = None,
+                 path: typing.Optional[str] = None) -> None:
+        """
+        Args:
+            message (str): what is wrong.
+            line (typing.Optional[int]): the line of the error, from 1.
+            column (typing.Optional[int]): the column of the error, from 1.
+            path (typing.Optional[str]): the path of the source file, if it
+                came from one.
+        """
+        super().__init__(message)
+        self.message = message
+        self.line = line
+        self.column = column
+        self.path = path
+        self.errors = [self]
+
+    @classmethod
+    def collect(cls, errors: typing.List["JackSyntaxError"]) -> \
+            "JackSyntaxError":
+        """
+        Args:
+            errors (typing.List[JackSyntaxError]): syntax errors of a file,
+                at least one.
+
+        Returns:
+            JackSyntaxError: the first of the errors by position, holding
+            them all in order.
+        """
+        errors = sorted(errors, key=lambda error: (
+            error.line or 0, error.column or 0))
+        first = errors[0]
+        first.errors = errors
+        return first
+
+    def diagnostic(self) -> str:
+        """
+        Returns:
+            str: this error alone, as "path:line:column: message", leaving
+            out whatever is unknown of the path and position.
+        """
+        location = [str(part) for part in (self.path, self.line, self.column)
+                    if part is not None]
+        return ":".join(location + [" " + self.message]) if location \
+            else self.message
+
+    def __str__(self) -> str:
+        return "\n".join(error.diagnostic() for error in self.errors)
+
+
+class JackCallError(JackSyntaxError):
+    """A call to a class or subroutine a program does not have, or that does
+    not take the object or arguments it is called with, or all such calls of
+    a class. Syntax trees keep no positions, so it has neither a line nor a
+    column, and names the subroutine that makes the call instead.
+    """
@@ -0,0 +1,569 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+
+Serializers that write the syntax trees CompilationEngine builds, out of the
+nodes in JackAST, in several formats. Each one is created with an output
+stream and writes trees to it as Serializer describes. None of them
+recurses, so trees of any depth can be written.
+"""
+import abc
+import functools
+import marshal
+import typing
+import JackAST
+from JackAST import (
+    Node, Class, ClassVarDec, SubroutineDec, VarDec, LetStatement,
+    IfStatement, WhileStatement, DoStatement, ReturnStatement, Expression,
+    IntegerConstant, StringConstant, KeywordConstant, Variable, ArrayAccess,
+    SubroutineCall, ParenthesizedExpression, UnaryOp)
+from JackTokenizer import _KEYWORD_LIST
+from XMLEmitter import (
+    KEYWORD_LINES, SYMBOL_LINES, XMLEmitter, identifier_line,
+    integer_constant_line, string_constant_line)
+if typing.TYPE_CHECKING:
+    from VMOptimizer import PeepholeOptimizer
+
+_KEYWORD_LINES = dict(zip(_KEYWORD_LIST, KEYWORD_LINES))
+_TYPE_LINES = {keyword: _KEYWORD_LINES[keyword]
+               for keyword in ('int', 'char', 'boolean')}
+_RETURN_TYPE_LINES = dict(_TYPE_LINES, void=_KEYWORD_LINES['void'])
+(_LEFT_CURLY, _RIGHT_CURLY, _LEFT_PAREN, _RIGHT_PAREN, _LEFT_SQUARE,
+ _RIGHT_SQUARE, _DOT, _COMMA, _SEMICOLON, _EQUALS) = (
+    SYMBOL_LINES[ord(symbol)] for symbol in '{}()[].,;=')
+
+
+def _type_line(type_name: str, keyword_lines: typing.Dict[str, str]) -> str:
+    """
+    Args:
+        type_name (str): a type.
+        keyword_lines (typing.Dict[str, str]): the lines of the keywords that
+            are built-in types where the type appears.
+
+    Returns:
+        str: the line of XML holding the type, which is a keyword if it is a
+        built-in type, and an identifier otherwise.
+    """
+    line = keyword_lines.get(type_name)
+    return line if line is not None else identifier_line(type_name)
+
+
+def _statements_items(statements: typing.List[JackAST.Statement]) -> list:
+    return ["<statements>\n", *statements, "</statements>\n"]
+
+
+def _call_items(call: SubroutineCall) -> list:
+    items = []
+    if call.receiver is not None:
+        items.append(identifier_line(call.receiver))
+        items.append(_DOT)
+    items.append(identifier_line(call.name))
+    items.append(_LEFT_PAREN)
+    items.append("<expressionList>\n")
+    for index, argument in enumerate(call.arguments):
+        if index:
+            items.append(_COMMA)
+        items.append(argument)
+    items.append("</expressionList>\n")
+    items.append(_RIGHT_PAREN)
+    return items
+
+
+def _names_items(names: typing.List[str]) -> list:
+    items = [identifier_line(names[0])]
+    for name in names[1:]:
+        items.append(_COMMA)
+        items.append(identifier_line(name))
+    return items
+
+
+def _class_items(node: Class) -> list:
+    return ["<class>\n", _KEYWORD_LINES['class'], identifier_line(node.name),
+            _LEFT_CURLY, *node.class_var_decs, *node.subroutine_decs,
+            _RIGHT_CURLY, "</class>\n"]
+
+
+def _class_var_dec_items(node: ClassVarDec) -> list:
+    return ["<classVarDec>\n", _KEYWORD_LINES[node.kind],
+            _type_line(node.type, _TYPE_LINES), *_names_items(node.names),
+            _SEMICOLON, "</classVarDec>\n"]
+
+
+def _subroutine_dec_items(node: SubroutineDec) -> list:
+    items = ["<subroutineDec>\n", _KEYWORD_LINES[node.kind],
+             _type_line(node.return_type, _RETURN_TYPE_LINES),
+             identifier_line(node.name), _LEFT_PAREN, "<parameterList>\n"]
+    for index, parameter in enumerate(node.parameters):
+        if index:
+            items.append(_COMMA)
+        items.append(_type_line(parameter.type, _TYPE_LINES))
+        items.append(identifier_line(parameter.name))
+    items += ["</parameterList>\n", _RIGHT_PAREN, "<subroutineBody>\n",
+              _LEFT_CURLY, *node.var_decs, *_statements_items(node.statements),
+              _RIGHT_CURLY, "</subroutineBody>\n", "</subroutineDec>\n"]
+    return items
+
+
+def _var_dec_items(node: VarDec) -> list:
+    return ["<varDec>\n", _KEYWORD_LINES['var'],
+            _type_line(node.type, _TYPE_LINES), *_names_items(node.names),
+            _SEMICOLON, "</varDec>\n"]
+
+
+def _let_items(node: LetStatement) -> list:
+    items = ["<letStatement>\n", _KEYWORD_LINES['let'],
+             identifier_line(node.name)]
+    if node.index is not None:
+        items += [_LEFT_SQUARE, node.index, _RIGHT_SQUARE]
+    items += [_EQUALS, node.value, _SEMICOLON, "</letStatement>\n"]
+    return items
+
+
+def _if_items(node: IfStatement) -> list:
+    items = ["<ifStatement>\n", _KEYWORD_LINES['if'], _LEFT_PAREN,
+             node.condition, _RIGHT_PAREN, _LEFT_CURLY,
+             *_statements_items(node.statements), _RIGHT_CURLY]
+    if node.else_statements is not None:
+        items += [_KEYWORD_LINES['else'], _LEFT_CURLY,
+                  *_statements_items(node.else_statements), _RIGHT_CURLY]
+    items.append("</ifStatement>\n")
+    return items
+
+
+def _while_items(node: WhileStatement) -> list:
+    return ["<whileStatement>\n", _KEYWORD_LINES['while'], _LEFT_PAREN,
+            node.condition, _RIGHT_PAREN, _LEFT_CURLY,
+            *_statements_items(node.statements), _RIGHT_CURLY,
+            "</whileStatement>\n"]
+
+
+def _do_items(node: DoStatement) -> list:
+    return ["<doStatement>\n", _KEYWORD_LINES['do'], *_call_items(node.call),
+            _SEMICOLON, "</doStatement>\n"]
+
+
+def _return_items(node: ReturnStatement) -> list:
+    if node.value is None:
+        return ["<returnStatement>\n", _KEYWORD_LINES['return'], _SEMICOLON,
+                "</returnStatement>\n"]
+    return ["<returnStatement>\n", _KEYWORD_LINES['return'], node.value,
+            _SEMICOLON, "</returnStatement>\n"]
+
+
+def _expression_items(node: Expression) -> list:
+    terms = node.terms
+    items = ["<expression>\n", terms[0]]
+    for op, term in zip(node.ops, terms[1:]):
+        items.append(SYMBOL_LINES[ord(op)])
+        items.append(term)
+    items.append("</expression>\n")
+    return items
+
+
+def _integer_constant_items(node: IntegerConstant) -> list:
+    return ["<term>\n", integer_constant_line(node.value), "</term>\n"]
+
+
+def _string_constant_items(node: StringConstant) -> list:
+    return ["<term>\n", string_constant_line(node.value), "</term>\n"]
+
+
+def _keyword_constant_items(node: KeywordConstant) -> list:
+    return ["<term>\n", _KEYWORD_LINES[node.value], "</term>\n"]
+
+
+def _variable_items(node: Variable) -> list:
+    return ["<term>\n", identifier_line(node.name), "</term>\n"]
+
+
+def _array_access_items(node: ArrayAccess) -> list:
+    return ["<term>\n", identifier_line(node.name), _LEFT_SQUARE, node.index,
+            _RIGHT_SQUARE, "</term>\n"]
+
+
+def _subroutine_call_items(node: SubroutineCall) -> list:
+    return ["<term>\n", *_call_items(node), "</term>\n"]
+
+
+def _parenthesized_expression_items(node: ParenthesizedExpression) -> list:
+    return ["<term>\n", _LEFT_PAREN, node.expression, _RIGHT_PAREN,
+            "</term>\n"]
+
+
+def _unary_op_items(node: UnaryOp) -> list:
+    return ["<term>\n", SYMBOL_LINES[ord(node.op)], node.term, "</term>\n"]
+
+
+# How every node is laid out in XML: a list of lines and of child nodes.
+_XML_ITEMS = {
+    Class: _class_items,
+    ClassVarDec: _class_var_dec_items,
+    SubroutineDec: _subroutine_dec_items,
+    VarDec: _var_dec_items,
+    LetStatement: _let_items,
+    IfStatement: _if_items,
+    WhileStatement: _while_items,
+    DoStatement: _do_items,
+    ReturnStatement: _return_items,
+    Expression: _expression_items,
+    IntegerConstant: _integer_constant_items,
+    StringConstant: _string_constant_items,
+    KeywordConstant: _keyword_constant_items,
+    Variable: _variable_items,
+    ArrayAccess: _array_access_items,
+    SubroutineCall: _subroutine_call_items,
+    ParenthesizedExpression: _parenthesized_expression_items,
+    UnaryOp: _unary_op_items,
+}
+
+
+class Serializer(abc.ABC):
+    """Base class of all serializers.
+
+    A serializer writes either a whole tree at once, with serialize(), or a
+    class one member at a time as it is parsed: begin_class() with the name
+    of the class, then member() with every class variable declaration and
+    subroutine in order, and end_class(). The member at a time methods of
+    this class just gather the members and serialize the whole class at the
+    end, serializers that can do better override them. Those write all the
+    output before the members by the time begin_class() returns, and all the
+    output of a member by the time member() returns, so that the output of
+    every member can be told apart.
+    """
+
+    def __init__(self, output_stream: typing.IO) -> None:
+        """
+        Args:
+            output_stream (typing.IO): the stream to write to.
+        """
+        self.output_stream = output_stream
+        self._open_class = None
+
+    @abc.abstractmethod
+    def serialize(self, tree: JackAST.Node) -> None:
+        """Writes a syntax tree out. Every serializer implements it, which
+        end_class() relies on.
+
+        Args:
+            tree (JackAST.Node): the tree, usually a JackAST.Class.
+        """
+
+    def begin_class(self, name: str) -> None:
+        """Starts writing a class out a member at a time.
+
+        Args:
+            name (str): the name of the class.
+        """
+        self._open_class = Class(name, [], [])
+
+    def member(self, node: typing.Union[ClassVarDec, SubroutineDec]) -> None:
+        """Writes out the next member of the class begin_class() started.
+
+        Args:
+            node (typing.Union[ClassVarDec, SubroutineDec]): the member.
+        """
+        if node.__class__ is ClassVarDec:
+            self._open_class.class_var_decs.append(node)
+        else:
+            self._open_class.subroutine_decs.append(node)
+
+    def end_class(self) -> None:
+        """Finishes writing out the class begin_class() started."""
+        self.serialize(self._open_class)
+        self._open_class = None
+
+
+def _write_xml(emitter: XMLEmitter, items: list) -> None:
+    """Emits lines and the XML of nodes, in order.
+
+    Args:
+        emitter (XMLEmitter): the emitter to emit to.
+        items (list): lines and nodes.
+    """
+    emit = emitter.emit
+    lines = emitter.lines
+    chunk_lines = emitter.chunk_lines
+    # Items are popped in order, so the lines and children of every node are
+    # pushed in reverse.
+    stack = items[::-1]
+    pop = stack.pop
+    extend = stack.extend
+    while stack:
+        item = pop()
+        if item.__class__ is str:
+            emit(item)
+        else:
+            extend(reversed(_XML_ITEMS[item.__class__](item)))
+            if len(lines) >= chunk_lines:
+                emitter.flush()
+
+
+class XMLSerializer(Serializer):
+    """Writes a syntax tree as the XML of the nand2tetris project 10. A class
+    written a member at a time is written out as each member comes in.
+    """
+
+    def serialize(self, tree: JackAST.Node) -> None:
+        emitter = XMLEmitter(self.output_stream)
+        _write_xml(emitter, [tree])
+        emitter.flush()
+
+    def begin_class(self, name: str) -> None:
+        self._emitter = XMLEmitter(self.output_stream)
+        # The lines of a class without members, but for its closing ones.
+        _write_xml(self._emitter, _class_items(Class(name, [], []))[:-2])
+        self._emitter.flush()
+
+    def member(self, node: typing.Union[ClassVarDec, SubroutineDec]) -> None:
+        _write_xml(self._emitter, [node])
+        self._emitter.flush()
+
+    def end_class(self) -> None:
+        _write_xml(self._emitter, [_RIGHT_CURLY, "</class>\n"])
+        self._emitter.flush()
+        self._emitter = None
+
+
+@functools.lru_cache(maxsize=None)
+def _json_encoder() -> typing.Callable[[typing.Any], str]:
+    """
+    Returns:
+        typing.Callable[[typing.Any], str]: encodes a value as compact JSON.
+        json is imported on first use, as only the jsonl format needs it.
+    """
+    import json
+    return json.JSONEncoder(separators=(',', ':')).encode
+
+
+def _json_lines(tree: JackAST.Node, depth: int,
+                parent_field: typing.Optional[str]) -> typing.List[str]:
+    """
+    Args:
+        tree (JackAST.Node): a syntax tree.
+        depth (int): the depth of its root.
+        parent_field (typing.Optional[str]): the field of its parent the root
+            belongs to, if it has a parent.
+
+    Returns:
+        typing.List[str]: the JSON lines of all the nodes of the tree.
+    """
+    encode = _json_encoder()
+    lines = []
+    stack = [(tree, depth, parent_field)]
+    while stack:
+        node, depth, parent_field = stack.pop()
+        line = {"node": node.__class__.__name__, "depth": depth}
+        if parent_field is not None:
+            line["field"] = parent_field
+        children = []
+        for field in node.__slots__:
+            value = getattr(node, field)
+            if isinstance(value, Node):
+                children.append((value, depth + 1, field))
+            elif (value.__class__ is list and value
+                    and isinstance(value[0], Node)):
+                children.extend((child, depth + 1, field) for child in value)
+            else:
+                line[field] = value
+        lines.append(encode(line))
+        lines.append("\n")
+        stack.extend(reversed(children))
+    return lines
+
+
+class JSONLinesSerializer(Serializer):
+    """Writes a syntax tree as JSON lines, one object per node, in the order
+    the nodes appear in the source.
+
+    Every object has the name of the node's class under "node", its depth
+    in the tree under "depth" (0 for the root), and the name of the field of
+    its parent it belongs to under "field" (except for the root). Fields that
+    hold plain values, None or an empty list are included as is. Fields that
+    hold a node or a non-empty list of nodes are left out: their nodes are
+    the objects that follow, one level deeper, in order. When a class is
+    written a member at a time, the class object comes out before its members
+    are known and leaves out both member lists, even if they end up empty.
+    """
+
+    def serialize(self, tree: JackAST.Node) -> None:
+        self.output_stream.write(''.join(_json_lines(tree, 0, None)))
+
+    def begin_class(self, name: str) -> None:
+        self.output_stream.write(_json_encoder()(
+            {"node": "Class", "depth": 0, "name": name}) + "\n")
+
+    def member(self, node: typing.Union[ClassVarDec, SubroutineDec]) -> None:
+        field = ("class_var_decs" if node.__class__ is ClassVarDec
+                 else "subroutine_decs")
+        self.output_stream.write(''.join(_json_lines(node, 1, field)))
+
+    def end_class(self) -> None:
+        pass
+
+
+class TeeSerializer(Serializer):
+    """Writes a syntax tree with several serializers at once."""
+
+    def __init__(self, serializers: typing.List[Serializer]) -> None:
+        """
+        Args:
+            serializers (typing.List[Serializer]): the serializers to write
+                with.
+        """
+        super().__init__(None)
+        self.serializers = serializers
+
+    def serialize(self, tree: JackAST.Node) -> None:
+        for serializer in self.serializers:
+            serializer.serialize(tree)
+
+    def begin_class(self, name: str) -> None:
+        for serializer in self.serializers:
+            serializer.begin_class(name)
+
+    def member(self, node: typing.Union[ClassVarDec, SubroutineDec]) -> None:
+        for serializer in self.serializers:
+            serializer.member(node)
+
+    def end_class(self) -> None:
+        for serializer in self.serializers:
+            serializer.end_class()
+
+
+# The binary form of a tree is a program for a stack machine that rebuilds
+# it, in a marshalled (opcodes, values) pair. _PUSH pushes the next value,
+# _LIST pops as many items as the next value says and pushes them as a list,
+# and opcode _FIRST_NODE + i pops the fields of JackAST.NODE_TYPES[i] and
+# pushes the node made of them.
+_BINARY_MAGIC = b"JackAST\x01"
+_PUSH, _LIST, _FIRST_NODE = range(3)
+_NODE_OPCODES = {node_type: opcode for opcode, node_type in
+                 enumerate(JackAST.NODE_TYPES, _FIRST_NODE)}
+_FIELD_COUNTS = (None,) * _FIRST_NODE + tuple(
+    len(node_type.__slots__) for node_type in JackAST.NODE_TYPES)
+
+
+def dumps_binary(tree: JackAST.Node) -> bytes:
+    """
+    Args:
+        tree (JackAST.Node): a syntax tree.
+
+    Returns:
+        bytes: the tree in binary form, which load_binary() turns back into
+        the tree.
+    """
+    opcodes = bytearray()
+    values = []
+    # Post-order: every node and list is pushed below its items, and an
+    # (opcode, count) pair below them builds it once they have been written.
+    stack = [tree]
+    pop = stack.pop
+    push = stack.append
+    while stack:
+        item = pop()
+        item_class = item.__class__
+        if item_class is tuple:
+            opcode, count = item
+            opcodes.append(opcode)
+            if opcode == _LIST:
+                values.append(count)
+        elif item_class is list:
+            push((_LIST, len(item)))
+            stack.extend(reversed(item))
+        elif item_class in _NODE_OPCODES:
+            push((_NODE_OPCODES[item_class], 0))
+            stack.extend(getattr(item, field)
+                         for field in reversed(item_class.__slots__))
+        else:
+            opcodes.append(_PUSH)
+            values.append(item)
+    return _BINARY_MAGIC + marshal.dumps((bytes(opcodes), values))
+
+
+def load_binary(data: bytes) -> JackAST.Node:
+    """
+    Args:
+        data (bytes): a syntax tree in binary form, as made by dumps_binary().
+
+    Returns:
+        JackAST.Node: the tree.
+
+    Raises:
+        ValueError: if the data is not a tree in binary form.
+    """
+    if not data.startswith(_BINARY_MAGIC):
+        raise ValueError("Not a binary syntax tree.")
+    try:
+        opcodes, values = marshal.loads(data[len(_BINARY_MAGIC):])
+        stack = []
+        push = stack.append
+        value_index = 0
+        for opcode in opcodes:
+            if opcode == _PUSH:
+                push(values[value_index])
+                value_index += 1
+            elif opcode == _LIST:
+                count = values[value_index]
+                value_index += 1
+                if count:
+                    items = stack[-count:]
+                    del stack[-count:]
+                else:
+                    items = []
+                push(items)
+            else:
+                count = _FIELD_COUNTS[opcode]
+                fields = stack[-count:]
+                del stack[-count:]
+                push(JackAST.NODE_TYPES[opcode - _FIRST_NODE](*fields))
+        (tree,) = stack
+    except (EOFError, TypeError, IndexError, ValueError):
+        raise ValueError("Corrupt binary syntax tree.")
+    return tree
+
+
+class BinarySerializer(Serializer):
+    """Writes a syntax tree in the compact binary form of dumps_binary(), to
+    a binary stream. The binary form is written in one piece, so a class
+    written a member at a time is kept whole until end_class().
+    """
+
+    def serialize(self, tree: JackAST.Node) -> None:
+        self.output_stream.write(dumps_binary(tree))
+
+
+class VMSerializer(Serializer):
+    """Compiles a class into Hack VM code, with a VMWriter. Calls within the
+    class compile according to the kind of the subroutine called, so a class
+    written a member at a time is kept whole until end_class().
+    """
+
+    def __init__(self, output_stream: typing.IO,
+                 optimizer: typing.Optional["PeepholeOptimizer"] = None) -> \
+            None:
+        """
+        Args:
+            output_stream (typing.IO): the stream to write to.
+            optimizer (typing.Optional[PeepholeOptimizer]): if given, the code
+                goes through this optimizer, as in VMWriter.
+        """
+        super().__init__(output_stream)
+        self.optimizer = optimizer
+
+    def serialize(self, tree: JackAST.Node) -> None:
+        # Imported here, as only builds of the vm format need VMWriter.
+        from VMWriter import VMWriter
+        VMWriter(self.output_stream, self.optimizer).write_class(tree)
+
+
+# Every serializer by the name of its format, with the extension of the files
+# it writes and whether they are binary.
+SERIALIZERS = {
+    "xml": (XMLSerializer, ".xml", False),
+    "jsonl": (JSONLinesSerializer, ".jsonl", False),
+    "binary": (BinarySerializer, ".jast", True),
+    "vm": (VMSerializer, ".vm", False),
+}
@@ -0,0 +1,379 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+
+Statistics of a build: the wall and CPU time of every phase of analyzing
+every file, its tokens by kind, the size of its input and outputs, what the
+peephole optimizer did to its VM code and, optionally, its peak
+allocation. JackAnalyzer fills them in as it goes when given a BuildStats,
+and skips it all otherwise, through NO_STATS.
+"""
+import contextlib
+import os
+import time
+import typing
+from JackTokenizer import TOKEN_TYPES, TokenStream
+if typing.TYPE_CHECKING:
+    from VMOptimizer import PeepholeOptimizer
+
+_KILOBYTE = 1024
+_MEGABYTE = 1024 * 1024
+SLOWEST_FILES = 10  # Files listed by BuildStats.table().
+
+
+class FileStats:
+    """Statistics of analyzing a single file."""
+
+    def __init__(self, path: str, trace_memory: bool = False) -> None:
+        """
+        Args:
+            path (str): path of the file.
+            trace_memory (bool): trace the peak allocation while the file is
+                analyzed, which slows analysis down a lot.
+        """
+        self.path = path
+        self.trace_memory = trace_memory
+        # The [wall, cpu] seconds of every phase, by phase, in the order the
+        # phases first ran.
+        self.phases = {}
+        self.tokens = dict.fromkeys(TOKEN_TYPES, 0)
+        self.input_bytes = 0
+        self.output_bytes = 0
+        self.peak_bytes = None
+        # The VM instructions before and after the peephole optimizer, and
+        # how often every rule applied, if it ran.
+        self.vm_instructions = None
+        self.rule_hits = {}
+        self.wall = 0.0
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> typing.Iterator[None]:
+        """Adds the time spent in the with block to a phase."""
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            times = self.phases.setdefault(name, [0.0, 0.0])
+            times[0] += time.perf_counter() - wall
+            times[1] += time.process_time() - cpu
+
+    @contextlib.contextmanager
+    def analyzing(self) -> typing.Iterator[None]:
+        """Records the total time, and the peak allocation if it is traced, of
+        the with block, which should analyze the whole file.
+        """
+        tracemalloc = None
+        if self.trace_memory:
+            import tracemalloc
+            started = not tracemalloc.is_tracing()
+            if started:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        wall = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.wall += time.perf_counter() - wall
+            if tracemalloc is not None:
+                self.peak_bytes = tracemalloc.get_traced_memory()[1] - baseline
+                if started:
+                    tracemalloc.stop()
+
+    def count_tokens(self, tokens: TokenStream) -> None:
+        """Adds the tokens of a stream to the token counts."""
+        kinds = tokens.kinds
+        for kind, token_type in enumerate(TOKEN_TYPES):
+            self.tokens[token_type] += kinds.count(kind)
+
+    def add_input(self, path: str) -> None:
+        """Adds the size of an input file."""
+        self.input_bytes += os.path.getsize(path)
+
+    def add_output(self, path: str, size: typing.Optional[int] = None) -> None:
+        """Adds the size of an output file, or size, for an output that went
+        into an archive rather than to its path.
+        """
+        self.output_bytes += os.path.getsize(path) if size is None else size
+
+    def add_optimization(self, optimizer: "PeepholeOptimizer") -> None:
+        """Records what the peephole optimizer did to the VM code."""
+        self.vm_instructions = [optimizer.instructions_before,
+                                optimizer.instructions_after]
+        self.rule_hits = {name: hits for name, hits in optimizer.hits.items()
+                          if hits}
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        """
+        Returns:
+            typing.Dict[str, typing.Any]: the statistics, as JSON values.
+        """
+        return {"path": self.path, "wall": self.wall,
+                "phases": {name: {"wall": wall, "cpu": cpu}
+                           for name, (wall, cpu) in self.phases.items()},
+                "tokens": dict(self.tokens),
+                "input_bytes": self.input_bytes,
+                "output_bytes": self.output_bytes,
+                "peak_bytes": self.peak_bytes,
+                "vm_instructions": None if self.vm_instructions is None else {
+                    "before": self.vm_instructions[0],
+                    "after": self.vm_instructions[1]},
+                "rule_hits": dict(self.rule_hits)}
+
+
+class _NoStats(FileStats):
+    """Statistics that record nothing, for when none were asked for."""
+
+    def __init__(self) -> None:
+        super().__init__("")
+
+    def phase(self, name: str) -> typing.ContextManager[None]:
+        return contextlib.nullcontext()
+
+    def analyzing(self) -> typing.ContextManager[None]:
+        return contextlib.nullcontext()
+
+    def count_tokens(self, tokens: TokenStream) -> None:
+        pass
+
+    def add_input(self, path: str) -> None:
+        pass
+
+    def add_output(self, path: str, size: typing.Optional[int] = None) -> None:
+        pass
+
+    def add_optimization(self, optimizer: "PeepholeOptimizer") -> None:
+        pass
+
+
+NO_STATS = _NoStats()
+
+
+class BuildStats:
+    """Statistics of analyzing many files."""
+
+    def __init__(self, trace_memory: bool = False) -> None:
+        """
+        Args:
+            trace_memory (bool): trace the peak allocation of every file, as
+                in FileStats.
+        """
+        self.trace_memory = trace_memory
+        self.files = []
+        self.failures = 0
+        self.up_to_date = 0  # Files skipped by an incremental build.
+        # What a whole program build left out, as no run of it calls them.
+        self.unreachable_subroutines = 0
+        self.unreachable_classes = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+
+    def new_file(self, path: str) -> FileStats:
+        """
+        Args:
+            path (str): path of a file about to be analyzed.
+
+        Returns:
+            FileStats: empty statistics for it, to pass to add() once filled.
+        """
+        return FileStats(path, self.trace_memory)
+
+    def add(self, file_stats: FileStats) -> None:
+        """Adds the statistics of a file that was analyzed."""
+        self.files.append(file_stats)
+
+    @contextlib.contextmanager
+    def building(self) -> typing.Iterator[None]:
+        """Records the total time of the with block, which should run the
+        whole build.
+        """
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            self.wall += time.perf_counter() - wall
+            self.cpu += time.process_time() - cpu
+
+    def phases(self) -> typing.Dict[str, typing.List[float]]:
+        """
+        Returns:
+            typing.Dict[str, typing.List[float]]: the [wall, cpu] seconds of
+            every phase, summed over all files.
+        """
+        phases = {}
+        for file_stats in self.files:
+            for name, (wall, cpu) in file_stats.phases.items():
+                times = phases.setdefault(name, [0.0, 0.0])
+                times[0] += wall
+                times[1] += cpu
+        return phases
+
+    def tokens(self) -> typing.Dict[str, int]:
+        """
+        Returns:
+            typing.Dict[str, int]: the number of tokens of every kind, summed
+            over all files.
+        """
+        tokens = dict.fromkeys(TOKEN_TYPES, 0)
+        for file_stats in self.files:
+            for token_type, count in file_stats.tokens.items():
+                tokens[token_type] += count
+        return tokens
+
+    def optimized_files(self) -> typing.List[FileStats]:
+        """
+        Returns:
+            typing.List[FileStats]: the statistics of the files whose VM code
+            went through the peephole optimizer.
+        """
+        return [file_stats for file_stats in self.files
+                if file_stats.vm_instructions is not None]
+
+    def rule_hits(self) -> typing.Dict[str, int]:
+        """
+        Returns:
+            typing.Dict[str, int]: how often every rule of the peephole
+            optimizer applied, summed over all files, for the rules that did.
+        """
+        hits = {}
+        for file_stats in self.files:
+            for name, count in file_stats.rule_hits.items():
+                hits[name] = hits.get(name, 0) + count
+        return hits
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        """
+        Returns:
+            typing.Dict[str, typing.Any]: the statistics of the build and of
+            every file, as JSON values.
+        """
+        optimized = self.optimized_files()
+        return {"wall": self.wall, "cpu": self.cpu,
+                "files_analyzed": len(self.files), "failures": self.failures,
+                "up_to_date": self.up_to_date,
+                "unreachable_subroutines": self.unreachable_subroutines,
+                "unreachable_classes": self.unreachable_classes,
+                "phases": {name: {"wall": wall, "cpu": cpu}
+                           for name, (wall, cpu) in self.phases().items()},
+                "tokens": self.tokens(),
+                "input_bytes": sum(file_stats.input_bytes
+                                   for file_stats in self.files),
+                "output_bytes": sum(file_stats.output_bytes
+                                    for file_stats in self.files),
+                "vm_instructions": {
+                    "before": sum(file_stats.vm_instructions[0]
+                                  for file_stats in optimized),
+                    "after": sum(file_stats.vm_instructions[1]
+                                 for file_stats in optimized)}
+                if optimized else None,
+                "rule_hits": self.rule_hits(),
+                "files": [file_stats.to_dict() for file_stats in self.files]}
+
+    def table(self) -> typing.List[str]:
+        """
+        Returns:
+            typing.List[str]: the statistics, as lines of a human readable
+            table.
+        """
+        lines = ["{:<20} {:>10} {:>10} {:>7}".format(
+            "phase", "wall ms", "cpu ms", "share")]
+        phases = self.phases()
+        analyzing = sum(wall for wall, _ in phases.values()) or 1.0
+        for name, (wall, cpu) in phases.items():
+            lines.append("{:<20} {:>10.1f} {:>10.1f} {:>7.1%}".format(
+                name, wall * 1000, cpu * 1000, wall / analyzing))
+        lines.append("{:<20} {:>10.1f} {:>10.1f}".format(
+            "build", self.wall * 1000, self.cpu * 1000))
+        tokens = self.tokens()
+        lines.append("")
+        lines.append("{} tokens: {}".format(sum(tokens.values()), ", ".join(
+            "{} {}".format(count, token_type.lower())
+            for token_type, count in tokens.items())))
+        lines.append("{} files analyzed, {} failed, {} up to date, "
+                     "{:.2f} MB in, {:.2f} MB out".format(
+                         len(self.files), self.failures, self.up_to_date,
+                         sum(file_stats.input_bytes
+                             for file_stats in self.files) / _MEGABYTE,
+                         sum(file_stats.output_bytes
+                             for file_stats in self.files) / _MEGABYTE))
+        if self.unreachable_subroutines:
+            lines.append("{} unreachable subroutines left out, {} classes "
+                         "left out whole".format(self.unreachable_subroutines,
+                                                 self.unreachable_classes))
+        slowest = sorted(self.files, key=lambda file_stats: file_stats.wall,
+                         reverse=True)[:SLOWEST_FILES]
+        if slowest:
+            lines.append("")
+            lines.append("slowest files:")
+        for file_stats in slowest:
+            peak = ""
+            if file_stats.peak_bytes is not None:
+                peak = ", peak {:.1f} KB".format(
+                    file_stats.peak_bytes / _KILOBYTE)
+            lines.append("{:>10.1f} ms  {} ({} tokens{})".format(
+                file_stats.wall * 1000, file_stats.path,
+                sum(file_stats.tokens.values()), peak))
+        optimized = self.optimized_files()
+        if optimized:
+            lines.append("")
+            lines.extend(self._optimization_table(optimized))
+        return lines
+
+    def _optimization_table(self, optimized: typing.List[FileStats]) -> \
+            typing.List[str]:
+        """The lines of table() about the peephole optimizer."""
+        before = sum(file_stats.vm_instructions[0] for file_stats in optimized)
+        after = sum(file_stats.vm_instructions[1] for file_stats in optimized)
+        lines = ["peephole optimizer: {} -> {} VM instructions ({:.1%} "
+                 "fewer)".format(before, after, 1 - after / (before or 1))]
+        hits = self.rule_hits()
+        if hits:
+            lines.append("rule hits: " + ", ".join(
+                "{} {}".format(name, count) for name, count in sorted(
+                    hits.items(), key=lambda item: item[1], reverse=True)))
+        lines.append("reduction by file:")
+        # The files the optimizer saved the most instructions in first.
+        optimized = sorted(optimized, key=lambda file_stats: (
+            file_stats.vm_instructions[1] - file_stats.vm_instructions[0]))
+        for file_stats in optimized[:SLOWEST_FILES]:
+            before, after = file_stats.vm_instructions
+            lines.append("{:>10} {:>6.1%}  {} ({} -> {})".format(
+                after - before, 1 - after / (before or 1), file_stats.path,
+                before, after))
+        if len(optimized) > SLOWEST_FILES:
+            lines.append("and {} more files, listed by --stats-json".format(
+                len(optimized) - SLOWEST_FILES))
+        return lines
+
+
+def profile(function: typing.Callable[[], typing.Any],
+            output_path: typing.Optional[str] = None,
+            limit: int = 30) -> typing.List[str]:
+    """Runs a function under cProfile.
+
+    Args:
+        function (typing.Callable[[], typing.Any]): the function.
+        output_path (typing.Optional[str]): if given, the profile is dumped
+            to this file, for pstats or another profile viewer.
+        limit (int): the number of functions to list.
+
+    Returns:
+        typing.List[str]: the functions that took the most cumulative time,
+        as lines of a pstats table.
+    """
+    import cProfile
+    import io
+    import pstats
+    profiler = cProfile.Profile()
+    profiler.runcall(function)
+    if output_path is not None:
+        profiler.dump_stats(output_path)
+    report = io.StringIO()
+    pstats.Stats(profiler, stream=report).sort_stats(
+        "cumulative").print_stats(limit)
+    return report.getvalue().splitlines()
@@ -1,388 +1,800 @@
-"""
-This file is part of nand2tetris, as taught in The Hebrew University, and
-was written by Aviv Yaish. It is an extension to the specifications given
-[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
-as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
-Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
-"""
-import typing
-
-_SYMBOL_LIST = '{}()[].,;+-*/&|<>=~^#'  # All symbols in the Jack language.
-
-
-class JackTokenizer:
-    """Removes all comments from the input stream and breaks it
-    into Jack language tokens, as specified by the Jack grammar.
-    
-    # Jack Language Grammar
-
-    A Jack file is a stream of characters. If the file represents a
-    valid program, it can be tokenized into a stream of valid tokens. The
-    tokens may be separated by an arbitrary number of whitespace characters, 
-    and comments, which are ignored. There are three possible comment formats: 
-    /* comment until closing */ , /** API comment until closing */ , and 
-    // comment until the line’s end.
-
-    - ‘xxx’: quotes are used for tokens that appear verbatim (‘terminals’).
-    - xxx: regular typeface is used for names of language constructs 
-           (‘non-terminals’).
-    - (): parentheses are used for grouping of language constructs.
-    - x | y: indicates that either x or y can appear.
-    - x?: indicates that x appears 0 or 1 times.
-    - x*: indicates that x appears 0 or more times.
-
-    ## Lexical Elements
-
-    The Jack language includes five types of terminal elements (tokens).
-
-    - keyword: 'class' | 'constructor' | 'function' | 'method' | 'field' | 
-               'static' | 'var' | 'int' | 'char' | 'boolean' | 'void' | 'true' |
-               'false' | 'null' | 'this' | 'let' | 'do' | 'if' | 'else' | 
-               'while' | 'return'
-    - symbol: '{' | '}' | '(' | ')' | '[' | ']' | '.' | ',' | ';' | '+' | 
-              '-' | '*' | '/' | '&' | '|' | '<' | '>' | '=' | '~' | '^' | '#'
-    - integerConstant: A decimal number in the range 0-32767.
-    - StringConstant: '"' A sequence of Unicode characters not including 
-                      double quote or newline '"'
-    - identifier: A sequence of letters, digits, and underscore ('_') not 
-                  starting with a digit. You can assume keywords cannot be
-                  identifiers, so 'self' cannot be an identifier, etc'.
-
-    ## Program Structure
-
-    A Jack program is a collection of classes, each appearing in a separate 
-    file. A compilation unit is a single class. A class is a sequence of tokens 
-    structured according to the following context free syntax:
-    
-    - class: 'class' className '{' classVarDec* subroutineDec* '}'
-    - classVarDec: ('static' | 'field') type varName (',' varName)* ';'
-    - type: 'int' | 'char' | 'boolean' | className
-    - subroutineDec: ('constructor' | 'function' | 'method') ('void' | type) 
-    - subroutineName '(' parameterList ')' subroutineBody
-    - parameterList: ((type varName) (',' type varName)*)?
-    - subroutineBody: '{' varDec* statements '}'
-    - varDec: 'var' type varName (',' varName)* ';'
-    - className: identifier
-    - subroutineName: identifier
-    - varName: identifier
-
-    ## Statements
-
-    - statements: statement*
-    - statement: letStatement | ifStatement | whileStatement | doStatement | 
-                 returnStatement
-    - letStatement: 'let' varName ('[' expression ']')? '=' expression ';'
-    - ifStatement: 'if' '(' expression ')' '{' statements '}' ('else' '{' 
-                   statements '}')?
-    - whileStatement: 'while' '(' 'expression' ')' '{' statements '}'
-    - doStatement: 'do' subroutineCall ';'
-    - returnStatement: 'return' expression? ';'
-
-    ## Expressions
-    
-    - expression: term (op term)*
-    - term: integerConstant | stringConstant | keywordConstant | varName | 
-            varName '['expression']' | subroutineCall | '(' expression ')' | 
-            unaryOp term
-    - subroutineCall: subroutineName '(' expressionList ')' | (className | 
-                      varName) '.' subroutineName '(' expressionList ')'
-    - expressionList: (expression (',' expression)* )?
-    - op: '+' | '-' | '*' | '/' | '&' | '|' | '<' | '>' | '='
-    - unaryOp: '-' | '~' | '^' | '#'
-    - keywordConstant: 'true' | 'false' | 'null' | 'this'
-    
-    Note that ^, # correspond to shiftleft and shiftright, respectively.
-    """
-
-    def __init__(self, input_stream: typing.TextIO) -> None:
-        """Opens the input stream and gets ready to tokenize it.
-
-        Args:
-            input_stream (typing.TextIO): input stream.
-        """
-        # Your code goes here!
-        # A good place to start is to read all the lines of the input:
-        # input_lines = input_stream.read().splitlines()
-        self.input_lines = input_stream.read().splitlines()
-        self.comment_removal()
-        self.input = ' '.join(self.input_lines)
-        self.current_token = ''
-        self.input_index = 0
-
-    def has_more_tokens(self) -> bool:
-        """Do we have more tokens in the input?
-
-        Returns:
-            bool: True if there are more tokens, False otherwise.
-        """
-        # Your code goes here!
-        return self.input_index < len(self.input)
-
-    def advance(self) -> typing.Generator:
-        """Gets the next token from the input and makes it the current token. 
-        This method should be called if has_more_tokens() is true. 
-        Initially there is no current token.
-        """
-        # Your code goes here!
-        while self.input_index < len(self.input):
-            if self.current_token in _SYMBOL_LIST and self.current_token != '':
-                yield self.current_token
-                self.current_token = ''
-            if self.input[self.input_index] in _SYMBOL_LIST:
-                if self.current_token != '':
-                    yield self.current_token
-                    self.current_token = ''
-                self.current_token = self.input[self.input_index].strip()
-                if self.current_token in _SYMBOL_LIST and self.current_token != '':
-                    yield self.current_token
-                    self.current_token = ''
-                    self.input_index += 1
-            if self.input[self.input_index]  == '"' or self.current_token == '"':
-                if self.current_token != '"':
-                    self.current_token = self.input[self.input_index]
-                else:
-                    self.current_token += self.input[self.input_index]
-                self.input_index += 1
-                while self.input[self.input_index] != '"':
-                    self.current_token += self.input[self.input_index]
-                    self.input_index += 1
-                self.current_token += self.input[self.input_index]
-                yield self.current_token
-                self.current_token = ''
-                self.input_index += 1
-
-            if self.input[self.input_index] == ' ' or self.input[self.input_index] == '\t' or self.input[
-                self.input_index] == '\n':
-                if self.current_token != '':
-                    yield self.current_token
-                    self.current_token = ''
-                self.input_index += 1
-
-            self.current_token += self.input[self.input_index].strip()
-            self.input_index += 1
-
-        yield self.current_token
-
-    def token_type(self) -> str:
-        """
-        Returns:
-            str: the type of the current token, can be
-            "KEYWORD", "SYMBOL", "IDENTIFIER", "INT_CONST", "STRING_CONST"
-        """
-        # Your code goes here!
-        match self.current_token:
-            case 'class':
-                return 'KEYWORD'
-            case 'constructor':
-                return 'KEYWORD'
-            case 'function':
-                return 'KEYWORD'
-            case 'method':
-                return 'KEYWORD'
-            case 'field':
-                return 'KEYWORD'
-            case 'static':
-                return 'KEYWORD'
-            case 'var':
-                return 'KEYWORD'
-            case 'int':
-                return 'KEYWORD'
-            case 'char':
-                return 'KEYWORD'
-            case 'boolean':
-                return 'KEYWORD'
-            case 'void':
-                return 'KEYWORD'
-            case 'true':
-                return 'KEYWORD'
-            case 'false':
-                return 'KEYWORD'
-            case 'null':
-                return 'KEYWORD'
-            case 'this':
-                return 'KEYWORD'
-            case 'let':
-                return 'KEYWORD'
-            case 'do':
-                return 'KEYWORD'
-            case 'if':
-                return 'KEYWORD'
-            case 'else':
-                return 'KEYWORD'
-            case 'while':
-                return 'KEYWORD'
-            case 'return':
-                return 'KEYWORD'
-            case '{':
-                return 'SYMBOL'
-            case '}':
-                return 'SYMBOL'
-            case '(':
-                return 'SYMBOL'
-            case ')':
-                return 'SYMBOL'
-            case '[':
-                return 'SYMBOL'
-            case ']':
-                return 'SYMBOL'
-            case '.':
-                return 'SYMBOL'
-            case ',':
-                return 'SYMBOL'
-            case ';':
-                return 'SYMBOL'
-            case '+':
-                return 'SYMBOL'
-            case '-':
-                return 'SYMBOL'
-            case '*':
-                return 'SYMBOL'
-            case '/':
-                return 'SYMBOL'
-            case '&':
-                return 'SYMBOL'
-            case '|':
-                return 'SYMBOL'
-            case '<':
-                return 'SYMBOL'
-            case '>':
-                return 'SYMBOL'
-            case '=':
-                return 'SYMBOL'
-            case '~':
-                return 'SYMBOL'
-            case '^':
-                return 'SYMBOL'
-            case '#':
-                return 'SYMBOL'
-        if self.current_token.isdigit():
-            return 'INT_CONST'
-        if self.current_token.startswith('"'):
-            return 'STRING_CONST'
-        return 'IDENTIFIER'
-
-    def keyword(self) -> str:
-        """
-        Returns:
-            str: the keyword which is the current token.
-            Should be called only when token_type() is "KEYWORD".
-            Can return "CLASS", "METHOD", "FUNCTION", "CONSTRUCTOR", "INT", 
-            "BOOLEAN", "CHAR", "VOID", "VAR", "STATIC", "FIELD", "LET", "DO", 
-            "IF", "ELSE", "WHILE", "RETURN", "TRUE", "FALSE", "NULL", "THIS"
-        """
-        # Your code goes here!
-        match self.current_token:
-            case 'class':
-                return 'CLASS'
-            case 'constructor':
-                return 'CONSTRUCTOR'
-            case 'function':
-                return 'FUNCTION'
-            case 'method':
-                return 'METHOD'
-            case 'field':
-                return 'FIELD'
-            case 'static':
-                return 'STATIC'
-            case 'var':
-                return 'VAR'
-            case 'int':
-                return 'INT'
-            case 'char':
-                return 'CHAR'
-            case 'boolean':
-                return 'BOOLEAN'
-            case 'void':
-                return 'VOID'
-            case 'true':
-                return 'TRUE'
-            case 'false':
-                return 'FALSE'
-            case 'null':
-                return 'NULL'
-            case 'this':
-                return 'THIS'
-            case 'let':
-                return 'LET'
-            case 'do':
-                return 'DO'
-            case 'if':
-                return 'IF'
-            case 'else':
-                return 'ELSE'
-            case 'while':
-                return 'WHILE'
-            case 'return':
-                return 'RETURN'
-        raise ValueError('Invalid keyword')
-
-    def symbol(self) -> str:
-        """
-        Returns:
-            str: the character which is the current token.
-            Should be called only when token_type() is "SYMBOL".
-            Recall that symbol was defined in the grammar like so:
-            symbol: '{' | '}' | '(' | ')' | '[' | ']' | '.' | ',' | ';' | '+' | 
-              '-' | '*' | '/' | '&' | '|' | '<' | '>' | '=' | '~' | '^' | '#'
-        """
-        # Your code goes here!
-        if self.current_token in _SYMBOL_LIST:
-            return self.current_token
-        raise ValueError('Invalid symbol')
-
-    def identifier(self) -> str:
-        """
-        Returns:
-            str: the identifier which is the current token.
-            Should be called only when token_type() is "IDENTIFIER".
-            Recall that identifiers were defined in the grammar like so:
-            identifier: A sequence of letters, digits, and underscore ('_') not 
-                  starting with a digit. You can assume keywords cannot be
-                  identifiers, so 'self' cannot be an identifier, etc'.
-        """
-        # Your code goes here!
-        return self.current_token
-
-    def int_val(self) -> int:
-        """
-        Returns:
-            str: the integer value of the current token.
-            Should be called only when token_type() is "INT_CONST".
-            Recall that integerConstant was defined in the grammar like so:
-            integerConstant: A decimal number in the range 0-32767.
-        """
-        # Your code goes here!
-        return int(self.current_token)
-
-    def string_val(self) -> str:
-        """
-        Returns:
-            str: the string value of the current token, without the double 
-            quotes. Should be called only when token_type() is "STRING_CONST".
-            Recall that StringConstant was defined in the grammar like so:
-            StringConstant: '"' A sequence of Unicode characters not including 
-                      double quote or newline '"'
-        """
-        # Your code goes here!
-        return self.current_token.strip('"')
-
-    def comment_removal(self) -> None:
-        """Removes comments from the input lines."""
-        i = 0
-        while i < len(self.input_lines):
-            self.input_lines[i] = self.input_lines[i].strip()
-            if self.input_lines[i].strip().find('//') != -1:
-                self.input_lines[i] = self.input_lines[i][:self.input_lines[i].find('//')]
-            if len(self.input_lines[i]) == 0:
-                self.input_lines.remove(self.input_lines[i])
-            elif self.input_lines[i].startswith('/*') or self.input_lines[i].startswith('/**'):
-                if self.input_lines[i].endswith('*/'):
-                    self.input_lines.remove(self.input_lines[i])
-                    continue
-                while not self.input_lines[i].endswith('*/'):
-                    self.input_lines.remove(self.input_lines[i])
-                self.input_lines.remove(self.input_lines[i])
-            elif self.input_lines[i] == '':
-                self.input_lines.remove(self.input_lines[i])
-            else:
-                i += 1
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import array
+import collections
+import re
+import sys
+import typing
+from JackErrors import MAX_ERRORS, JackSyntaxError
+
+_SYMBOL_LIST = '{}()[].,;+-*/&|<>=~^#'  # All symbols in the Jack language.
+_KEYWORD_LIST = (
+    'class', 'constructor', 'function', 'method', 'field', 'static', 'var',
+    'int', 'char', 'boolean', 'void', 'true', 'false', 'null', 'this', 'let',
+    'do', 'if', 'else', 'while', 'return')  # All keywords in the Jack language.
+
+# Token kinds, as stored in a TokenStream, and their token_type() names.
+KEYWORD, SYMBOL, IDENTIFIER, INT_CONST, STRING_CONST = range(5)
+TOKEN_TYPES = ('KEYWORD', 'SYMBOL', 'IDENTIFIER', 'INT_CONST', 'STRING_CONST')
+
+# Keyword codes: the index of every keyword in _KEYWORD_LIST, named after the
+# value keyword() returns for it. The code of a symbol is its ord().
+(CLASS, CONSTRUCTOR, FUNCTION, METHOD, FIELD, STATIC, VAR, INT, CHAR, BOOLEAN,
+ VOID, TRUE, FALSE, NULL, THIS, LET, DO, IF, ELSE, WHILE, RETURN) = range(
+    len(_KEYWORD_LIST))
+_KEYWORD_CODES = {keyword: code for code, keyword in enumerate(_KEYWORD_LIST)}
+_TOKEN_KINDS = {name: kind for kind, name in enumerate(TOKEN_TYPES)}
+_FIXED_TOKEN_TYPES = dict.fromkeys(_KEYWORD_LIST, 'KEYWORD')
+_FIXED_TOKEN_TYPES.update(dict.fromkeys(_SYMBOL_LIST, 'SYMBOL'))
+
+# One alternation per lexical element, tried in order at every position.
+# Comments and whitespace come first so "//" and "/*" are never read as
+# symbols, and keywords come before identifiers but must end on a word
+# boundary so that e.g. "classes" is still an identifier. A string constant
+# missing its closing quote is a single error, up to the end of its line.
+_TOKEN_PATTERN = re.compile(r"""
+      (?P<SKIP>\s+|//[^\n]*|/\*.*?\*/)
+    | (?P<KEYWORD>(?:{keywords})\b)
+    | (?P<SYMBOL>[{symbols}])
+    | (?P<INT_CONST>\d+)
+    | (?P<STRING_CONST>"[^"\n]*")
+    | (?P<IDENTIFIER>[A-Za-z_]\w*)
+    | (?P<ERROR>"[^"\n]*|.)
+    """.format(keywords='|'.join(_KEYWORD_LIST),
+               symbols=re.escape(_SYMBOL_LIST)),
+    re.VERBOSE | re.DOTALL | re.ASCII)
+
+# The byte-level fast path of the regex lexer, for ASCII sources. Every match
+# is a single token or comment, along with the whitespace before it, and is
+# classified by the kind of token its first byte starts, as looked up in
+# _BYTE_KINDS, rather than by which of many groups matched: a comment is a
+# "symbol" longer than a byte. Bytes that start no token are _INVALID, and
+# so is a string constant missing its closing quote, which is matched up to
+# the end of its line. The token may also be the empty end of the input, so
+# that the whitespace before it is never backtracked into.
+_ASCII_TOKEN_PATTERN = re.compile(rb"""
+    \s*(//[^\n]*|/\*.*?\*/|"[^"\n]*"?|\d+|[A-Za-z_]\w*|.|\Z)
+    """, re.VERBOSE | re.DOTALL | re.ASCII)
+_INVALID = len(TOKEN_TYPES)
+_BYTE_KINDS = bytearray([_INVALID]) * 256
+for _byte in b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz_':
+    _BYTE_KINDS[_byte] = IDENTIFIER
+for _byte in b'0123456789':
+    _BYTE_KINDS[_byte] = INT_CONST
+for _byte in _SYMBOL_LIST.encode():
+    _BYTE_KINDS[_byte] = SYMBOL
+_BYTE_KINDS[ord('"')] = STRING_CONST
+_BYTE_KINDS = bytes(_BYTE_KINDS)
+_BYTE_KEYWORD_CODES = {keyword.encode(): code
+                       for keyword, code in _KEYWORD_CODES.items()}
+
+# Patterns used by JackTokenizer.comment_removal() to jump between states.
+_COMMENT_STATE_PATTERN = re.compile(r'["/]')
+_STRING_END_PATTERN = re.compile(r'["\n]')
+_NOT_NEWLINE_PATTERN = re.compile(r'[^\n]')
+
+LEXERS = ('regex', 'legacy')  # Lexer engines JackTokenizer can run.
+DEFAULT_CHUNK_SIZE = 64 * 1024  # Characters read at a time when streaming.
+
+
+class TokenStream:
+    """A compact stream of classified tokens.
+
+    Tokens are classified once, when they are lexed, and stored column-wise
+    in arrays: a kind (KEYWORD, SYMBOL, ...), a code (the keyword code or the
+    symbol's ord(), 0 otherwise) and the start, end and line of the token's
+    span in the source buffer. The text of a token is only sliced out of the
+    source when it is asked for.
+    """
+    __slots__ = ('source', 'kinds', 'codes', 'starts', 'ends', 'lines')
+
+    def __init__(self, source: str) -> None:
+        """Creates an empty stream of tokens taken from the given source.
+
+        Args:
+            source (str): the text all token spans point into.
+        """
+        self.source = source
+        self.kinds = array.array('B')
+        self.codes = array.array('B')
+        self.starts = array.array('I')
+        self.ends = array.array('I')
+        self.lines = array.array('I')
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def append(self, kind: int, code: int, start: int, end: int,
+               line: int) -> None:
+        """Adds a token to the end of the stream.
+
+        Args:
+            kind (int): the token kind.
+            code (int): the keyword code or symbol ord(), 0 otherwise.
+            start (int): offset of the token's first character in the source.
+            end (int): offset just past the token's last character.
+            line (int): the 1-based line the token starts on.
+        """
+        self.kinds.append(kind)
+        self.codes.append(code)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.lines.append(line)
+
+    def text(self, index: int) -> str:
+        """
+        Args:
+            index (int): index of a token in the stream.
+
+        Returns:
+            str: the text of the token, without the double quotes for string
+            constants. Keyword and identifier texts are interned.
+        """
+        kind = self.kinds[index]
+        if kind == KEYWORD:
+            return _KEYWORD_LIST[self.codes[index]]
+        if kind == SYMBOL:
+            return chr(self.codes[index])
+        if kind == STRING_CONST:
+            return self.source[self.starts[index] + 1:self.ends[index] - 1]
+        text = self.source[self.starts[index]:self.ends[index]]
+        return sys.intern(text) if kind == IDENTIFIER else text
+
+    def position(self, index: int) -> typing.Tuple[int, int]:
+        """
+        Args:
+            index (int): index of a token in the stream.
+
+        Returns:
+            typing.Tuple[int, int]: the line and column the token starts at,
+            both from 1.
+        """
+        start = self.starts[index]
+        return self.lines[index], start - self.source.rfind('\n', 0, start)
+
+
+class JackTokenizer:
+    """Removes all comments from the input stream and breaks it
+    into Jack language tokens, as specified by the Jack grammar.
+    
+    # Jack Language Grammar
+
+    A Jack file is a stream of characters. If the file represents a
+    valid program, it can be tokenized into a stream of valid tokens. The
+    tokens may be separated by an arbitrary number of whitespace characters, 
+    and comments, which are ignored. There are three possible comment formats: 
+    /* comment until closing */ , /** API comment until closing */ , and 
+    // comment until the line’s end.
+
+    - ‘xxx’: quotes are used for tokens that appear verbatim (‘terminals’).
+    - xxx: regular typeface is used for names of language constructs 
+           (‘non-terminals’).
+    - (): parentheses are used for grouping of language constructs.
+    - x | y: indicates that either x or y can appear.
+    - x?: indicates that x appears 0 or 1 times.
+    - x*: indicates that x appears 0 or more times.
+
+    ## Lexical Elements
+
+    The Jack language includes five types of terminal elements (tokens).
+
+    - keyword: 'class' | 'constructor' | 'function' | 'method' | 'field' | 
+               'static' | 'var' | 'int' | 'char' | 'boolean' | 'void' | 'true' |
+               'false' | 'null' | 'this' | 'let' | 'do' | 'if' | 'else' | 
+               'while' | 'return'
+    - symbol: '{' | '}' | '(' | ')' | '[' | ']' | '.' | ',' | ';' | '+' | 
+              '-' | '*' | '/' | '&' | '|' | '<' | '>' | '=' | '~' | '^' | '#'
+    - integerConstant: A decimal number in the range 0-32767.
+    - StringConstant: '"' A sequence of Unicode characters not including 
+                      double quote or newline '"'
+    - identifier: A sequence of letters, digits, and underscore ('_') not 
+                  starting with a digit. You can assume keywords cannot be
+                  identifiers, so 'self' cannot be an identifier, etc'.
+
+    ## Program Structure
+
+    A Jack program is a collection of classes, each appearing in a separate 
+    file. A compilation unit is a single class. A class is a sequence of tokens 
+    structured according to the following context free syntax:
+    
+    - class: 'class' className '{' classVarDec* subroutineDec* '}'
+    - classVarDec: ('static' | 'field') type varName (',' varName)* ';'
+    - type: 'int' | 'char' | 'boolean' | className
+    - subroutineDec: ('constructor' | 'function' | 'method') ('void' | type) 
+    - subroutineName '(' parameterList ')' subroutineBody
+    - parameterList: ((type varName) (',' type varName)*)?
+    - subroutineBody: '{' varDec* statements '}'
+    - varDec: 'var' type varName (',' varName)* ';'
+    - className: identifier
+    - subroutineName: identifier
+    - varName: identifier
+
+    ## Statements
+
+    - statements: statement*
+    - statement: letStatement | ifStatement | whileStatement | doStatement | 
+                 returnStatement
+    - letStatement: 'let' varName ('[' expression ']')? '=' expression ';'
+    - ifStatement: 'if' '(' expression ')' '{' statements '}' ('else' '{' 
+                   statements '}')?
+    - whileStatement: 'while' '(' 'expression' ')' '{' statements '}'
+    - doStatement: 'do' subroutineCall ';'
+    - returnStatement: 'return' expression? ';'
+
+    ## Expressions
+    
+    - expression: term (op term)*
+    - term: integerConstant | stringConstant | keywordConstant | varName | 
+            varName '['expression']' | subroutineCall | '(' expression ')' | 
+            unaryOp term
+    - subroutineCall: subroutineName '(' expressionList ')' | (className | 
+                      varName) '.' subroutineName '(' expressionList ')'
+    - expressionList: (expression (',' expression)* )?
+    - op: '+' | '-' | '*' | '/' | '&' | '|' | '<' | '>' | '='
+    - unaryOp: '-' | '~' | '^' | '#'
+    - keywordConstant: 'true' | 'false' | 'null' | 'this'
+    
+    Note that ^, # correspond to shiftleft and shiftright, respectively.
+    """
+
+    def __init__(self, input_stream: typing.TextIO, lexer: str = 'regex',
+                 chunk_size: typing.Optional[int] = None) -> None:
+        """Opens the input stream and gets ready to tokenize it.
+
+        Args:
+            input_stream (typing.TextIO): input stream.
+            lexer (str): the lexer engine to use, one of LEXERS. "regex"
+                scans the raw input once with a single precompiled pattern,
+                as bytes when the input is all ASCII, "legacy" strips
+                comments first and then walks the input one character at a
+                time. Both produce the same tokens, but only the regex lexer
+                reports lexical errors, such as an unterminated string
+                constant or an invalid character.
+            chunk_size (typing.Optional[int]): if given, the input is not
+                read whole but streamed, this many characters at a time, and
+                tokens are lexed off the chunks as they come in, so memory
+                stays bounded however large the input is. self.input is then
+                None, and tokens must be read with advance(), tokens() or
+                iter_tokens(). Only the regex lexer can stream.
+        """
+        if lexer not in LEXERS:
+            raise ValueError('Unknown lexer: {}'.format(lexer))
+        if chunk_size is not None and lexer != 'regex':
+            raise ValueError('Only the regex lexer can stream its input')
+        self.lexer = lexer
+        self.chunk_size = chunk_size
+        name = getattr(input_stream, 'name', None)
+        self.path = name if isinstance(name, str) else None
+        # Syntax errors found while lexing, which is skipped over, so that
+        # the tokens that follow are still lexed.
+        self.errors = []
+        if chunk_size is None:
+            self.input = input_stream.read()
+            self.input_stream = None
+        else:
+            self.input = None
+            self.input_stream = input_stream
+        if lexer == 'legacy':
+            self.comment_removal()
+        self.current_token = ''
+        self.current_type = None
+        self.input_index = 0
+        self._pending_tokens = None  # What peek() and consume() pull from.
+        self._token_stream = None  # What token_stream() returned, if called.
+        self._lookahead = collections.deque()
+
+    def has_more_tokens(self) -> bool:
+        """Do we have more tokens in the input?
+
+        Returns:
+            bool: True if there are more tokens, False otherwise.
+        """
+        # Your code goes here!
+        if self.input is None:
+            return self.input_stream is not None
+        return self.input_index < len(self.input)
+
+    def advance(self) -> typing.Generator:
+        """Gets the next token from the input and makes it the current token. 
+        This method should be called if has_more_tokens() is true. 
+        Initially there is no current token.
+        """
+        if self.input is None:
+            return self._advance_streaming()
+        if self.lexer == 'regex':
+            return self._advance_regex()
+        return self._advance_legacy()
+
+    def _advance_regex(self) -> typing.Generator:
+        """Runs the regex lexer: a single linear scan of the input with
+        _TOKEN_PATTERN, which classifies every token as it matches it.
+        """
+        for match in _TOKEN_PATTERN.finditer(self.input):
+            self.input_index = match.end()
+            token_type = match.lastgroup
+            if token_type == 'SKIP':
+                continue
+            if token_type == 'ERROR':
+                start = match.start()
+                raise self._error(
+                    match.group(), self.input.count('\n', 0, start) + 1,
+                    start - self.input.rfind('\n', 0, start))
+            self.current_token = match.group()
+            self.current_type = token_type
+            yield self.current_token
+
+    def _advance_streaming(self) -> typing.Generator:
+        """Runs the regex lexer over the input as it is streamed in."""
+        for token_type, token, _, _ in self._stream_matches():
+            self.current_token = token
+            self.current_type = token_type
+            yield token
+
+    def _stream_matches(self) -> typing.Iterator[
+            typing.Tuple[str, str, int, int]]:
+        """Streams the input in chunks and lexes it with _TOKEN_PATTERN.
+
+        Only the part of the input that has not been lexed yet is kept: a
+        token that may go on in the next chunk is lexed again once that chunk
+        has been read, so at most a chunk and the longest token or comment
+        are in memory at once.
+
+        Yields:
+            typing.Tuple[str, str, int, int]: the type, text, line and column
+            of every token, in order.
+        """
+        input_stream = self.input_stream
+        if input_stream is None:
+            return  # Already streamed to its end.
+        buffer = ''
+        offset = 0  # Offset of the buffer in the input.
+        line = 1
+        line_start = 0  # Offset of the current line in the input.
+        read_size = self.chunk_size
+        at_end = False
+        while not at_end:
+            chunk = input_stream.read(read_size)
+            at_end = not chunk
+            buffer += chunk
+            consumed = 0
+            for match in _TOKEN_PATTERN.finditer(buffer):
+                token_type = match.lastgroup
+                start, end = match.span()
+                if not at_end and (
+                        end == len(buffer)
+                        # "/*" whose "*/" has not been read yet.
+                        or (token_type == 'SYMBOL'
+                            and buffer.startswith('/*', start))):
+                    break
+                consumed = end
+                if token_type == 'SKIP':
+                    newlines = buffer.count('\n', start, end)
+                    if newlines:
+                        line += newlines
+                        line_start = offset + buffer.rfind(
+                            '\n', start, end) + 1
+                    continue
+                if token_type == 'ERROR':
+                    self._record_error(self._error(
+                        match.group(), line, offset + start - line_start + 1))
+                    continue
+                yield token_type, match.group(), line, \
+                    offset + start - line_start + 1
+            buffer = buffer[consumed:]
+            offset += consumed
+            # A comment or token longer than a chunk is read in ever larger
+            # chunks, so that it is not lexed again once per chunk.
+            read_size = self.chunk_size if consumed else read_size * 2
+        self.input_stream = None
+
+    def iter_tokens(self) -> typing.Iterator[
+            typing.Tuple[int, int, str, int, int]]:
+        """Tokenizes the input lazily, a token at a time, streaming it in if
+        the tokenizer was given a chunk_size.
+
+        Yields:
+            typing.Tuple[int, int, str, int, int]: the kind, code, text, line
+            and column of every token, as TokenStream stores and returns
+            them.
+        """
+        if self.input is not None:
+            stream = self.token_stream()
+            source = stream.source
+            kinds = stream.kinds
+            codes = stream.codes
+            starts = stream.starts
+            lines = stream.lines
+            current_line = 1
+            line_start = 0
+            for index in range(len(stream)):
+                line = lines[index]
+                start = starts[index]
+                if line != current_line:
+                    current_line = line
+                    line_start = source.rfind('\n', 0, start) + 1
+                yield kinds[index], codes[index], stream.text(index), line, \
+                    start - line_start + 1
+            return
+        intern = sys.intern
+        for token_type, token, line, column in self._stream_matches():
+            kind = _TOKEN_KINDS[token_type]
+            if kind == KEYWORD:
+                code = _KEYWORD_CODES[token]
+                token = _KEYWORD_LIST[code]
+            elif kind == SYMBOL:
+                code = ord(token)
+            else:
+                code = 0
+                if kind == IDENTIFIER:
+                    token = intern(token)
+                elif kind == STRING_CONST:
+                    token = token[1:-1]
+            yield kind, code, token, line, column
+
+    def peek(self, k: int = 0) -> typing.Optional[
+            typing.Tuple[int, int, str, int, int]]:
+        """Looks ahead without consuming anything. Tokens are lexed lazily,
+        only as far as the furthest token peeked at, and kept in a lookahead
+        buffer until they are consumed.
+
+        Args:
+            k (int): how many tokens past the next one to look.
+
+        Returns:
+            typing.Optional[typing.Tuple[int, int, str, int, int]]: the token k
+            places after the next one consume() returns, as iter_tokens()
+            yields it, or None if the input ends before it.
+        """
+        lookahead = self._lookahead
+        if self._pending_tokens is None:
+            self._pending_tokens = self.iter_tokens()
+        while len(lookahead) <= k:
+            token = next(self._pending_tokens, None)
+            if token is None:
+                return None
+            lookahead.append(token)
+        return lookahead[k]
+
+    def consume(self) -> typing.Optional[
+            typing.Tuple[int, int, str, int, int]]:
+        """Consumes the next token. peek() and consume() read the tokens
+        independently of advance() and tokens(), and should not be mixed with
+        them.
+
+        Returns:
+            typing.Optional[typing.Tuple[int, int, str, int, int]]: the token, as
+            iter_tokens() yields it, or None if the input has ended.
+        """
+        if self._lookahead:
+            return self._lookahead.popleft()
+        if self._pending_tokens is None:
+            self._pending_tokens = self.iter_tokens()
+        return next(self._pending_tokens, None)
+
+    def _advance_legacy(self) -> typing.Generator:
+        """Runs the legacy lexer, one character of the comment-free input at a
+        time. Every symbol is a token of its own, a string constant runs up to
+        its closing quote, or to the end of its line if it has none, an
+        integer constant over its digits, and any other run of characters up
+        to a space, symbol or quote is a word.
+        """
+        text = self.input
+        size = len(text)
+        while self.input_index < size:
+            start = self.input_index
+            character = text[start]
+            if character.isspace():
+                self.input_index += 1
+                continue
+            if character in _SYMBOL_LIST:
+                end = start + 1
+            elif character == '"':
+                end = start + 1
+                while end < size and text[end] not in '"\n':
+                    end += 1
+                if end < size and text[end] == '"':
+                    end += 1
+            elif character.isdigit():
+                end = start + 1
+                while end < size and text[end].isdigit():
+                    end += 1
+            else:
+                end = start + 1
+                while end < size and not text[end].isspace() and \
+                        text[end] not in _SYMBOL_LIST and text[end] != '"':
+                    end += 1
+            self.current_token = text[start:end]
+            self.input_index = end
+            yield self.current_token
+
+    def tokens(self) -> typing.Generator:
+        """Tokenizes the whole input stream.
+
+        Yields:
+            tuple: a (token type, value) pair for every token, where the value
+            is what the matching accessor returns, as a string.
+        """
+        for token in self.advance():
+            if token == '':
+                continue
+            token_type = self.token_type()
+            if token_type == "KEYWORD":
+                yield token_type, self.keyword()
+            elif token_type == "SYMBOL":
+                yield token_type, self.symbol()
+            elif token_type == "IDENTIFIER":
+                yield token_type, self.identifier()
+            elif token_type == "INT_CONST":
+                yield token_type, str(self.int_val())
+            elif token_type == "STRING_CONST":
+                yield token_type, self.string_val()
+
+    def token_stream(self) -> TokenStream:
+        """Tokenizes the whole input stream. It is only tokenized once, later
+        calls return the same stream.
+
+        Returns:
+            TokenStream: all the tokens of the input, classified.
+        """
+        if self._token_stream is not None:
+            return self._token_stream
+        if self.input is None:
+            raise ValueError('A streamed input can only be read with '
+                             'advance(), tokens() or iter_tokens()')
+        stream = TokenStream(self.input)
+        append = stream.append
+        source = self.input
+        line = 1
+        line_offset = 0  # Offset up to which newlines are counted in line.
+        if self.lexer == 'regex' and source.isascii():
+            self._lex_ascii(stream)
+        elif self.lexer == 'regex':
+            for match in _TOKEN_PATTERN.finditer(source):
+                token_type = match.lastgroup
+                if token_type == 'SKIP':
+                    continue
+                start, end = match.span()
+                line += source.count('\n', line_offset, start)
+                line_offset = start
+                if token_type == 'ERROR':
+                    self._record_error(self._error(
+                        match.group(), line,
+                        start - source.rfind('\n', 0, start)))
+                    continue
+                kind = _TOKEN_KINDS[token_type]
+                if kind == KEYWORD:
+                    code = _KEYWORD_CODES[match.group()]
+                elif kind == SYMBOL:
+                    code = ord(source[start])
+                else:
+                    code = 0
+                append(kind, code, start, end, line)
+        else:
+            end = 0
+            for token in self._advance_legacy():
+                if token == '':
+                    continue
+                start = source.find(token, end)
+                end = start + len(token)
+                line += source.count('\n', line_offset, start)
+                line_offset = start
+                kind = _TOKEN_KINDS[self.token_type()]
+                if kind == KEYWORD:
+                    code = _KEYWORD_CODES[token]
+                elif kind == SYMBOL:
+                    code = ord(token)
+                else:
+                    code = 0
+                append(kind, code, start, end, line)
+        self.input_index = len(source)
+        self._token_stream = stream
+        return stream
+
+    def _lex_ascii(self, stream: TokenStream) -> None:
+        """token_stream() with the regex lexer, for an ASCII source, which it
+        lexes as bytes. Offsets in the bytes are the same as in the source, so
+        the tokens are the same, and their text is still sliced out of the
+        source only when it is asked for. Tokens go straight into the arrays
+        of the stream, rather than through TokenStream.append().
+
+        Args:
+            stream (TokenStream): the stream to add the tokens to.
+        """
+        source = stream.source.encode('ascii')
+        append_kind = stream.kinds.append
+        append_code = stream.codes.append
+        append_start = stream.starts.append
+        append_end = stream.ends.append
+        append_line = stream.lines.append
+        byte_kinds = _BYTE_KINDS
+        keyword_code = _BYTE_KEYWORD_CODES.get
+        count_newlines = source.count
+        line = 1
+        line_offset = 0  # Offset up to which newlines are counted in line.
+        for match in _ASCII_TOKEN_PATTERN.finditer(source):
+            start, end = match.span(1)
+            if start == end:
+                break  # The end of the input.
+            line += count_newlines(b'\n', line_offset, start)
+            line_offset = start
+            first = source[start]
+            kind = byte_kinds[first]
+            if kind == IDENTIFIER:
+                code = keyword_code(source[start:end])
+                if code is None:
+                    code = 0
+                else:
+                    kind = KEYWORD
+            elif kind == SYMBOL:
+                if end - start > 1:
+                    continue  # A comment.
+                code = first
+            elif kind == INT_CONST or kind == STRING_CONST and \
+                    end - start > 1 and source[end - 1] == first:
+                code = 0
+            else:
+                self._record_error(self._error(
+                    stream.source[start:end], line,
+                    start - source.rfind(b'\n', 0, start)))
+                continue
+            append_kind(kind)
+            append_code(code)
+            append_start(start)
+            append_end(end)
+            append_line(line)
+
+    def _error(self, text: str, line: int, column: int) -> JackSyntaxError:
+        """
+        Args:
+            text (str): text _TOKEN_PATTERN matched as an ERROR.
+            line (int): the line it starts at.
+            column (int): the column it starts at.
+
+        Returns:
+            JackSyntaxError: the error to report for it.
+        """
+        if text.startswith('"'):
+            message = 'Unterminated string constant'
+        else:
+            message = 'Invalid character: {!r}'.format(text)
+        return JackSyntaxError(message, line, column, self.path)
+
+    def _record_error(self, error: JackSyntaxError) -> None:
+        """Adds an error to self.errors, and gives up by raising them all if
+        there are too many.
+        """
+        self.errors.append(error)
+        if len(self.errors) >= MAX_ERRORS:
+            raise JackSyntaxError.collect(self.errors)
+
+    def token_type(self) -> str:
+        """
+        Returns:
+            str: the type of the current token, can be
+            "KEYWORD", "SYMBOL", "IDENTIFIER", "INT_CONST", "STRING_CONST"
+        """
+        if self.current_type is not None:
+            return self.current_type
+        token_type = _FIXED_TOKEN_TYPES.get(self.current_token)
+        if token_type is not None:
+            return token_type
+        if self.current_token.isdigit():
+            return 'INT_CONST'
+        if self.current_token.startswith('"'):
+            return 'STRING_CONST'
+        return 'IDENTIFIER'
+
+    def keyword(self) -> str:
+        """
+        Returns:
+            str: the keyword which is the current token.
+            Should be called only when token_type() is "KEYWORD".
+            Can return "CLASS", "METHOD", "FUNCTION", "CONSTRUCTOR", "INT", 
+            "BOOLEAN", "CHAR", "VOID", "VAR", "STATIC", "FIELD", "LET", "DO", 
+            "IF", "ELSE", "WHILE", "RETURN", "TRUE", "FALSE", "NULL", "THIS"
+        """
+        if self.current_token in _KEYWORD_CODES:
+            return self.current_token.upper()
+        raise ValueError('Invalid keyword')
+
+    def symbol(self) -> str:
+        """
+        Returns:
+            str: the character which is the current token.
+            Should be called only when token_type() is "SYMBOL".
+            Recall that symbol was defined in the grammar like so:
+            symbol: '{' | '}' | '(' | ')' | '[' | ']' | '.' | ',' | ';' | '+' | 
+              '-' | '*' | '/' | '&' | '|' | '<' | '>' | '=' | '~' | '^' | '#'
+        """
+        # Your code goes here!
+        if self.current_token in _SYMBOL_LIST:
+            return self.current_token
+        raise ValueError('Invalid symbol')
+
+    def identifier(self) -> str:
+        """
+        Returns:
+            str: the identifier which is the current token.
+            Should be called only when token_type() is "IDENTIFIER".
+            Recall that identifiers were defined in the grammar like so:
+            identifier: A sequence of letters, digits, and underscore ('_') not 
+                  starting with a digit. You can assume keywords cannot be
+                  identifiers, so 'self' cannot be an identifier, etc'.
+        """
+        # Your code goes here!
+        return self.current_token
+
+    def int_val(self) -> int:
+        """
+        Returns:
+            str: the integer value of the current token.
+            Should be called only when token_type() is "INT_CONST".
+            Recall that integerConstant was defined in the grammar like so:
+            integerConstant: A decimal number in the range 0-32767.
+        """
+        # Your code goes here!
+        return int(self.current_token)
+
+    def string_val(self) -> str:
+        """
+        Returns:
+            str: the string value of the current token, without the double 
+            quotes. Should be called only when token_type() is "STRING_CONST".
+            Recall that StringConstant was defined in the grammar like so:
+            StringConstant: '"' A sequence of Unicode characters not including 
+                      double quote or newline '"'
+        """
+        # Your code goes here!
+        return self.current_token.strip('"')
+
+    def comment_removal(self) -> None:
+        """Blanks out all comments in the input in a single pass.
+
+        Every character of a comment is replaced by a space, except for line
+        breaks, so the offset, line and column of every remaining character
+        stay the same as in the original input. String constants are copied
+        as is, so "//" or "/*" inside them do not start a comment.
+        """
+        text = self.input
+        output = []
+        start = 0  # Start of the text not yet copied to the output.
+        index = 0
+        while True:
+            # Code state: skip ahead to the next quote or slash.
+            match = _COMMENT_STATE_PATTERN.search(text, index)
+            if match is None:
+                break
+            index = match.start()
+            if text[index] == '"':
+                # String state: runs until the closing quote or line's end.
+                end = _STRING_END_PATTERN.search(text, index + 1)
+                index = end.end() if end is not None else len(text)
+                continue
+            if text.startswith('//', index):
+                # Line comment state: runs until the line's end.
+                end = text.find('\n', index)
+                end = end if end != -1 else len(text)
+            elif text.startswith('/*', index):
+                # Block comment state: runs until the closing "*/". Without
+                # one, "/*" is not a comment but two symbols, as the regex
+                # lexer reads it.
+                end = text.find('*/', index + 2)
+                if end == -1:
+                    index += 1
+                    continue
+                end += 2
+            else:
+                index += 1
+                continue
+            output.append(text[start:index])
+            output.append(_NOT_NEWLINE_PATTERN.sub(' ', text[index:end]))
+            start = index = end
+        output.append(text[start:])
+        # Trailing whitespace is dropped, the legacy lexer expects the input
+        # to end with a token.
+        self.input = ''.join(output).rstrip()
@@ -0,0 +1,121 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import os
+import threading
+import typing
+import JackAST
+from JackSerializers import dumps_binary, load_binary
+
+_CACHE_FORMAT = b"2"  # Bumped whenever the layout of cached trees changes.
+_ENTRY_SUFFIX = ".tree"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class ParseTreeCache:
+    """A directory of syntax trees keyed by the hash of their source.
+
+    Trees are stored in the binary form of JackSerializers, one file per
+    source. The cache is bounded in size: evict() removes the least recently
+    used trees, by access time, until the cache fits. Entries are written
+    atomically, so several processes, or threads, can share a cache
+    directory.
+    """
+
+    def __init__(self, directory: str, version: str = "",
+                 max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        """
+        Args:
+            directory (str): the cache directory, created if missing.
+            version (str): the version of the tool producing the trees. Trees
+                stored by another version are never returned.
+            max_bytes (int): the size evict() shrinks the cache down to.
+        """
+        self.directory = directory
+        self.version = version.encode()
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, source: str) -> str:
+        """
+        Args:
+            source (str): the source text of a class.
+
+        Returns:
+            str: the key its syntax tree is cached under.
+        """
+        import hashlib  # Only builds with a cache need it.
+        digest = hashlib.sha256(_CACHE_FORMAT + b"\0" + self.version + b"\0")
+        digest.update(source.encode())
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, key + _ENTRY_SUFFIX)
+
+    def load(self, key: str) -> typing.Optional[JackAST.Class]:
+        """
+        Args:
+            key (str): a key returned by key().
+
+        Returns:
+            typing.Optional[JackAST.Class]: the cached syntax tree, or None if
+            there is none. Loading a tree marks it as recently used.
+        """
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as entry_file:
+                tree = load_binary(entry_file.read())
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return tree
+
+    def store(self, key: str, tree: JackAST.Class) -> None:
+        """Caches a syntax tree.
+
+        Args:
+            key (str): a key returned by key().
+            tree (JackAST.Class): the syntax tree.
+        """
+        path = self._entry_path(key)
+        temporary_path = "{}.{}.{}.tmp".format(
+            path, os.getpid(), threading.get_ident())
+        with open(temporary_path, 'wb') as entry_file:
+            entry_file.write(dumps_binary(tree))
+        os.replace(temporary_path, path)
+
+    def evict(self) -> int:
+        """Removes the least recently used trees until the cache is no larger
+        than max_bytes.
+
+        Returns:
+            int: the number of trees removed.
+        """
+        entries = []
+        total_size = 0
+        with os.scandir(self.directory) as directory_entries:
+            for entry in directory_entries:
+                if not entry.name.endswith(_ENTRY_SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_atime, stat.st_size, entry.path))
+                total_size += stat.st_size
+        removed = 0
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass  # Another process evicted it first.
+            total_size -= size
+        return removed
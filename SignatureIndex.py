@@ -0,0 +1,444 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+
+An index of the classes of every program, and of the kind, return type and
+parameter types of each of their subroutines, to check every call a class
+makes against the subroutine it calls.
+"""
+import os
+import threading
+import types
+import typing
+from CompilationEngine import CompilationEngine
+from JackAST import (
+    Class, LetStatement, IfStatement, WhileStatement, DoStatement,
+    ReturnStatement, Expression, ArrayAccess, SubroutineCall,
+    ParenthesizedExpression, UnaryOp)
+from JackErrors import JackCallError
+from JackTokenizer import JackTokenizer
+
+INDEX_FILENAME = ".jackanalyzer-signatures.json"
+_INDEX_FORMAT = 1  # Bumped whenever the layout of the index changes.
+_METHOD = "method"
+# The fields of every node below a subroutine that may hold a call, as a
+# node, a list of nodes or None, in the order they appear in the source.
+# Nodes of other classes hold none.
+_CALL_FIELDS = {
+    LetStatement: ('index', 'value'),
+    IfStatement: ('condition', 'statements', 'else_statements'),
+    WhileStatement: ('condition', 'statements'),
+    DoStatement: ('call',),
+    ReturnStatement: ('value',),
+    Expression: ('terms',),
+    ArrayAccess: ('index',),
+    SubroutineCall: ('arguments',),
+    ParenthesizedExpression: ('expression',),
+    UnaryOp: ('term',),
+}
+
+
+class Signature(typing.NamedTuple):
+    """The declaration of a subroutine: its kind, "constructor", "function"
+    or "method", its return type, and the types of its parameters, in order.
+    """
+    kind: str
+    return_type: str
+    parameter_types: typing.Tuple[str, ...]
+
+
+# The subroutines of the Jack OS, by full name, as "Class.subroutine". They
+# can never change, so the mapping is read-only, and shared by every program
+# that does not replace their class with its own.
+BUILTIN_SIGNATURES = types.MappingProxyType({
+    name: Signature(kind, return_type, tuple(parameter_types))
+    for name, kind, return_type, *parameter_types in (
+        ("Math.init", "function", "void"),
+        ("Math.abs", "function", "int", "int"),
+        ("Math.multiply", "function", "int", "int", "int"),
+        ("Math.divide", "function", "int", "int", "int"),
+        ("Math.min", "function", "int", "int", "int"),
+        ("Math.max", "function", "int", "int", "int"),
+        ("Math.sqrt", "function", "int", "int"),
+        ("String.new", "constructor", "String", "int"),
+        ("String.dispose", "method", "void"),
+        ("String.length", "method", "int"),
+        ("String.charAt", "method", "char", "int"),
+        ("String.setCharAt", "method", "void", "int", "char"),
+        ("String.appendChar", "method", "String", "char"),
+        ("String.eraseLastChar", "method", "void"),
+        ("String.intValue", "method", "int"),
+        ("String.setInt", "method", "void", "int"),
+        ("String.backSpace", "function", "char"),
+        ("String.doubleQuote", "function", "char"),
+        ("String.newLine", "function", "char"),
+        ("Array.new", "function", "Array", "int"),
+        ("Array.dispose", "method", "void"),
+        ("Output.init", "function", "void"),
+        ("Output.moveCursor", "function", "void", "int", "int"),
+        ("Output.printChar", "function", "void", "char"),
+        ("Output.printString", "function", "void", "String"),
+        ("Output.printInt", "function", "void", "int"),
+        ("Output.println", "function", "void"),
+        ("Output.backSpace", "function", "void"),
+        ("Screen.init", "function", "void"),
+        ("Screen.clearScreen", "function", "void"),
+        ("Screen.setColor", "function", "void", "boolean"),
+        ("Screen.drawPixel", "function", "void", "int", "int"),
+        ("Screen.drawLine", "function", "void", "int", "int", "int", "int"),
+        ("Screen.drawRectangle", "function", "void", "int", "int", "int",
+         "int"),
+        ("Screen.drawCircle", "function", "void", "int", "int", "int"),
+        ("Keyboard.init", "function", "void"),
+        ("Keyboard.keyPressed", "function", "char"),
+        ("Keyboard.readChar", "function", "char"),
+        ("Keyboard.readLine", "function", "String", "String"),
+        ("Keyboard.readInt", "function", "int", "String"),
+        ("Memory.init", "function", "void"),
+        ("Memory.peek", "function", "int", "int"),
+        ("Memory.poke", "function", "void", "int", "int"),
+        ("Memory.alloc", "function", "Array", "int"),
+        ("Memory.deAlloc", "function", "void", "Array"),
+        ("Sys.init", "function", "void"),
+        ("Sys.halt", "function", "void"),
+        ("Sys.error", "function", "void", "int"),
+        ("Sys.wait", "function", "void", "int"))})
+BUILTIN_CLASSES = frozenset(
+    name.partition(".")[0] for name in BUILTIN_SIGNATURES)
+
+
+def signatures_of(tree: Class) -> typing.Dict[str, Signature]:
+    """
+    Args:
+        tree (Class): a class.
+
+    Returns:
+        typing.Dict[str, Signature]: the signature of every subroutine of
+        the class, by its name.
+    """
+    return {subroutine.name: Signature(
+        subroutine.kind, subroutine.return_type,
+        tuple(parameter.type for parameter in subroutine.parameters))
+        for subroutine in tree.subroutine_decs}
+
+
+class ProgramSignatures:
+    """The signatures of every subroutine a program can call: those of its
+    own classes, and those of the Jack OS classes it does not replace with
+    its own, in a single dict, so that checking a call takes a single
+    lookup, whatever the size of the program.
+    """
+
+    def __init__(self, classes: typing.Dict[
+            str, typing.Dict[str, Signature]]) -> None:
+        """
+        Args:
+            classes (typing.Dict[str, typing.Dict[str, Signature]]): the
+                signatures of the subroutines of every class of the program,
+                by their names, by the name of the class.
+        """
+        self.signatures = {
+            name: signature for name, signature in BUILTIN_SIGNATURES.items()
+            if name.partition(".")[0] not in classes}
+        for class_name, subroutines in classes.items():
+            for name, signature in subroutines.items():
+                self.signatures[class_name + "." + name] = signature
+        self.classes = BUILTIN_CLASSES.union(classes)
+
+    def check_class(self, tree: Class,
+                    path: typing.Optional[str] = None) -> None:
+        """Checks every call a class of the program makes.
+
+        A call by a class or variable name must be to a subroutine of that
+        class, or of the class of the variable, and a call by a bare name to
+        one of the class itself. Only methods are called on an object, and
+        only from a subroutine that has one when called by a bare name, and
+        every call passes as many arguments as the subroutine has parameters.
+
+        Args:
+            tree (Class): the class.
+            path (typing.Optional[str]): the path of its source, that errors
+                are reported in, if it has one.
+
+        Raises:
+            JackCallError: if any call is not valid, with every one that is
+                not, in the order they appear in the class.
+        """
+        problems = []
+        class_scope = {}
+        for class_var_dec in tree.class_var_decs:
+            class_scope.update(dict.fromkeys(class_var_dec.names,
+                                             class_var_dec.type))
+        for subroutine in tree.subroutine_decs:
+            caller = tree.name + "." + subroutine.name
+            # The types of the variables in scope, by name, as VMWriter
+            # resolves receivers, so that calls are checked as compiled.
+            scope = dict(class_scope)
+            for parameter in subroutine.parameters:
+                scope[parameter.name] = parameter.type
+            for var_dec in subroutine.var_decs:
+                scope.update(dict.fromkeys(var_dec.names, var_dec.type))
+            has_object = subroutine.kind != "function"
+            # Nodes are popped in order, so the children of every node are
+            # pushed in reverse.
+            stack = subroutine.statements[::-1]
+            pop = stack.pop
+            push = stack.append
+            extend = stack.extend
+            while stack:
+                node = pop()
+                node_class = node.__class__
+                if node_class is SubroutineCall:
+                    problem = self._check_call(node, tree.name, caller,
+                                               scope, has_object)
+                    if problem is not None:
+                        problems.append(problem)
+                fields = _CALL_FIELDS.get(node_class)
+                if fields is None:
+                    continue
+                for field in reversed(fields):
+                    value = getattr(node, field)
+                    if value.__class__ is list:
+                        extend(reversed(value))
+                    elif value is not None:
+                        push(value)
+        if problems:
+            raise JackCallError.collect([JackCallError(problem, path=path)
+                                         for problem in problems])
+
+    def _check_call(self, node: SubroutineCall, class_name: str,
+                    caller: str, scope: typing.Dict[str, str],
+                    has_object: bool) -> typing.Optional[str]:
+        """
+        Returns:
+            typing.Optional[str]: what is wrong with the call, if anything.
+        """
+        receiver = node.receiver
+        if receiver is None:
+            full_name = class_name + "." + node.name
+            signature = self.signatures.get(full_name)
+            if signature is None:
+                return "Undefined subroutine {} called in {}.".format(
+                    full_name, caller)
+            if signature.kind == _METHOD and not has_object:
+                return "Method {} called without an object in {}.".format(
+                    full_name, caller)
+        elif receiver in scope:
+            receiver_type = scope[receiver]
+            full_name = receiver_type + "." + node.name
+            if receiver_type not in self.classes:
+                return "{} called on {}, of type {}, which is not a class, " \
+                       "in {}.".format(node.name, receiver, receiver_type,
+                                       caller)
+            signature = self.signatures.get(full_name)
+            if signature is None:
+                return "Undefined subroutine {} called in {}.".format(
+                    full_name, caller)
+            if signature.kind != _METHOD:
+                return "{} {} called on an object in {}.".format(
+                    signature.kind.capitalize(), full_name, caller)
+        else:
+            if receiver not in self.classes:
+                return "Undefined class or variable {} in {}.".format(
+                    receiver, caller)
+            full_name = receiver + "." + node.name
+            signature = self.signatures.get(full_name)
+            if signature is None:
+                return "Undefined subroutine {} called in {}.".format(
+                    full_name, caller)
+            if signature.kind == _METHOD:
+                return "Method {} called without an object in {}.".format(
+                    full_name, caller)
+        if len(node.arguments) != len(signature.parameter_types):
+            return "Wrong number of arguments to {} in {}: expected {}, " \
+                   "got {}.".format(full_name, caller,
+                                    len(signature.parameter_types),
+                                    len(node.arguments))
+        return None
+
+
+def _index_file(path: str, cache=None) -> typing.Tuple[
+        typing.Optional[str], typing.Dict[str, typing.List]]:
+    """Parses a .jack file for its signatures, in a worker process or not.
+
+    Args:
+        path (str): the path of the file.
+        cache (typing.Optional[ParseTreeCache]): parse tree cache to use, as
+            in JackAnalyzer.parse_file().
+
+    Returns:
+        typing.Tuple[typing.Optional[str], typing.Dict[str, typing.List]]:
+        the name of its class, or None if it does not parse, and the
+        signature of every subroutine, by name, as stored in the index.
+    """
+    try:
+        with open(path, 'r') as input_file:
+            tokenizer = JackTokenizer(input_file)
+        tree = None
+        if cache is not None:
+            key = cache.key(tokenizer.input)
+            tree = cache.load(key)
+        if tree is None:
+            tree = CompilationEngine(tokenizer, None).compile_class()
+            if cache is not None:
+                cache.store(key, tree)
+    except (OSError, ValueError):
+        return None, {}
+    return tree.name, {
+        name: [signature.kind, signature.return_type,
+               list(signature.parameter_types)]
+        for name, signature in signatures_of(tree).items()}
+
+
+def _classes(entries: typing.Dict[str, dict]) -> typing.Dict[
+        str, typing.Dict[str, Signature]]:
+    """The signatures of the classes of the files of a directory, by
+    subroutine name, by class name, from their entries in its index.
+    """
+    classes = {}
+    for entry in entries.values():
+        if entry["class"] is not None:
+            classes[entry["class"]] = {
+                name: Signature(kind, return_type, tuple(parameter_types))
+                for name, (kind, return_type, parameter_types)
+                in entry["subroutines"].items()}
+    return classes
+
+
+class SignatureIndex:
+    """The signatures of the classes of every program in some directories,
+    a program being all the .jack files of a directory, as in the course.
+
+    The index of every directory is stored as JSON, in INDEX_FILENAME
+    beside the sources. It records the size and modification time of every
+    source, so that updating it only parses the sources that are new or
+    changed since, and takes a stat of every other one.
+    """
+
+    def __init__(self, cache=None) -> None:
+        """
+        Args:
+            cache (typing.Optional[ParseTreeCache]): parse tree cache to
+                parse sources with, so that a build with the same cache
+                does not parse the sources the index was updated from again.
+        """
+        self.cache = cache
+        self.parsed = 0  # The sources parsed by update().
+        self._entries = {}  # The entry of every source, by name, by directory.
+        self._saved = {}  # The entries as last saved, by directory.
+        self._programs = {}  # The ProgramSignatures of every directory.
+        self._changed = set()  # Directories whose signatures changed.
+
+    def update(self, directories: typing.Iterable[str],
+               jobs: int = 1) -> None:
+        """Brings the index of every directory up to date with its sources.
+
+        Args:
+            directories (typing.Iterable[str]): the directories.
+            jobs (int): parse the sources that changed in this many worker
+                processes.
+        """
+        stale = []  # (directory, name, path, stat) of the sources to parse.
+        directories = list(dict.fromkeys(map(os.path.abspath, directories)))
+        for directory in directories:
+            saved = self._load(directory)
+            entries = {}
+            with os.scandir(directory) as directory_entries:
+                for directory_entry in directory_entries:
+                    name = directory_entry.name
+                    if not name.lower().endswith(".jack") or \
+                            name == ".jack" or not directory_entry.is_file():
+                        continue
+                    stat = directory_entry.stat()
+                    entry = saved.get(name)
+                    if entry is not None and entry["size"] == stat.st_size \
+                            and entry["mtime_ns"] == stat.st_mtime_ns:
+                        entries[name] = entry
+                    else:
+                        stale.append((directory, name, directory_entry.path,
+                                      stat))
+            self._entries[directory] = entries
+            self._saved[directory] = saved
+        paths = [path for _, _, path, _ in stale]
+        if jobs <= 1 or len(paths) <= 1:
+            results = [_index_file(path, self.cache) for path in paths]
+        else:
+            # Only imported here, as in JackAnalyzer.
+            import concurrent.futures
+            import itertools
+            with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+                results = list(executor.map(
+                    _index_file, paths, itertools.repeat(self.cache),
+                    chunksize=max(1, len(paths) // (jobs * 4))))
+        self.parsed += len(paths)
+        for (directory, name, _, stat), (class_name, subroutines) in zip(
+                stale, results):
+            self._entries[directory][name] = {
+                "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                "class": class_name, "subroutines": subroutines}
+        for directory in directories:
+            classes = _classes(self._entries[directory])
+            if classes != _classes(self._saved[directory]):
+                self._changed.add(directory)
+            self._programs[directory] = ProgramSignatures(classes)
+
+    def program(self, directory: str) -> ProgramSignatures:
+        """
+        Args:
+            directory (str): a directory, which is indexed first if it is not
+                yet.
+
+        Returns:
+            ProgramSignatures: the signatures of the program in it.
+        """
+        directory = os.path.abspath(directory)
+        if directory not in self._programs:
+            self.update([directory])
+        return self._programs[directory]
+
+    def changed(self, directory: str) -> bool:
+        """
+        Args:
+            directory (str): an indexed directory.
+
+        Returns:
+            bool: True if the signatures of the program in it changed since
+            its index was last saved, so that calls to them that were valid
+            then need checking again.
+        """
+        return os.path.abspath(directory) in self._changed
+
+    def _load(self, directory: str) -> typing.Dict[str, dict]:
+        import json  # Only builds that check calls need it.
+        try:
+            with open(os.path.join(directory, INDEX_FILENAME), 'r') as \
+                    index_file:
+                index = json.load(index_file)
+            if index.get("format") == _INDEX_FORMAT:
+                return index["files"]
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass  # A missing or corrupt index just means parsing everything.
+        return {}
+
+    def save(self) -> None:
+        """Writes the index of every directory that changed back to disk.
+
+        Every index is written to a temporary file that then replaces the
+        old one, so an interrupted build never leaves a truncated index.
+        """
+        import json
+        for directory, entries in self._entries.items():
+            if entries == self._saved[directory]:
+                continue
+            path = os.path.join(directory, INDEX_FILENAME)
+            temporary_path = "{}.{}.{}.tmp".format(
+                path, os.getpid(), threading.get_ident())
+            with open(temporary_path, 'w') as index_file:
+                json.dump({"format": _INDEX_FORMAT, "files": entries},
+                          index_file, indent=1, sort_keys=True)
+            os.replace(temporary_path, path)
+            self._saved[directory] = entries
+        self._changed.clear()
@@ -0,0 +1,91 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+
+STATIC, FIELD, ARGUMENT, LOCAL = "static", "field", "argument", "local"
+KINDS = (STATIC, FIELD, ARGUMENT, LOCAL)
+# The VM memory segment variables of every kind live in.
+SEGMENTS = {STATIC: "static", FIELD: "this", ARGUMENT: "argument",
+            LOCAL: "local"}
+
+
+class Symbol:
+    """A variable: its kind, one of KINDS, its type and its index among the
+    variables of its kind, along with where it lives, as "segment index".
+    """
+    __slots__ = ('kind', 'type', 'index', 'address')
+
+    def __init__(self, kind: str, type: str, index: int) -> None:
+        self.kind = kind
+        self.type = type
+        self.index = index
+        self.address = "{} {}".format(SEGMENTS[kind], index)
+
+
+class SymbolTable:
+    """The variables of a class and of the subroutine being compiled, in two
+    scopes: static and field variables in the class scope, arguments and
+    local variables in the subroutine scope, which hides the class scope.
+    Every scope is a dict, so looking a name up takes constant time.
+    """
+
+    def __init__(self) -> None:
+        self._class_scope = {}
+        self._subroutine_scope = {}
+        self._counts = dict.fromkeys(KINDS, 0)
+
+    def start_subroutine(self) -> None:
+        """Empties the subroutine scope, for the next subroutine."""
+        self._subroutine_scope = {}
+        self._counts[ARGUMENT] = 0
+        self._counts[LOCAL] = 0
+
+    def define(self, name: str, type: str, kind: str) -> Symbol:
+        """Defines a new variable, with the next index of its kind.
+
+        Args:
+            name (str): the name of the variable.
+            type (str): its type.
+            kind (str): its kind, one of KINDS.
+
+        Returns:
+            Symbol: the variable.
+
+        Raises:
+            ValueError: if its scope already has a variable by that name.
+        """
+        scope = self._class_scope if kind in (STATIC, FIELD) \
+            else self._subroutine_scope
+        if name in scope:
+            raise ValueError("Duplicate variable {}.".format(name))
+        symbol = scope[name] = Symbol(kind, type, self._counts[kind])
+        self._counts[kind] += 1
+        return symbol
+
+    def var_count(self, kind: str) -> int:
+        """
+        Args:
+            kind (str): one of KINDS.
+
+        Returns:
+            int: the number of variables of that kind defined in its scope.
+        """
+        return self._counts[kind]
+
+    def lookup(self, name: str) -> typing.Optional[Symbol]:
+        """
+        Args:
+            name (str): the name of a variable.
+
+        Returns:
+            typing.Optional[Symbol]: the variable by that name in the
+            subroutine scope, or else in the class scope, or None if neither
+            has one.
+        """
+        symbol = self._subroutine_scope.get(name)
+        return symbol if symbol is not None else self._class_scope.get(name)
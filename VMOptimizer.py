@@ -0,0 +1,313 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+
+A peephole optimizer for the VM code VMWriter generates. It rewrites the
+code of a function with the rules in RULES, each of which replaces a short
+sequence of commands with a cheaper one that does the same, and with the
+rules in GLOBAL_RULES, which a short sequence cannot express, until none
+applies any more.
+"""
+import typing
+
+# The largest constant a single push can hold.
+_MAX_CONSTANT = 32767
+_JUMPS = frozenset(("goto", "if-goto"))
+# Commands that never go on to the next one, and commands other commands can
+# go on to, rather than just the one before them.
+_ENDS = frozenset(("goto", "return"))
+_ENTRIES = frozenset(("label", "function"))
+
+
+def _push_pop(window: typing.List[typing.Tuple[str, ...]]) -> \
+        typing.Optional[typing.List[typing.Tuple[str, ...]]]:
+    """push s i / pop s i: stores a value where it already is."""
+    push, pop = window
+    if push[0] == "push" and push[1:] == pop[1:]:
+        return []
+    return None
+
+
+def _double_unary(window: typing.List[typing.Tuple[str, ...]]) -> \
+        typing.Optional[typing.List[typing.Tuple[str, ...]]]:
+    """not / not, or neg / neg: undoes itself."""
+    first, second = window
+    if first == second:
+        return []
+    return None
+
+
+def _identity(window: typing.List[typing.Tuple[str, ...]]) -> \
+        typing.Optional[typing.List[typing.Tuple[str, ...]]]:
+    """push constant 0 / add, sub or or, and push constant 1 / multiply or
+    divide: leaves the value below as is.
+    """
+    push, operation = window
+    if push[:2] != ("push", "constant"):
+        return None
+    if push[2] == "0" and operation[0] in ("add", "sub", "or"):
+        return []
+    if push[2] == "1" and operation[0] == "call" and \
+            operation[1] in ("Math.multiply", "Math.divide"):
+        return []
+    return None
+
+
+_FOLDED = {
+    "add": lambda left, right: left + right,
+    "sub": lambda left, right: left - right,
+    "and": lambda left, right: left & right,
+    "or": lambda left, right: left | right,
+    "lt": lambda left, right: -(left < right),
+    "gt": lambda left, right: -(left > right),
+    "eq": lambda left, right: -(left == right),
+    "Math.multiply": lambda left, right: left * right,
+    "Math.divide": lambda left, right: left // right if right else None,
+}
+
+
+def _fold_constants(window: typing.List[typing.Tuple[str, ...]]) -> \
+        typing.Optional[typing.List[typing.Tuple[str, ...]]]:
+    """push constant a / push constant b / an operation: pushes the result,
+    if a single push can.
+    """
+    left, right, operation = window
+    if left[:2] != ("push", "constant") or right[:2] != ("push", "constant"):
+        return None
+    function = _FOLDED.get(operation[1] if operation[0] == "call"
+                           else operation[0])
+    if function is None:
+        return None
+    result = function(int(left[2]), int(right[2]))
+    if result == -1:  # True.
+        return [("push", "constant", "0"), ("not",)]
+    if result is None or not 0 <= result <= _MAX_CONSTANT:
+        return None
+    return [("push", "constant", str(result))]
+
+
+def _constant_branch(window: typing.List[typing.Tuple[str, ...]]) -> \
+        typing.Optional[typing.List[typing.Tuple[str, ...]]]:
+    """push constant n / if-goto l: jumps never if n is 0, always otherwise.
+    """
+    push, jump = window
+    if push[:2] != ("push", "constant"):
+        return None
+    if push[2] == "0":
+        return []
+    return [("goto", jump[1])]
+
+
+def _true_branch(window: typing.List[typing.Tuple[str, ...]]) -> \
+        typing.Optional[typing.List[typing.Tuple[str, ...]]]:
+    """push constant 0 / not / if-goto l: always jumps."""
+    push, negation, jump = window
+    if push == ("push", "constant", "0") and negation == ("not",):
+        return [("goto", jump[1])]
+    return None
+
+
+def _inverted_branch(window: typing.List[typing.Tuple[str, ...]]) -> \
+        typing.Optional[typing.List[typing.Tuple[str, ...]]]:
+    """A comparison / not / if-goto a / goto b / label a: jumps to b if the
+    comparison holds, which is what an if with an empty body compiles to.
+    Only comparisons are sure to push true or false, rather than any value,
+    so that not flips whether if-goto jumps.
+    """
+    comparison, negation, branch, jump, label = window
+    if comparison[0] in ("lt", "gt", "eq") and negation == ("not",) and \
+            branch[0] == "if-goto" and jump[0] == "goto" and \
+            branch[1] == label[1]:
+        return [comparison, ("if-goto", jump[1]), label]
+    return None
+
+
+def _jump_to_next(window: typing.List[typing.Tuple[str, ...]]) -> \
+        typing.Optional[typing.List[typing.Tuple[str, ...]]]:
+    """goto l / label l: jumps where it would go anyway."""
+    jump, label = window
+    if jump[0] == "goto" and jump[1] == label[1]:
+        return [label]
+    return None
+
+
+# The rules, as (name, the command the sequence ends with, the length of the
+# sequence, the rewrite). A rewrite gets the last commands of the code, split
+# into words, and returns what replaces them, or None if it does not apply.
+RULES = (
+    ("push-pop", "pop", 2, _push_pop),
+    ("double-not", "not", 2, _double_unary),
+    ("double-neg", "neg", 2, _double_unary),
+    ("identity", "add", 2, _identity),
+    ("identity", "sub", 2, _identity),
+    ("identity", "or", 2, _identity),
+    ("identity", "call", 2, _identity),
+    ("fold-constants", "add", 3, _fold_constants),
+    ("fold-constants", "sub", 3, _fold_constants),
+    ("fold-constants", "and", 3, _fold_constants),
+    ("fold-constants", "or", 3, _fold_constants),
+    ("fold-constants", "lt", 3, _fold_constants),
+    ("fold-constants", "gt", 3, _fold_constants),
+    ("fold-constants", "eq", 3, _fold_constants),
+    ("fold-constants", "call", 3, _fold_constants),
+    ("constant-branch", "if-goto", 2, _constant_branch),
+    ("true-branch", "if-goto", 3, _true_branch),
+    ("inverted-branch", "label", 5, _inverted_branch),
+    ("jump-to-next", "label", 2, _jump_to_next),
+)
+# Rules RULES cannot express: "unreachable" drops whatever follows a goto or
+# a return up to the next label, which would need a rule for every command,
+# and the others look at the whole function rather than at a window of it.
+GLOBAL_RULES = ("unreachable", "jump-threading", "unused-label")
+RULE_NAMES = tuple(dict.fromkeys(
+    [name for name, _, _, _ in RULES] + list(GLOBAL_RULES)))
+
+
+def instruction_count(commands: typing.Iterable[typing.Sequence[str]]) -> int:
+    """
+    Args:
+        commands (typing.Iterable[typing.Sequence[str]]): VM commands, split
+            into words.
+
+    Returns:
+        int: how many of them are instructions, that is, not labels.
+    """
+    return sum(1 for command in commands if command[0] != "label")
+
+
+class PeepholeOptimizer:
+    """Optimizes functions of VM code, counting how often every rule applied
+    and how many instructions there were before and after, over all of them.
+    """
+
+    def __init__(self) -> None:
+        self.hits = dict.fromkeys(RULE_NAMES, 0)
+        self.instructions_before = 0
+        self.instructions_after = 0
+        # The rules to try as every command comes in, by its first word.
+        self._rules = {}
+        for name, last, size, rewrite in RULES:
+            self._rules.setdefault(last, []).append((name, size, rewrite))
+
+    def optimize(self, code: str) -> str:
+        """
+        Args:
+            code (str): the VM code of a single function, as lines.
+
+        Returns:
+            str: the optimized code, as lines.
+        """
+        commands = [tuple(line.split()) for line in code.splitlines()]
+        self.instructions_before += instruction_count(commands)
+        while True:
+            commands = self._rewrite(commands)
+            rewritten = self._thread_jumps(commands)
+            rewritten = self._drop_unused_labels(rewritten)
+            if rewritten is commands:
+                break
+            commands = rewritten
+        self.instructions_after += instruction_count(commands)
+        return "".join(" ".join(command) + "\n" for command in commands)
+
+    def _rewrite(self, commands: typing.List[typing.Tuple[str, ...]]) -> \
+            typing.List[typing.Tuple[str, ...]]:
+        """Applies RULES, and drops unreachable code, until nothing changes.
+
+        The commands are moved to the output one by one, and every rule is
+        tried on the end of the output as each comes in. What a rule rewrites
+        the end of the output to goes back in front of the input, so that it
+        is tried again, which rewrites everything in a single pass.
+        """
+        rules = self._rules
+        hits = self.hits
+        output = []
+        append = output.append
+        pending = commands[::-1]
+        pop = pending.pop
+        unreachable = False  # Whether the last command never goes on.
+        while pending:
+            command = pop()
+            opcode = command[0]
+            if unreachable and opcode not in _ENTRIES:
+                hits["unreachable"] += 1
+                continue
+            append(command)
+            unreachable = opcode in _ENDS
+            candidates = rules.get(opcode)
+            if candidates is None:
+                continue
+            for name, size, rewrite in candidates:
+                if len(output) < size:
+                    continue
+                replacement = rewrite(output[-size:])
+                if replacement is not None:
+                    hits[name] += 1
+                    del output[-size:]
+                    unreachable = bool(output) and output[-1][0] in _ENDS
+                    pending.extend(reversed(replacement))
+                    break
+        return output
+
+    def _thread_jumps(self, commands: typing.List[typing.Tuple[str, ...]]) \
+            -> typing.List[typing.Tuple[str, ...]]:
+        """Makes jumps to a label that is followed by a goto jump where the
+        goto goes, directly.
+
+        Returns:
+            typing.List[typing.Tuple[str, ...]]: the commands, or a new list
+            if anything changed.
+        """
+        forwards = {}
+        for index, command in enumerate(commands):
+            if command[0] != "label":
+                continue
+            following = index + 1
+            while following < len(commands) and \
+                    commands[following][0] == "label":
+                following += 1
+            if following < len(commands) and \
+                    commands[following][0] == "goto":
+                forwards[command[1]] = commands[following][1]
+        if not forwards:
+            return commands
+        rewritten = list(commands)
+        changed = False
+        for index, command in enumerate(commands):
+            if command[0] not in _JUMPS or command[1] not in forwards:
+                continue
+            # Follows the chain of gotos, unless it loops forever.
+            target = command[1]
+            seen = {target}
+            while target in forwards:
+                target = forwards[target]
+                if target in seen:
+                    target = None
+                    break
+                seen.add(target)
+            if target is not None and target != command[1]:
+                rewritten[index] = (command[0], target)
+                self.hits["jump-threading"] += 1
+                changed = True
+        return rewritten if changed else commands
+
+    def _drop_unused_labels(
+            self, commands: typing.List[typing.Tuple[str, ...]]) -> \
+            typing.List[typing.Tuple[str, ...]]:
+        """Drops labels no jump goes to, which lets _unreachable() drop the
+        code after them.
+
+        Returns:
+            typing.List[typing.Tuple[str, ...]]: the commands, or a new list
+            if anything changed.
+        """
+        targets = {command[1] for command in commands
+                   if command[0] in _JUMPS}
+        rewritten = [command for command in commands
+                     if command[0] != "label" or command[1] in targets]
+        if len(rewritten) == len(commands):
+            return commands
+        self.hits["unused-label"] += len(commands) - len(rewritten)
+        return rewritten
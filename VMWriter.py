@@ -0,0 +1,262 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+
+Compiles the syntax trees CompilationEngine builds into Hack VM code, as in
+the nand2tetris project 11. Like the serializers, it does not recurse, so
+trees of any depth can be compiled.
+"""
+import typing
+from JackAST import (
+    Class, SubroutineDec, LetStatement, IfStatement, WhileStatement,
+    DoStatement, ReturnStatement, Expression, IntegerConstant, StringConstant,
+    KeywordConstant, Variable, ArrayAccess, SubroutineCall,
+    ParenthesizedExpression, UnaryOp)
+from SymbolTable import ARGUMENT, FIELD, LOCAL, SymbolTable
+from VMOptimizer import PeepholeOptimizer
+
+_OP_LINES = {'+': "add\n", '-': "sub\n", '*': "call Math.multiply 2\n",
+             '/': "call Math.divide 2\n", '&': "and\n", '|': "or\n",
+             '<': "lt\n", '>': "gt\n", '=': "eq\n"}
+_UNARY_OP_LINES = {'-': "neg\n", '~': "not\n"}
+_KEYWORD_CONSTANT_LINES = {'true': "push constant 0\nnot\n",
+                           'false': "push constant 0\n",
+                           'null': "push constant 0\n",
+                           'this': "push pointer 0\n"}
+_STORE_ARRAY_ELEMENT = "pop temp 0\npop pointer 1\npush temp 0\npop that 0\n"
+_LOAD_ARRAY_ELEMENT = "add\npop pointer 1\npush that 0\n"
+
+
+class VMWriter:
+    """Writes Jack classes, as syntax trees, as Hack VM code to a stream.
+
+    Every class gets a SymbolTable, and so does every subroutine in turn, so
+    every variable is found with a single dict lookup. Code is written a
+    subroutine at a time, optimized first if given an optimizer.
+    """
+
+    def __init__(self, output_stream: typing.TextIO,
+                 optimizer: typing.Optional[PeepholeOptimizer] = None) -> None:
+        """
+        Args:
+            output_stream (typing.TextIO): the stream to write to.
+            optimizer (typing.Optional[PeepholeOptimizer]): if given, the
+                code of every subroutine goes through this optimizer.
+        """
+        self.output_stream = output_stream
+        self.optimizer = optimizer
+        self.symbols = SymbolTable()
+        self._class_name = None
+        self._subroutine_name = None
+        self._subroutine_kinds = {}
+        self._labels = 0
+
+    def write_class(self, tree: Class) -> None:
+        """Writes the VM code of a class.
+
+        Args:
+            tree (Class): the class.
+
+        Raises:
+            ValueError: if the class uses a variable it does not declare,
+                declares one twice in the same scope, or uses an operator
+                that has no VM code.
+        """
+        self.symbols = SymbolTable()
+        self._class_name = tree.name
+        # Calls without a receiver are to subroutines of the class itself,
+        # which are called as methods unless the class says otherwise.
+        self._subroutine_kinds = {subroutine.name: subroutine.kind
+                                  for subroutine in tree.subroutine_decs}
+        for class_var_dec in tree.class_var_decs:
+            for name in class_var_dec.names:
+                self._define(name, class_var_dec.type, class_var_dec.kind,
+                             "class " + tree.name)
+        for subroutine in tree.subroutine_decs:
+            code = "".join(self._subroutine_lines(subroutine))
+            if self.optimizer is not None:
+                code = self.optimizer.optimize(code)
+            self.output_stream.write(code)
+
+    def _define(self, name: str, type: str, kind: str, where: str) -> None:
+        try:
+            self.symbols.define(name, type, kind)
+        except ValueError:
+            raise ValueError("Duplicate variable {} in {}.".format(
+                name, where)) from None
+
+    def _address(self, name: str) -> str:
+        """The "segment index" of a variable in scope."""
+        symbol = self.symbols.lookup(name)
+        if symbol is None:
+            raise ValueError("Undefined variable {} in {}.".format(
+                name, self._subroutine_name))
+        return symbol.address
+
+    def _label(self) -> int:
+        """A number for the labels of a statement, unique in its subroutine.
+        """
+        self._labels += 1
+        return self._labels - 1
+
+    def _subroutine_lines(self, node: SubroutineDec) -> typing.List[str]:
+        """
+        Args:
+            node (SubroutineDec): a subroutine of the class being written.
+
+        Returns:
+            typing.List[str]: its VM code, as lines.
+        """
+        symbols = self.symbols
+        symbols.start_subroutine()
+        self._subroutine_name = self._class_name + "." + node.name
+        self._labels = 0
+        if node.kind == "method":
+            # The object a method is called on is its argument 0, and "this"
+            # is a keyword, so it cannot clash with a parameter.
+            symbols.define("this", self._class_name, ARGUMENT)
+        for parameter in node.parameters:
+            self._define(parameter.name, parameter.type, ARGUMENT,
+                         self._subroutine_name)
+        for var_dec in node.var_decs:
+            for name in var_dec.names:
+                self._define(name, var_dec.type, LOCAL,
+                             self._subroutine_name)
+        lines = ["function {} {}\n".format(
+            self._subroutine_name, symbols.var_count(LOCAL))]
+        if node.kind == "constructor":
+            lines.append("push constant {}\ncall Memory.alloc 1\n"
+                         "pop pointer 0\n".format(symbols.var_count(FIELD)))
+        elif node.kind == "method":
+            lines.append("push argument 0\npop pointer 0\n")
+        append = lines.append
+        handlers = _VM_ITEMS
+        # Items are popped in order, so the lines and children of every node
+        # are pushed in reverse.
+        stack = node.statements[::-1]
+        pop = stack.pop
+        extend = stack.extend
+        while stack:
+            item = pop()
+            if item.__class__ is str:
+                append(item)
+            else:
+                extend(reversed(handlers[item.__class__](self, item)))
+        return lines
+
+    def _let_items(self, node: LetStatement) -> list:
+        address = self._address(node.name)
+        if node.index is None:
+            return [node.value, "pop " + address + "\n"]
+        return ["push " + address + "\n", node.index, "add\n", node.value,
+                _STORE_ARRAY_ELEMENT]
+
+    def _if_items(self, node: IfStatement) -> list:
+        label = self._label()
+        if node.else_statements is None:
+            return [node.condition, "not\nif-goto IF_END{}\n".format(label),
+                    *node.statements, "label IF_END{}\n".format(label)]
+        return [node.condition, "not\nif-goto IF_ELSE{}\n".format(label),
+                *node.statements,
+                "goto IF_END{0}\nlabel IF_ELSE{0}\n".format(label),
+                *node.else_statements, "label IF_END{}\n".format(label)]
+
+    def _while_items(self, node: WhileStatement) -> list:
+        label = self._label()
+        return ["label WHILE_EXP{}\n".format(label), node.condition,
+                "not\nif-goto WHILE_END{}\n".format(label), *node.statements,
+                "goto WHILE_EXP{0}\nlabel WHILE_END{0}\n".format(label)]
+
+    def _do_items(self, node: DoStatement) -> list:
+        # The value every call returns is thrown away.
+        return [node.call, "pop temp 0\n"]
+
+    def _return_items(self, node: ReturnStatement) -> list:
+        if node.value is None:
+            # Void subroutines return 0, which the caller throws away.
+            return ["push constant 0\nreturn\n"]
+        return [node.value, "return\n"]
+
+    def _expression_items(self, node: Expression) -> list:
+        # Jack has no operator precedence: operators apply left to right.
+        terms = node.terms
+        items = [terms[0]]
+        for op, term in zip(node.ops, terms[1:]):
+            line = _OP_LINES.get(op)
+            if line is None:
+                # The parser accepts operators, such as ".", that Jack has
+                # no VM code for.
+                raise ValueError("Unsupported operator '{}' in {}.".format(
+                    op, self._subroutine_name))
+            items.append(term)
+            items.append(line)
+        return items
+
+    def _integer_constant_items(self, node: IntegerConstant) -> list:
+        return ["push constant {}\n".format(node.value)]
+
+    def _string_constant_items(self, node: StringConstant) -> list:
+        value = node.value
+        return ["push constant {}\ncall String.new 1\n".format(len(value)),
+                *("push constant {}\ncall String.appendChar 2\n".format(
+                    ord(character)) for character in value)]
+
+    def _keyword_constant_items(self, node: KeywordConstant) -> list:
+        return [_KEYWORD_CONSTANT_LINES[node.value]]
+
+    def _variable_items(self, node: Variable) -> list:
+        return ["push " + self._address(node.name) + "\n"]
+
+    def _array_access_items(self, node: ArrayAccess) -> list:
+        return ["push " + self._address(node.name) + "\n", node.index,
+                _LOAD_ARRAY_ELEMENT]
+
+    def _subroutine_call_items(self, node: SubroutineCall) -> list:
+        arguments = len(node.arguments)
+        receiver = node.receiver
+        if receiver is None:
+            if self._subroutine_kinds.get(node.name, "method") != "method":
+                return [*node.arguments, "call {}.{} {}\n".format(
+                    self._class_name, node.name, arguments)]
+            return ["push pointer 0\n", *node.arguments,
+                    "call {}.{} {}\n".format(
+                        self._class_name, node.name, arguments + 1)]
+        symbol = self.symbols.lookup(receiver)
+        if symbol is None:
+            # A function or constructor of the class by that name.
+            return [*node.arguments, "call {}.{} {}\n".format(
+                receiver, node.name, arguments)]
+        # A method of the object in the variable by that name.
+        return ["push " + symbol.address + "\n", *node.arguments,
+                "call {}.{} {}\n".format(symbol.type, node.name,
+                                         arguments + 1)]
+
+    def _parenthesized_expression_items(
+            self, node: ParenthesizedExpression) -> list:
+        return [node.expression]
+
+    def _unary_op_items(self, node: UnaryOp) -> list:
+        return [node.term, _UNARY_OP_LINES[node.op]]
+
+
+# How every node below a subroutine compiles: into a list of lines of VM
+# code and of child nodes.
+_VM_ITEMS = {
+    LetStatement: VMWriter._let_items,
+    IfStatement: VMWriter._if_items,
+    WhileStatement: VMWriter._while_items,
+    DoStatement: VMWriter._do_items,
+    ReturnStatement: VMWriter._return_items,
+    Expression: VMWriter._expression_items,
+    IntegerConstant: VMWriter._integer_constant_items,
+    StringConstant: VMWriter._string_constant_items,
+    KeywordConstant: VMWriter._keyword_constant_items,
+    Variable: VMWriter._variable_items,
+    ArrayAccess: VMWriter._array_access_items,
+    SubroutineCall: VMWriter._subroutine_call_items,
+    ParenthesizedExpression: VMWriter._parenthesized_expression_items,
+    UnaryOp: VMWriter._unary_op_items,
+}
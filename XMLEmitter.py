@@ -0,0 +1,111 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from JackTokenizer import _KEYWORD_LIST, _SYMBOL_LIST
+
+# The one escape applied to every piece of text that goes into the XML.
+_ESCAPE_TABLE = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;'})
+
+
+def escape(text: str) -> str:
+    """
+    Args:
+        text (str): text to put between XML tags.
+
+    Returns:
+        str: the text with "&", "<" and ">" escaped.
+    """
+    # Translating is slow next to the membership tests, and most text has
+    # nothing to escape.
+    if '&' in text or '<' in text or '>' in text:
+        return text.translate(_ESCAPE_TABLE)
+    return text
+
+
+# Every line that only depends on a keyword or symbol code is built once.
+KEYWORD_LINES = tuple(
+    "<keyword> {} </keyword>\n".format(keyword) for keyword in _KEYWORD_LIST)
+SYMBOL_LINES = [None] * 128
+for _symbol in _SYMBOL_LIST:
+    SYMBOL_LINES[ord(_symbol)] = "<symbol> {} </symbol>\n".format(
+        escape(_symbol))
+SYMBOL_LINES = tuple(SYMBOL_LINES)
+
+DEFAULT_CHUNK_LINES = 4096  # Lines buffered before they are written out.
+
+
+def identifier_line(text: str) -> str:
+    """
+    Args:
+        text (str): an identifier.
+
+    Returns:
+        str: the line of XML holding it.
+    """
+    return "<identifier> " + escape(text) + " </identifier>\n"
+
+
+def integer_constant_line(value: int) -> str:
+    """
+    Args:
+        value (int): an integer constant.
+
+    Returns:
+        str: the line of XML holding it.
+    """
+    return "<integerConstant> " + str(value) + " </integerConstant>\n"
+
+
+def string_constant_line(text: str) -> str:
+    """
+    Args:
+        text (str): a string constant, without its double quotes.
+
+    Returns:
+        str: the line of XML holding it.
+    """
+    return "<stringConstant> " + escape(text) + " </stringConstant>\n"
+
+
+class XMLEmitter:
+    """Buffers lines of XML and writes them to an output stream in large
+    chunks.
+
+    Lines are passed to emit(), which is the bound append() of the lines
+    list so that it costs no Python call. Fixed lines, such as tags or the
+    lines in KEYWORD_LINES and SYMBOL_LINES, are emitted as is, and lines
+    holding the text of identifiers and constants are built, and escaped, by
+    the *_line() functions. Whoever emits should call flush_if_full() every so
+    often, or check the length of lines against chunk_lines itself, and call
+    flush() once everything has been emitted.
+    """
+
+    def __init__(self, output_stream: typing.TextIO,
+                 chunk_lines: int = DEFAULT_CHUNK_LINES) -> None:
+        """
+        Args:
+            output_stream (typing.TextIO): the stream to write to.
+            chunk_lines (int): the number of lines to buffer before writing.
+        """
+        self.output_stream = output_stream
+        self.chunk_lines = chunk_lines
+        self.lines = []
+        self.emit = self.lines.append
+
+    def flush_if_full(self) -> None:
+        """Writes out everything emitted so far if it is at least chunk_lines
+        lines.
+        """
+        if len(self.lines) >= self.chunk_lines:
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes out everything emitted so far."""
+        if self.lines:
+            self.output_stream.write(''.join(self.lines))
+            self.lines.clear()